@@ -29,6 +29,10 @@ if LIBRARY_DIRPATH not in sys.path:
     sys.path.append(LIBRARY_DIRPATH)
 from library.stdlib import NiceArgparseFormatter
 from library.ffmpeg import generate_thumbnails
+from library.scoring import SCORERS, DEFAULT_WEIGHTS, parse_weights
+from library.phash import HASH_FUNCTIONS, DEFAULT_HAMMING_THRESHOLD
+from library.cache import FRAME_CACHE
+from library.images import BACKENDS, FORMATS
 
 __doc__ = __doc__.format(
     filepath=__file__,
@@ -44,18 +48,32 @@ def main(
     output_dirpath=None,
     samples=DEFAULT_SAMPLES,
     keep=DEFAULT_KEEP,
+    keyframes=False,
+    weights=None,
+    hamming_threshold=DEFAULT_HAMMING_THRESHOLD,
+    hash_function='dhash',
+    cache=True,
+    image_format='jpg',
+    image_backend=None,
 ):
-    # type: (str, str, int, int) -> int
+    # type: (str, str, int, int, bool, dict, int, str, bool, str, str) -> int
     if output_dirpath is None:
         output_dirpath = os.path.join(os.path.dirname(video_filepath),
                                       'thumbnails')
     os.makedirs(output_dirpath, exist_ok=True)
-    topic = f'THUMBNAILS - "{video_filepath}" -> "{output_dirpath}" (samples=250, keep=50)'
+    topic = f'THUMBNAILS - "{video_filepath}" -> "{output_dirpath}" (samples={samples}, keep={keep}, keyframes={keyframes})'
     LOGGER.info('%s - STARTING', topic)
     thumbnail_filepaths = generate_thumbnails(video_filepath,
                                               output_dirpath,
                                               samples=samples,
-                                              keep=keep)
+                                              keep=keep,
+                                              keyframes=keyframes,
+                                              weights=weights,
+                                              hamming_threshold=hamming_threshold,
+                                              hash_function=hash_function,
+                                              cache=FRAME_CACHE if cache else None,
+                                              image_format=image_format,
+                                              image_backend=image_backend)
     for thumbnail_filepath in thumbnail_filepaths[0:3]:
         shutil.copy(thumbnail_filepath, os.path.dirname(video_filepath))
     LOGGER.info('%s - PASSED', topic)
@@ -84,6 +102,49 @@ if __name__ == '__main__':
         type=int,
         default=DEFAULT_KEEP,
         help='how many of the samples to keep? set equal to keep all of them')
+    parser.add_argument(
+        '-kf',
+        '--keyframes',
+        action='store_true',
+        help=
+        'only sample keyframes, WAY faster on long videos but the timestamps snap to the nearest keyframe'
+    )
+    parser.add_argument(
+        '-w',
+        '--weights',
+        type=str,
+        nargs='+',
+        default=[f'{name}={weight}' for name, weight in DEFAULT_WEIGHTS.items()],
+        help=f'scorers to rank the samples with as "name=weight", pick from {sorted(SCORERS)}')
+    parser.add_argument(
+        '-hd',
+        '--hamming-distance',
+        type=int,
+        default=DEFAULT_HAMMING_THRESHOLD,
+        help='samples whose perceptual hashes differ by this many bits or fewer are duplicates, -1 to keep them all')
+    parser.add_argument('-hf',
+                        '--hash-function',
+                        type=str,
+                        default='dhash',
+                        choices=HASH_FUNCTIONS,
+                        help='perceptual hash used to find the duplicates')
+    parser.add_argument(
+        '-nc',
+        '--no-cache',
+        action='store_true',
+        help=f'always decode, dont read or write the sampled frame cache at "{FRAME_CACHE.dirpath}"')
+    parser.add_argument('-f',
+                        '--format',
+                        type=str,
+                        default='jpg',
+                        choices=FORMATS,
+                        help='image format of the kept thumbnails')
+    parser.add_argument(
+        '-b',
+        '--backend',
+        type=str,
+        choices=BACKENDS,
+        help='image conversion backend, default pillow if installed, otherwise magick')
     parser.add_argument('-ll',
                         '--log-level',
                         type=str,
@@ -104,6 +165,13 @@ if __name__ == '__main__':
             output_dirpath=args.output_dirpath,
             samples=args.samples,
             keep=args.keep,
+            keyframes=args.keyframes,
+            weights=parse_weights(args.weights),
+            hamming_threshold=None if args.hamming_distance < 0 else args.hamming_distance,
+            hash_function=args.hash_function,
+            cache=not args.no_cache,
+            image_format=args.format,
+            image_backend=args.backend,
         )
     except KeyboardInterrupt:
         LOGGER.warning('ctrl + c detected')
@@ -11,16 +11,27 @@ Description:
 Example:
     python {filepath} {shell_multiline}
         list.txt 3840 60 {shell_multiline}
+
+    # no gpu? libx265 gets picked on its own, each file split at its keyframes and encoded in chunks at once, or pick the count
+    python {filepath} {shell_multiline}
+        list.txt --encoder libx265 --chunks 8
+
+    # how should the cores be split between parallel encodes? try a few 20 second encodes to find out
+    python {filepath} {shell_multiline}
+        list.txt --benchmark 20
 '''
 # stdlib imports
 from __future__ import absolute_import, division
 import os
 import sys
 import re
+import time
 import logging
 import argparse
 import subprocess
+import concurrent.futures
 from collections import OrderedDict
+from typing import List
 
 # 3rd party imports
 
@@ -30,6 +41,9 @@ LIBRARY_DIRPATH = os.path.join(os.path.dirname(SCRIPT_FILEPATH), '../')
 if LIBRARY_DIRPATH not in sys.path:
     sys.path.append(LIBRARY_DIRPATH)
 from library.stdlib import NiceArgparseFormatter
+from library.ffmpeg import DEFAULT_CHUNKS, run_ffmpeg, probe, chunked_encode
+from library.progress import TRACKER, DEFAULT_CONSOLE_INTERVAL
+from library.scheduler import CORE_BUDGET, CPU_COUNT
 
 
 __doc__ = __doc__.format(filepath=__file__, shell_multiline='`' if sys.platform == 'win32' else '\\')
@@ -41,6 +55,114 @@ RESOLUTIONS = {
     '4k': 3840
 }
 FILE_REGEX = re.compile(r"file '(.*)'")
+ENCODERS = OrderedDict([
+    # ffmpeg -hide_banner -h encoder=hevc_nvenc
+    # https://superuser.com/questions/1296374/best-settings-for-ffmpeg-with-nvenc
+    # https://superuser.com/a/1667740 - the hevc_nvenc non existent flags
+    ('hevc_nvenc', ['-rc', 'constqp', '-qp', '24', '-preset', 'p7', '-tune', 'hq', '-rc-lookahead', '4']),
+    # roughly the same quality as the nvenc qp 24 for way more cpu, hence the chunks
+    ('libx265', ['-crf', '22', '-preset', 'medium']),
+    ('libx264', ['-crf', '19', '-preset', 'medium']),
+])
+# one encode per file, consumer nvidia cards cap how many nvenc sessions can be open at once
+HARDWARE_ENCODERS = ['hevc_nvenc']
+# what --encoder falls back to when theres no hardware encoder to use
+SOFTWARE_ENCODER = 'libx265'
+ENCODER_TEST_TIMEOUT = 30
+
+
+def encoder_usable(encoder):
+    # type: (str) -> bool
+    '''
+    Description:
+        encode one black frame to nowhere, "ffmpeg -encoders" lists hevc_nvenc in plenty of builds on machines
+        without an nvidia card (or its driver), only actually opening it tells
+    '''
+    args = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-f', 'lavfi', '-i', 'color=black:s=256x256:d=1',
+        '-frames:v', '1', '-c:v', encoder, '-f', 'null', '-',
+    ]
+    try:
+        result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                universal_newlines=True, timeout=ENCODER_TEST_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        LOGGER.debug('%s test encode failed: %s', encoder, e)
+        return False
+    if result.returncode != 0:
+        LOGGER.debug('%s test encode failed: %s', encoder, result.stderr.strip())
+    return result.returncode == 0
+
+
+def default_encoder():
+    # type: () -> str
+    for encoder in HARDWARE_ENCODERS:
+        if encoder_usable(encoder):
+            return encoder
+    LOGGER.warning('%s isnt usable here, encoding with %s instead', ', '.join(HARDWARE_ENCODERS), SOFTWARE_ENCODER)
+    return SOFTWARE_ENCODER
+
+
+def video_args(resolution, framerate, encoder='hevc_nvenc'):
+    # type: (int, int, str) -> List[str]
+    return [
+        # can probably flip this to get 1080 instead of 1920
+        '-vf', f'scale={resolution}:-2,setsar=1:1,fps={framerate}',
+        '-c:v', encoder,
+    ] + ENCODERS[encoder]
+
+
+def convert_args(filepath, output_filepath, resolution, framerate, seconds=None, encoder='hevc_nvenc'):
+    # type: (str, str, int, int, float, str) -> List[str]
+    cmd = [
+        'ffmpeg', '-y',
+    ]
+    if seconds:
+        cmd += ['-t', str(seconds)]
+    cmd += ['-i', filepath]
+    cmd += video_args(resolution, framerate, encoder=encoder)
+    cmd += ['-c:a', 'copy']
+    if output_filepath == os.devnull:
+        cmd += ['-f', 'null', '-']
+    else:
+        cmd += [output_filepath]
+    return cmd
+
+
+def benchmark(filepaths, resolution, framerate, seconds, cores=CPU_COUNT, encoder='hevc_nvenc'):
+    # type: (List[str], int, int, float, int, str) -> List[dict]
+    '''
+    Description:
+        encode the first seconds of the inputs as 1 job x all the cores, 2 jobs x half, ... N jobs x 1 and log
+        the media seconds per wall second of each split, the best one is what the core budget should aim for
+    '''
+    splits = []
+    jobs = 1
+    while jobs <= cores:
+        splits.append(jobs)
+        jobs *= 2
+    if splits[-1] != cores:
+        splits.append(cores)
+
+    results = []
+    for jobs in splits:
+        threads = max(1, cores // jobs)
+        inputs = [filepaths[j % len(filepaths)] for j in range(jobs)]
+        started = time.time()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(run_ffmpeg, convert_args(filepath, os.devnull, resolution, framerate, seconds=seconds, encoder=encoder), filepath, duration=seconds, label=f'benchmark {jobs}x{threads}', threads=threads)
+                for filepath in inputs
+            ]
+            exit_codes = [future.result()[0] for future in futures]
+        elapsed = time.time() - started
+        if any(exit_codes):
+            raise RuntimeError(f'benchmark encode failed with {jobs} jobs x {threads} threads!')
+        throughput = jobs * seconds / elapsed
+        LOGGER.info('BENCHMARK - %2d jobs x %2d threads: %0.1fs wall, %0.2fx realtime', jobs, threads, elapsed, throughput)
+        results.append(dict(jobs=jobs, threads=threads, elapsed=elapsed, throughput=throughput))
+    best = max(results, key=lambda result: result['throughput'])
+    LOGGER.info('BENCHMARK - best split is %d jobs x %d threads @ %0.2fx realtime', best['jobs'], best['threads'], best['throughput'])
+    return results
 
 
 if __name__ == '__main__':
@@ -49,6 +171,12 @@ if __name__ == '__main__':
     parser.add_argument('--resolution', type=str, default='4k', choices=RESOLUTIONS, help='resolution?')
     parser.add_argument('--framerate', type=str, default=60, help='framerate?')
     parser.add_argument('--output', type=str, help='explicit output_filepath?')
+    parser.add_argument('-pj', '--progress-jsonl', type=str, help='append per-job ffmpeg progress and overall throughput / ETA to this file as json lines')
+    parser.add_argument('-pi', '--progress-interval', type=float, default=DEFAULT_CONSOLE_INTERVAL, help='seconds between console progress lines')
+    parser.add_argument('--cores', type=int, default=CPU_COUNT, help='cores shared between every ffmpeg child, 0 lets each child take all of them')
+    parser.add_argument('--encoder', type=str, choices=list(ENCODERS), help=f'hevc_nvenc needs an nvidia gpu, the rest are software, default {HARDWARE_ENCODERS} if a test encode works, otherwise {SOFTWARE_ENCODER}')
+    parser.add_argument('--chunks', type=int, help=f'split each file at its keyframes into this many pieces and encode them at once, 1 for a single encode per file, default {DEFAULT_CHUNKS} for the software encoders and always 1 for {HARDWARE_ENCODERS}')
+    parser.add_argument('--benchmark', type=float, help='instead of converting, encode this many seconds of the inputs with different jobs x threads splits and report the throughput of each')
     parser.add_argument('-ll', '--log-level', type=str, default='INFO', help='log level plz?')
 
     args = parser.parse_args()
@@ -58,6 +186,16 @@ if __name__ == '__main__':
     else:
         log_fmt = '%(asctime)s - %(levelname)10s - %(name)s - %(message)s'
     logging.basicConfig(level=args.log_level, format=log_fmt)
+    TRACKER.configure(jsonl_filepath=args.progress_jsonl, console_interval=args.progress_interval)
+    CORE_BUDGET.configure(args.cores)
+    if args.encoder is None:
+        args.encoder = default_encoder()
+    if args.encoder in HARDWARE_ENCODERS:
+        if args.chunks and args.chunks > 1:
+            LOGGER.warning('%s only gets a few sessions at once, ignoring --chunks %d', args.encoder, args.chunks)
+        args.chunks = 1
+    elif args.chunks is None:
+        args.chunks = DEFAULT_CHUNKS
 
     LOGGER.info('starting...')
 
@@ -91,6 +229,11 @@ if __name__ == '__main__':
             renamed = f'{left}-{resolution}-{args.framerate}fps{ext}'
             filepaths[filepath] = renamed
 
+    if args.benchmark:
+        LOGGER.info('benchmarking...')
+        benchmark(list(filepaths), resolution, args.framerate, args.benchmark, cores=args.cores or CPU_COUNT, encoder=args.encoder)
+        sys.exit(0)
+
     LOGGER.info('preparing...')
     converted_list_filepath = f'{args.list_txt}-converted'
     with open(converted_list_filepath, 'w', encoding='utf-8') as w:
@@ -102,22 +245,15 @@ if __name__ == '__main__':
         renamed = filepaths[filepath]
         LOGGER.info('converting %d / %d "%s" @ %s %sfps', f + 1, len(filepaths), filepath, args.resolution, args.framerate)
 
-        cmd = [
-            # ffmpeg -hide_banner -h encoder=hevc_nvenc
-            'ffmpeg', '-y',
-            '-i', filepath,
-            # can probably flip this to get 1080 instead of 1920
-            '-vf', f'scale={resolution}:-2,setsar=1:1,fps={args.framerate}',
-            '-c:v', 'hevc_nvenc',
-            # https://superuser.com/questions/1296374/best-settings-for-ffmpeg-with-nvenc
-            # https://superuser.com/a/1667740 - the hevc_nvenc non existent flags
-            '-rc', 'constqp', '-qp', '24', '-preset', 'p7', '-tune', 'hq', '-rc-lookahead', '4',
-            '-c:a', 'copy',
-            renamed
-        ]
-        command = subprocess.list2cmdline(cmd)
-        LOGGER.info(command)
-        subprocess.check_call(cmd)
+        if args.chunks > 1:
+            exit_code = chunked_encode(filepath, renamed, video_args(resolution, args.framerate, encoder=args.encoder), chunks=args.chunks, cores=args.cores or CPU_COUNT)
+        else:
+            cmd = convert_args(filepath, renamed, resolution, args.framerate, encoder=args.encoder)
+            command = subprocess.list2cmdline(cmd)
+            LOGGER.info(command)
+            exit_code, _, _ = run_ffmpeg(cmd, renamed, duration=probe(filepath).duration)
+        if exit_code != 0:
+            raise RuntimeError(f'failed converting "{filepath}"!')
 
     LOGGER.info('concatting...')
     cmd = [
@@ -130,6 +266,8 @@ if __name__ == '__main__':
     ]
     command = subprocess.list2cmdline(cmd)
     LOGGER.info(command)
-    subprocess.check_call(cmd)
+    exit_code, _, _ = run_ffmpeg(cmd, args.output, duration=sum(probe(filepath).duration for filepath in filepaths))
+    if exit_code != 0:
+        raise RuntimeError(f'failed concatting into "{args.output}"!')
 
     LOGGER.info('done!')
@@ -16,13 +16,13 @@ Example:
 from __future__ import absolute_import, division
 import os
 import sys
+import glob
 import json
 import shutil
 import logging
 import argparse
-import multiprocessing
-import concurrent.futures
-from typing import List
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 # 3rd party imports
 import yaml
@@ -33,16 +33,20 @@ LIBRARY_DIRPATH = os.path.join(os.path.dirname(SCRIPT_FILEPATH), '../')
 if LIBRARY_DIRPATH not in sys.path:
     sys.path.append(LIBRARY_DIRPATH)
 import library
-from library.stdlib import NiceArgparseFormatter, indent, run_subprocess, find_common_directory
+from library.stdlib import NiceArgparseFormatter, CANCEL_TOKEN, CancelledError, indent, find_common_directory
 from library.media import Video, ARTIST_DB
-from library.ffmpeg import trim_args, mp3_args, generate_thumbnails, generate_gif
+from library.ffmpeg import AUDIO_FORMATS, trim_args, mp3_args, trim_mp3_args, smart_cut, generate_thumbnails, generate_gif_from_video, thumbnail_timestamp, probe, probe_many, run_ffmpeg
+from library.progress import TRACKER, DEFAULT_CONSOLE_INTERVAL
 from library.mp3 import tag_mp3
+from library.devices import DEFAULT_DEVICE_LIMIT, describe, device_id
+from library.journal import journal_for
+from library.materialize import materialize
+from library.scheduler import CORE_BUDGET, CPU_COUNT, DEFAULT_LIMITS, DEFAULT_ADAPTIVE_INTERVAL, THROTTLED_RESOURCES, DONE, AdaptiveController, Scheduler, Task, parse_limits
 
 __doc__ = __doc__.format(
     filepath=__file__,
     shell_multiline='`' if sys.platform == 'win32' else '\\')
 LOGGER = logging.getLogger(__name__)
-MAX_WORKERS = multiprocessing.cpu_count()
 with open(os.path.join(os.path.dirname(library.__file__),
                        'youtube_description.template'),
           encoding='utf-8') as r:
@@ -50,102 +54,469 @@ with open(os.path.join(os.path.dirname(library.__file__),
 MODES = ['trim', 'mp3', 'tag', 'thumb', 'gif', 'market', 'yt']
 
 
-def pipeline(video, modes=None):
-    # type: (Video, list) -> int
-    modes = modes or MODES
+def timestamp_seconds(timestamp):
+    # type: (Optional[str]) -> Optional[float]
+    '''
+    Description:
+        "1:02:03.5" / "62:03" / "90" -> seconds, the same forms ffmpeg -ss takes, None for no timestamp
+    '''
+    if not timestamp:
+        return None
+    seconds = 0.0
+    for token in str(timestamp).strip().split(':'):
+        seconds = seconds * 60 + float(token)
+    return seconds
+
+
+def expected_duration(video):
+    # type: (Video) -> Optional[float]
+    '''
+    Description:
+        seconds of media the trimmed video will have, for the progress ETA only,
+        None (no ETA) rather than failing a stage over a timestamp it cant make sense of
+    '''
+    try:
+        stop = timestamp_seconds(video.stop) or probe(video.filepath).duration
+        start = timestamp_seconds(video.start) or 0.0
+    except Exception as e:
+        LOGGER.debug('%s - no ETA: %s', video, e)
+        return None
+    return max(stop - start, 0.0)
+
+
+def video_output_filepath(video):
+    # type: (Video) -> str
+    return os.path.abspath(
+        os.path.join(video.output_dirpath, video.video_filename))
+
+
+def audio_output_filepath(video):
+    # type: (Video) -> str
+    return os.path.abspath(
+        os.path.join(video.output_dirpath, video.audio_filename))
+
+
+def extra_audio_outputs(video, context):
+    # type: (Video, dict) -> List[Tuple[str, str]]
+    '''
+    Description:
+        (filepath, format) for every --audio-formats, next to the mp3 with the same name
+    '''
+    stem = os.path.splitext(audio_output_filepath(video))[0]
+    return [(f'{stem}.{fmt}', fmt) for fmt in context.get('audio_formats') or []]
+
+
+def mp3_arguments(video, context):
+    # type: (Video, dict) -> dict
+    return dict(bitrate=video.bitrate,
+                sampling_frequency=48000,
+                audio_formats=list(context.get('audio_formats') or []))
+
+
+def thumbnail_output_dirpath(video):
+    # type: (Video) -> str
+    return os.path.join(video.output_dirpath, 'thumbnails')
+
+
+def stage_key(video, stage):
+    # type: (Video, str) -> str
+    # several performances can share an output directory, and so a journal
+    return f'{video.video_filename}:{stage}'
+
+
+def is_current(video, stage, topic, context, inputs, arguments):
+    # type: (Video, str, str, dict, List[str], dict) -> bool
+    '''
+    Description:
+        Make-style, the stage already ran on these inputs with these arguments and its outputs are untouched
+    '''
+    if context.get('force'):
+        return False
+    journal = journal_for(video.output_dirpath)
+    if journal.is_current(stage_key(video, stage), inputs, arguments):
+        LOGGER.info('%s - CURRENT, SKIPPING', topic)
+        return True
+    return False
+
+
+def record(video, stage, inputs, arguments, outputs):
+    # type: (Video, str, List[str], dict, List[str]) -> None
+    journal_for(video.output_dirpath).record(stage_key(video, stage), inputs,
+                                             arguments, outputs)
+
+
+def find_thumbnails(video, context):
+    # type: (Video, dict) -> List[str]
+    '''
+    Description:
+        the thumbnails the thumb stage made this run, otherwise the ones an earlier run journaled,
+        otherwise whatever looks like a thumbnail in the thumbnail directory
+    '''
+    if context.get('thumbnail_filepaths') is not None:
+        return context['thumbnail_filepaths']
+    thumbnail_dirpath = os.path.abspath(thumbnail_output_dirpath(video))
+    thumbnail_filepaths = [
+        filepath for filepath in journal_for(video.output_dirpath).outputs(
+            stage_key(video, 'thumb'))
+        if os.path.dirname(filepath) == thumbnail_dirpath
+        and os.path.isfile(filepath)
+    ]
+    if not thumbnail_filepaths:
+        thumbnail_filepaths = sorted(
+            glob.glob(os.path.join(thumbnail_dirpath, 'thumbnail-*.*')))
+    return thumbnail_filepaths
+
+
+def trim_arguments(video):
+    # type: (Video) -> dict
+    return dict(start=video.start,
+                stop=video.stop,
+                trim_mode=video.trim_mode or 'copy')
+
+
+def stage_trim(video, context):
+    # type: (Video, dict) -> int
+    topic = f'00 - TRIMMING - {video}'
     os.makedirs(video.output_dirpath, exist_ok=True)
-
-    exit_code = 0
-    if 'trim' in modes:
-        topic = f'00 - TRIMMING - {video}'
-        video_filepath = os.path.abspath(
-            os.path.join(video.output_dirpath, video.video_filename))
-        if not (video.start or video.stop):
-            LOGGER.warning('%s - SKIPPING', topic)
-            os.makedirs(video.output_dirpath, exist_ok=True)
-            video_filepath = os.path.abspath(
-                os.path.join(video.output_dirpath, video.video_filename))
-            shutil.copy2(video.filepath, video_filepath)
+    video_filepath = video_output_filepath(video)
+    inputs = [video.filepath]
+    arguments = trim_arguments(video)
+    if is_current(video, 'trim', topic, context, inputs, arguments):
+        return 0
+    if not (video.start or video.stop):
+        strategy = materialize(video.filepath,
+                               video_filepath,
+                               strategy=video.materialize)
+        LOGGER.warning('%s - SKIPPING, nothing to cut, %s', topic, strategy)
+        record(video, 'trim', inputs, arguments, [video_filepath])
+        return 0
+    LOGGER.info('%s - STARTING, %s', topic, arguments['trim_mode'])
+    with CANCEL_TOKEN.partial(video_filepath):
+        if arguments['trim_mode'] == 'smart':
+            exit_code = smart_cut(video.filepath,
+                                  video_filepath,
+                                  start=timestamp_seconds(video.start),
+                                  stop=timestamp_seconds(video.stop),
+                                  label=f'trim {video}')
         else:
-            LOGGER.info('%s - STARTING', topic)
             args = trim_args(video.filepath, video_filepath, video.start,
                              video.stop)
-            exit_code, _, _ = run_subprocess(args, video_filepath)
-            if exit_code != 0:
-                LOGGER.error('%s - FAILED', topic)
-                return exit_code
-            LOGGER.info('%s - PASSED', topic)
-
-    # # video tagging causes conversion to go bad, not sure why.
-    # topic = f'02 - {video} - video tagging'
-    # LOGGER.info('%s - STARTING', topic)
-    # tag_mp3(
-    #     video_filepath,
-    #     auto_detect=False,
-    #     title=video.title,  # thats the only thing we can try
-    # )
-    # LOGGER.info('%s - PASSED', topic)
-
-    if 'mp3' in modes:
-        topic = f'02 - MP3 - {video}'
-        LOGGER.info('%s - STARTING', topic)
-        audio_filepath = os.path.abspath(
-            os.path.join(video.output_dirpath, video.audio_filename))
-        args = mp3_args(video_filepath,
-                        audio_filepath,
-                        bitrate=video.bitrate,
-                        sampling_frequency=48000)
-        exit_code, _, _ = run_subprocess(args, audio_filepath)
+            exit_code, _, _ = run_ffmpeg(args,
+                                         video_filepath,
+                                         duration=expected_duration(video),
+                                         label=f'trim {video}')
+    if exit_code != 0:
+        LOGGER.error('%s - FAILED', topic)
+        return exit_code
+    record(video, 'trim', inputs, arguments, [video_filepath])
+    LOGGER.info('%s - PASSED', topic)
+    return 0
+
+
+# # video tagging causes conversion to go bad, not sure why.
+# topic = f'02 - {video} - video tagging'
+# LOGGER.info('%s - STARTING', topic)
+# tag_mp3(
+#     video_filepath,
+#     auto_detect=False,
+#     title=video.title,  # thats the only thing we can try
+# )
+# LOGGER.info('%s - PASSED', topic)
+
+
+def stage_mp3(video, context):
+    # type: (Video, dict) -> int
+    topic = f'02 - MP3 - {video}'
+    audio_filepath = audio_output_filepath(video)
+    extra_outputs = extra_audio_outputs(video, context)
+    outputs = [audio_filepath] + [filepath for filepath, _ in extra_outputs]
+    inputs = [video_output_filepath(video)]
+    arguments = mp3_arguments(video, context)
+    if is_current(video, 'mp3', topic, context, inputs, arguments):
+        return 0
+    LOGGER.info('%s - STARTING', topic)
+    args = mp3_args(video_output_filepath(video),
+                    audio_filepath,
+                    bitrate=arguments['bitrate'],
+                    sampling_frequency=arguments['sampling_frequency'],
+                    extra_outputs=extra_outputs)
+    with CANCEL_TOKEN.partial(*outputs):
+        exit_code, _, _ = run_ffmpeg(args,
+                                     audio_filepath,
+                                     duration=expected_duration(video),
+                                     label=f'mp3 {video}')
+    if exit_code != 0:
+        LOGGER.error('%s - FAILED', topic)
+        return exit_code
+    record(video, 'mp3', inputs, arguments, outputs)
+    LOGGER.info('%s - PASSED', topic)
+    return 0
+
+
+def stage_trim_mp3(video, context):
+    # type: (Video, dict) -> int
+    '''
+    Description:
+        trim and mp3 out of one ffmpeg reading the source once, journaled as the two stages it stands in for,
+        so a later unfused run (or a bitrate change) only redoes whichever half went stale
+    '''
+    topic = f'00 - TRIMMING + MP3 - {video}'
+    os.makedirs(video.output_dirpath, exist_ok=True)
+    video_filepath = video_output_filepath(video)
+    audio_filepath = audio_output_filepath(video)
+    extra_outputs = extra_audio_outputs(video, context)
+    trim_inputs = [video.filepath]
+    arguments = trim_arguments(video)
+    if not (video.start or video.stop) or arguments['trim_mode'] == 'smart':
+        # nothing to cut and materializing the source beats a remux, or a smart cut which is several ffmpegs anyway
+        return stage_trim(video, context) or stage_mp3(video, context)
+    if not context.get('force') and journal_for(video.output_dirpath).is_current(
+            stage_key(video, 'trim'), trim_inputs, arguments):
+        # only the audio went stale, the trimmed copy is a smaller read than the source
+        return stage_mp3(video, context)
+    LOGGER.info('%s - STARTING', topic)
+    mp3_inputs = [video_filepath]
+    audio_arguments = mp3_arguments(video, context)
+    args = trim_mp3_args(video.filepath,
+                         video_filepath,
+                         audio_filepath,
+                         start=video.start,
+                         stop=video.stop,
+                         bitrate=audio_arguments['bitrate'],
+                         sampling_frequency=audio_arguments['sampling_frequency'],
+                         extra_outputs=extra_outputs)
+    audio_outputs = [audio_filepath] + [filepath for filepath, _ in extra_outputs]
+    with CANCEL_TOKEN.partial(video_filepath, *audio_outputs):
+        exit_code, _, _ = run_ffmpeg(args,
+                                     video_filepath,
+                                     duration=expected_duration(video),
+                                     label=f'trim + mp3 {video}')
+    if exit_code != 0:
+        LOGGER.error('%s - FAILED', topic)
+        return exit_code
+    record(video, 'trim', trim_inputs, arguments, [video_filepath])
+    record(video, 'mp3', mp3_inputs, audio_arguments, audio_outputs)
+    LOGGER.info('%s - PASSED', topic)
+    return 0
+
+
+def stage_tag(video, context):
+    # type: (Video, dict) -> int
+    topic = f'03 - TAGGING - {video}'
+    audio_filepath = audio_output_filepath(video)
+    arguments = dict(
+        title=video.title,
+        artist=video.artist,
+        album=video.album,
+        year=video.year,
+        genre=video.genre,
+        track_num=video.track_num,
+        cover=video.cover,
+    )
+    # tagging edits the mp3 in place, so the mp3 is its output, and a fresh mp3 means retagging
+    inputs = [video.cover] if video.cover else []
+    if is_current(video, 'tag', topic, context, inputs, arguments):
+        return 0
+    LOGGER.info('%s - STARTING', topic)
+    tag_mp3(audio_filepath, auto_detect=False, **arguments)
+    record(video, 'tag', inputs, arguments, [audio_filepath])
+    journal_for(video.output_dirpath).restamp(stage_key(video, 'mp3'))
+    LOGGER.info('%s - PASSED', topic)
+    return 0
+
+
+def stage_thumb(video, context, keyframes=False):
+    # type: (Video, dict, bool) -> int
+    topic = f'04 - THUMBNAILS - {video}'
+    inputs = [video_output_filepath(video)]
+    arguments = dict(samples=250, keep=50, keyframes=keyframes)
+    if is_current(video, 'thumb', topic, context, inputs, arguments):
+        return 0
+    LOGGER.info('%s - STARTING', topic)
+    thumbnail_filepaths = generate_thumbnails(video_output_filepath(video),
+                                              thumbnail_output_dirpath(video),
+                                              **arguments)
+    outputs = list(thumbnail_filepaths)
+    for thumbnail_filepath in thumbnail_filepaths[0:3]:
+        shutil.copy(thumbnail_filepath, video.output_dirpath)
+        outputs.append(
+            os.path.join(video.output_dirpath,
+                         os.path.basename(thumbnail_filepath)))
+    context['thumbnail_filepaths'] = thumbnail_filepaths
+    record(video, 'thumb', inputs, arguments, outputs)
+    LOGGER.info('%s - PASSED', topic)
+    return 0
+
+
+def stage_gif(video, context, keyframes=False):
+    # type: (Video, dict, bool) -> int
+    topic = f'05 - GIF - {video}'
+    gif_filepath = os.path.join(video.output_dirpath,
+                                f'{video.video_filename}.gif')
+    thumbnail_filepaths = find_thumbnails(video, context)
+    if not thumbnail_filepaths:
+        LOGGER.error(
+            '%s - FAILED, no thumbnails in "%s", run the thumb mode first',
+            topic, thumbnail_output_dirpath(video))
+        return 1
+    # the thumbnail filenames are rounded to the hundredth, back up so the same frame gets selected
+    timestamps = sorted(
+        thumbnail_timestamp(thumbnail_filepath) - 0.005
+        for thumbnail_filepath in thumbnail_filepaths)
+    inputs = [video_output_filepath(video)]
+    arguments = dict(timestamps=timestamps,
+                     delay=10,
+                     megabytes=16,
+                     keyframes=keyframes)
+    if is_current(video, 'gif', topic, context, inputs, arguments):
+        return 0
+    LOGGER.info('%s - STARTING', topic)
+    passed = generate_gif_from_video(video_output_filepath(video),
+                                     output_filepath=gif_filepath,
+                                     **arguments)
+    if not passed:
+        LOGGER.error('%s - FAILED', topic)
+        return 1
+    record(video, 'gif', inputs, arguments, [gif_filepath])
+    LOGGER.info('%s - PASSED', topic)
+    return 0
+
+
+# stage: (function, resource class, upstream stages), in the order a single video walks through them
+STAGES = OrderedDict([
+    ('trim', (stage_trim, 'disk', [])),
+    ('mp3', (stage_mp3, 'encode', ['trim'])),
+    ('tag', (stage_tag, 'light', ['mp3'])),
+    ('thumb', (stage_thumb, 'decode', ['trim'])),
+    ('gif', (stage_gif, 'decode', ['trim', 'thumb'])),
+])
+# fused stage: (function, resource class, the STAGES it stands in for)
+FUSED_STAGES = OrderedDict([
+    ('trim+mp3', (stage_trim_mp3, 'encode', ['trim', 'mp3'])),
+])
+KEYFRAME_STAGES = ['thumb', 'gif']
+
+
+def plan_stages(modes, fuse=True):
+    # type: (list, bool) -> OrderedDict
+    '''
+    Description:
+        the selected STAGES in order, and if fuse, any FUSED_STAGES whose stages were all selected swapped in for them
+    Returns:
+        OrderedDict
+            stage -> (function, resource class, upstream stages), like STAGES
+    '''
+    plan = OrderedDict(
+        (stage, spec) for stage, spec in STAGES.items() if stage in modes)
+    if not fuse:
+        return plan
+    for fused, (func, resource, covers) in FUSED_STAGES.items():
+        if not all(stage in plan for stage in covers):
+            continue
+        upstream = [
+            dep for stage in covers for dep in plan[stage][2]
+            if dep not in covers
+        ]
+        fused_plan = OrderedDict()
+        for stage, (stage_func, stage_resource, stage_upstream) in plan.items():
+            if stage in covers:
+                fused_plan.setdefault(fused, (func, resource, upstream))
+                continue
+            fused_plan[stage] = (stage_func, stage_resource, [
+                fused if dep in covers else dep for dep in stage_upstream
+            ])
+        plan = fused_plan
+    return plan
+
+
+def stage_input(stage, video):
+    # type: (str, Video) -> Optional[str]
+    '''
+    Description:
+        the big file a stage streams start to finish, None if it doesnt really read anything
+    '''
+    if stage in ('trim', 'trim+mp3'):
+        return video.filepath
+    if stage in ('mp3', 'thumb', 'gif'):
+        return video_output_filepath(video)
+    return None
+
+
+def pipeline(video, modes=None, keyframes=False, force=False, fuse=True, audio_formats=None):
+    # type: (Video, list, bool, bool, bool, Optional[List[str]]) -> int
+    modes = modes or MODES
+    os.makedirs(video.output_dirpath, exist_ok=True)
+
+    context = dict(force=force, audio_formats=audio_formats)
+    for stage, (func, _, _) in plan_stages(modes, fuse=fuse).items():
+        kwargs = dict(keyframes=keyframes) if stage in KEYFRAME_STAGES else {}
+        exit_code = func(video, context, **kwargs)
         if exit_code != 0:
-            LOGGER.error('%s - FAILED', topic)
             return exit_code
-        LOGGER.info('%s - PASSED', topic)
-
-    if 'tag' in modes:
-        topic = f'03 - TAGGING - {video}'
-        LOGGER.info('%s - STARTING', topic)
-        tag_mp3(
-            audio_filepath,
-            auto_detect=False,
-            title=video.title,
-            artist=video.artist,
-            album=video.album,
-            year=video.year,
-            genre=video.genre,
-            track_num=video.track_num,
-            cover=video.cover,
-        )
-        LOGGER.info('%s - PASSED', topic)
-
-    if 'thumb' in modes:
-        topic = f'04 - THUMBNAILS - {video}'
-        LOGGER.info('%s - STARTING', topic)
-        thumbnail_dirpath = os.path.join(video.output_dirpath, 'thumbnails')
-        thumbnail_filepaths = generate_thumbnails(video_filepath,
-                                                  thumbnail_dirpath,
-                                                  samples=250,
-                                                  keep=50)
-        for thumbnail_filepath in thumbnail_filepaths[0:3]:
-            shutil.copy(thumbnail_filepath, video.output_dirpath)
-        LOGGER.info('%s - PASSED', topic)
-
-    if 'gif' in modes:
-        topic = f'05 - GIF - {video}'
-        LOGGER.info('%s - STARTING', topic)
-        gif_filepath = os.path.join(video.output_dirpath,
-                                    f'{video.video_filename}.gif')
-        passed = generate_gif(thumbnail_filepaths,
-                              gif_filepath,
-                              delay=10,
-                              megabytes=16)
-        if passed:
-            LOGGER.info('%s - PASSED', topic)
-        else:
-            LOGGER.error('%s - FAILED', topic)
-            exit_code = 1
 
     LOGGER.info('%s - FINISHED!!!', video)
-    return exit_code
+    return 0
+
+
+def schedule_pipelines(scheduler,
+                       videos,
+                       modes=None,
+                       keyframes=False,
+                       force=False,
+                       fuse=True,
+                       audio_formats=None):
+    # type: (Scheduler, List[Video], list, bool, bool, bool, Optional[List[str]]) -> Dict[int, List[str]]
+    '''
+    Description:
+        add every selected stage of every video to the scheduler, a stage only waits on the upstream stages
+        that were also selected, anything else is assumed to already be on disk
+    Returns:
+        Dict[int, List[str]]
+            video index -> its task names
+    '''
+    modes = modes or MODES
+    plan = plan_stages(modes, fuse=fuse)
+    video_tasks = {}
+    for v, video in enumerate(videos):
+        context = dict(force=force, audio_formats=audio_formats)
+        task_names = {}
+        for stage, (func, resource, upstream) in plan.items():
+            task_names[stage] = f'{stage} - #{v} {video}'
+            kwargs = dict(keyframes=keyframes) if stage in KEYFRAME_STAGES else {}
+            input_filepath = stage_input(stage, video)
+            scheduler.add(
+                Task(task_names[stage],
+                     func,
+                     resource=resource,
+                     deps=[task_names[dep] for dep in upstream if dep in task_names],
+                     args=(video, context),
+                     kwargs=kwargs,
+                     device=device_id(input_filepath) if input_filepath else None,
+                     prefetch=input_filepath))
+        video_tasks[v] = list(task_names.values())
+    return video_tasks
+
+
+def probe_videos(videos):
+    # type: (List[Video]) -> List[str]
+    '''
+    Description:
+        probe every source on one event loop (the probe cache makes reruns near instant) and let the videos
+        fill in / cross check their resolution, fps, codec, and bitrate
+    Returns:
+        List[str]
+            problems
+    '''
+    problems = []
+    for video, probed in zip(videos,
+                             probe_many([video.filepath for video in videos])):
+        if isinstance(probed, Exception):
+            problems.append(f'{video} could not be probed: "{probed}"!')
+            continue
+        LOGGER.debug('%s probed as %r', video, probed)
+        for problem in video.apply_probe(probed):
+            problems.append(f'{problem} in "{video.filepath}"')
+    return problems
 
 
 def trim_tag_convert_marketing_yt(
@@ -155,8 +526,17 @@ def trim_tag_convert_marketing_yt(
         marketing_filepath=None,
         cwd=os.getcwd(),
         modes=None,
+        keyframes=False,
+        limits=None,
+        adaptive=None,
+        device_limit=DEFAULT_DEVICE_LIMIT,
+        prefetch=False,
+        keep_going=False,
+        force=False,
+        fuse=True,
+        audio_formats=None,
 ):
-    # type: (list, bool, bool, str, str, list) -> int
+    # type: (list, bool, bool, str, str, list, bool, Optional[Dict[str, int]], Optional[float], Optional[int], bool, bool, bool, bool, Optional[List[str]]) -> int
     modes = modes or MODES
 
     manifests = []
@@ -197,6 +577,17 @@ def trim_tag_convert_marketing_yt(
             continue
         video.track_num = v + 1
 
+    problems.extend(probe_videos(videos))
+
+    # which drives the sources stream from decides how many of them can stream at once
+    drives = OrderedDict()
+    for video in videos:
+        drive = describe(video.filepath)
+        if drive:
+            drives[drive] = drives.get(drive, 0) + 1
+    for drive, count in drives.items():
+        LOGGER.info('%d source(s) on %s', count, drive)
+
     # let the user know these will be the outputs in a tree
     LOGGER.info('proposed output tree will be as follows:')
     for v, video in enumerate(videos):
@@ -237,39 +628,58 @@ def trim_tag_convert_marketing_yt(
             return 2
 
     # run the pipeline
-    return_code = None
+    return_code = 0
     if sequential:
         LOGGER.warning('running in sequential mode!')
         for video in videos:
-            exit_code = pipeline(video, modes=modes)
+            try:
+                exit_code = pipeline(video,
+                                     modes=modes,
+                                     keyframes=keyframes,
+                                     force=force,
+                                     fuse=fuse,
+                                     audio_formats=audio_formats)
+            except CancelledError:
+                raise
+            except Exception:
+                if not keep_going:
+                    raise
+                LOGGER.exception('%s - exception!', video)
+                exit_code = 1
             if exit_code != 0:
                 return_code = exit_code
-                break
-    else:
-        with concurrent.futures.ThreadPoolExecutor(
-                max_workers=MAX_WORKERS) as executor:
-            # Start the load operations and mark each future with its URL
-            future_to_exit_code = {
-                executor.submit(pipeline, video, modes=modes): video
-                for video in videos
-            }
-            for future in concurrent.futures.as_completed(future_to_exit_code):
-                exit_code = -1
-                video = future_to_exit_code[future]
-                try:
-                    exit_code = future.result()
-                    return_code = exit_code
-                except Exception:
-                    LOGGER.exception('%r exception!', video)
-                    return_code = 1
+                if not keep_going:
                     break
-                else:
-                    if exit_code != 0:
-                        LOGGER.error('%s failed with exit code %d!', video,
-                                     exit_code)
-                    else:
-                        LOGGER.info('%s succeeded with exit code %d!', video,
-                                    exit_code)
+    else:
+        controller = None
+        if adaptive:
+            limits = limits or DEFAULT_LIMITS
+            controller = AdaptiveController(
+                sum(limits[resource] for resource in THROTTLED_RESOURCES),
+                interval=adaptive)
+        scheduler = Scheduler(limits=limits,
+                              controller=controller,
+                              device_limit=device_limit,
+                              prefetch=prefetch,
+                              keep_going=keep_going)
+        video_tasks = schedule_pipelines(scheduler,
+                                         videos,
+                                         modes=modes,
+                                         keyframes=keyframes,
+                                         force=force,
+                                         fuse=fuse,
+                                         audio_formats=audio_formats)
+        tasks = scheduler.run()
+        for v, task_names in video_tasks.items():
+            states = [tasks[task_name].state for task_name in task_names]
+            if all(state == DONE for state in states):
+                LOGGER.info('%s succeeded!', videos[v])
+                continue
+            return_code = 1
+            for task_name in task_names:
+                task = tasks[task_name]
+                if task.state != DONE:
+                    LOGGER.error('%s - %s', task_name, task.state)
 
     if return_code != 0:
         return return_code
@@ -392,6 +802,92 @@ def main():
                         choices=MODES,
                         default=MODES,
                         help='only generate the following modes')
+    parser.add_argument(
+        '-pj',
+        '--progress-jsonl',
+        type=str,
+        help='append per-job ffmpeg progress and overall throughput / ETA to this file as json lines')
+    parser.add_argument('-pi',
+                        '--progress-interval',
+                        type=float,
+                        default=DEFAULT_CONSOLE_INTERVAL,
+                        help='seconds between console progress lines')
+    parser.add_argument(
+        '-kf',
+        '--keyframes',
+        action='store_true',
+        help=
+        'thumbnails (and so the gif) only sample keyframes, way faster but not frame accurate'
+    )
+    parser.add_argument(
+        '-l',
+        '--limits',
+        type=str,
+        nargs='+',
+        default=[],
+        help=
+        f'concurrency per resource class like "decode=2 disk=1", defaults {DEFAULT_LIMITS}'
+    )
+    parser.add_argument(
+        '-a',
+        '--adaptive',
+        type=float,
+        nargs='?',
+        const=DEFAULT_ADAPTIVE_INTERVAL,
+        help=
+        'every this many seconds, raise or lower how many heavy stages run at once based on throughput, '
+        'load, iowait, and free memory, linux only'
+    )
+    parser.add_argument(
+        '-dl',
+        '--device-limit',
+        type=int,
+        default=DEFAULT_DEVICE_LIMIT,
+        help=
+        'at most this many stages streaming from any one drive at once, 0 for no limit'
+    )
+    parser.add_argument(
+        '--prefetch',
+        action='store_true',
+        help=
+        'as each stage starts, have the kernel start reading the next queued file (linux / posix_fadvise only)'
+    )
+    parser.add_argument(
+        '-k',
+        '--keep-going',
+        action='store_true',
+        help=
+        'a failed stage only skips whats downstream of it, otherwise the first failure kills every running child '
+        'and drops everything else'
+    )
+    parser.add_argument(
+        '-f',
+        '--force',
+        action='store_true',
+        help=
+        'redo every stage, even the ones the output directory journal says are already current'
+    )
+    parser.add_argument(
+        '--no-fuse',
+        action='store_true',
+        help=
+        'run trim and mp3 as two ffmpegs (the mp3 decoding the trimmed copy) instead of one reading the source once'
+    )
+    parser.add_argument(
+        '-af',
+        '--audio-formats',
+        type=str,
+        nargs='+',
+        choices=list(AUDIO_FORMATS),
+        default=[],
+        help='also encode these next to the mp3, from the same decode')
+    parser.add_argument(
+        '--cores',
+        type=int,
+        default=CPU_COUNT,
+        help=
+        'cores shared between every ffmpeg / imagemagick child, 0 lets each child take all of them'
+    )
 
     args = parser.parse_args()
 
@@ -400,6 +896,9 @@ def main():
     else:
         log_fmt = '%(asctime)s - %(levelname)10s - %(name)s - %(message)s'
     logging.basicConfig(level=args.log_level, format=log_fmt)
+    TRACKER.configure(jsonl_filepath=args.progress_jsonl,
+                      console_interval=args.progress_interval)
+    CORE_BUDGET.configure(args.cores)
 
     try:
         return_code = trim_tag_convert_marketing_yt(
@@ -408,10 +907,23 @@ def main():
             sequential=args.sequential,
             marketing_filepath=args.marketing_filepath,
             modes=args.modes,
+            keyframes=args.keyframes,
+            limits=parse_limits(args.limits),
+            adaptive=args.adaptive,
+            device_limit=args.device_limit,
+            prefetch=args.prefetch,
+            keep_going=args.keep_going,
+            force=args.force,
+            fuse=not args.no_fuse,
+            audio_formats=args.audio_formats,
         )
     except KeyboardInterrupt:
         LOGGER.warning('ctrl + c detected')
+        CANCEL_TOKEN.cancel('ctrl + c')
         return_code = 2
+    except CancelledError as e:
+        LOGGER.warning('cancelled: %s', e)
+        return_code = 1
 
     sys.exit(return_code)
 
@@ -0,0 +1,255 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    On-disk caches so re-runs dont have to decode the same multi-GB videos over again.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+import sys
+import json
+import hashlib
+import logging
+import threading
+import contextlib
+from typing import IO, Any, Dict, Iterator, Optional, Tuple
+
+# 3rd party imports
+import numpy as np
+
+# project imports
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_CACHE_DIRPATH = 'C:/temp/youtube-utilities-cache' if sys.platform == 'win32' else '/tmp/youtube-utilities-cache'
+DEFAULT_CACHE_DIRPATH = os.path.abspath(DEFAULT_CACHE_DIRPATH)
+DEFAULT_FRAME_CACHE_BYTES = 2 * 1024**3
+# head, middle, and tail chunks, enough to tell re-exports apart without reading 40GB
+PARTIAL_HASH_BYTES = 1024**2
+
+
+def source_identity(filepath, partial_hash_bytes=PARTIAL_HASH_BYTES):
+    # type: (str, int) -> str
+    '''
+    Description:
+        cheap but trustworthy identity for a big media file: size, mtime, and a hash of a few chunks
+    '''
+    stat = os.stat(filepath)
+    hasher = hashlib.sha1()
+    hasher.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8'))
+    offsets = {0}
+    if stat.st_size > partial_hash_bytes:
+        offsets.add(stat.st_size // 2)
+        offsets.add(stat.st_size - partial_hash_bytes)
+    with open(filepath, 'rb') as rb:
+        for offset in sorted(offsets):
+            rb.seek(offset)
+            hasher.update(rb.read(partial_hash_bytes))
+    return hasher.hexdigest()
+
+
+@contextlib.contextmanager
+def atomic_write(filepath, mode='wb', **kwargs):
+    # type: (str, str, Any) -> Iterator[IO]
+    '''
+    Description:
+        several pipelines write into the same cache at once, never let a reader see half a file.
+        write to a temp file only this process + thread uses, then swap it in, a failed write leaves nothing behind
+    Arguments:
+        filepath: str
+        mode: str
+            default 'wb'
+        kwargs:
+            anything else open takes, like encoding
+    '''
+    temp_filepath = f'{filepath}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_filepath, mode, **kwargs) as w:
+            yield w
+        os.replace(temp_filepath, filepath)
+    except BaseException:
+        if os.path.isfile(temp_filepath):
+            os.remove(temp_filepath)
+        raise
+
+
+def atomic_save_npz(filepath, **arrays):
+    # type: (str, np.ndarray) -> None
+    with atomic_write(filepath) as wb:
+        np.savez(wb, **arrays)
+
+
+def atomic_save_npy(filepath, array):
+    # type: (str, np.ndarray) -> None
+    with atomic_write(filepath) as wb:
+        np.save(wb, array)
+
+
+class JsonCache(object):
+    '''
+    Description:
+        small json blobs keyed by whatever identifies them, one file each
+    '''
+
+    def __init__(self, dirpath):
+        # type: (str) -> None
+        self.dirpath = os.path.abspath(dirpath)
+
+    def filepath(self, *key):
+        # type: (Any) -> str
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.dirpath, f'{digest}.json')
+
+    def get(self, *key):
+        # type: (Any) -> Optional[Any]
+        try:
+            with open(self.filepath(*key), encoding='utf-8') as r:
+                return json.load(r)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, value, *key):
+        # type: (Any, Any) -> None
+        filepath = self.filepath(*key)
+        os.makedirs(self.dirpath, exist_ok=True)
+        with atomic_write(filepath, 'w', encoding='utf-8') as w:
+            json.dump(value, w)
+
+
+class FrameCache(object):
+    '''
+    Description:
+        sampled working size frames and their raw scores, one .npz per
+        (source identity, requested timestamp, working width, keyframes), least recently used goes first
+    '''
+
+    def __init__(self,
+                 dirpath=os.path.join(DEFAULT_CACHE_DIRPATH, 'frames'),
+                 max_bytes=DEFAULT_FRAME_CACHE_BYTES):
+        # type: (str, int) -> None
+        self.dirpath = os.path.abspath(dirpath)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def filepath(self, source_id, timestamp, width, keyframes):
+        # type: (str, float, int, bool) -> str
+        mode = 'key' if keyframes else 'all'
+        return os.path.join(self.dirpath, source_id,
+                            f'{width}-{mode}-{timestamp:0.3f}.npz')
+
+    def get(self, source_id, timestamp, width, keyframes):
+        # type: (str, float, int, bool) -> Optional[Tuple[float, np.ndarray, Dict[str, float]]]
+        '''
+        Returns:
+            Optional[Tuple[float, np.ndarray, Dict[str, float]]]
+                None on a miss, otherwise the actual timestamp, the frame, and whatever raw scores were saved
+        '''
+        filepath = self.filepath(source_id, timestamp, width, keyframes)
+        try:
+            with np.load(filepath) as npz:
+                actual_timestamp = float(npz['timestamp'])
+                frame = npz['frame']
+                scores = {
+                    key[len('score_'):]: float(npz[key])
+                    for key in npz.files if key.startswith('score_')
+                }
+            os.utime(filepath)  # mtime doubles as the LRU clock
+        except (OSError, KeyError, ValueError):
+            return None
+        return actual_timestamp, frame, scores
+
+    def put(self,
+            source_id,
+            timestamp,
+            width,
+            keyframes,
+            actual_timestamp,
+            frame,
+            scores=None):
+        # type: (str, float, int, bool, float, np.ndarray, Optional[Dict[str, float]]) -> None
+        filepath = self.filepath(source_id, timestamp, width, keyframes)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        arrays = dict(timestamp=np.float64(actual_timestamp), frame=frame)
+        for name, score in (scores or {}).items():
+            arrays[f'score_{name}'] = np.float64(score)
+        atomic_save_npz(filepath, **arrays)
+
+    def evict(self):
+        # type: () -> int
+        '''
+        Description:
+            delete the least recently used entries until the cache fits in max_bytes
+        Returns:
+            int
+                bytes freed
+        '''
+        with self._lock:
+            entries = []
+            total = 0
+            for dirpath, _, filenames in os.walk(self.dirpath):
+                for filename in filenames:
+                    filepath = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(filepath)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, filepath))
+                    total += stat.st_size
+            freed = 0
+            for _, size, filepath in sorted(entries):
+                if total - freed <= self.max_bytes:
+                    break
+                try:
+                    os.remove(filepath)
+                except OSError:
+                    continue
+                freed += size
+        if freed:
+            LOGGER.debug('evicted %d bytes from "%s"', freed, self.dirpath)
+        return freed
+
+
+class KeyframeCache(object):
+    '''
+    Description:
+        packet / keyframe indexes, a directory of .npy per source identity, handed back memory mapped
+        so looking something up in a 300k packet index only pages in the few blocks the binary search touches
+    '''
+
+    def __init__(self, dirpath=os.path.join(DEFAULT_CACHE_DIRPATH, 'keyframes')):
+        # type: (str) -> None
+        self.dirpath = os.path.abspath(dirpath)
+
+    def filepath(self, source_id, name):
+        # type: (str, str) -> str
+        return os.path.join(self.dirpath, source_id, f'{name}.npy')
+
+    def get(self, source_id, *names):
+        # type: (str, str) -> Optional[Dict[str, np.ndarray]]
+        '''
+        Returns:
+            Optional[Dict[str, np.ndarray]]
+                None unless every name is there, read only memory maps otherwise
+        '''
+        arrays = {}
+        for name in names:
+            try:
+                arrays[name] = np.load(self.filepath(source_id, name),
+                                       mmap_mode='r',
+                                       allow_pickle=False)
+            except (OSError, ValueError):
+                return None
+        return arrays
+
+    def put(self, source_id, **arrays):
+        # type: (str, np.ndarray) -> None
+        os.makedirs(os.path.join(self.dirpath, source_id), exist_ok=True)
+        for name, array in arrays.items():
+            atomic_save_npy(self.filepath(source_id, name), array)
+
+
+FRAME_CACHE = FrameCache()
+KEYFRAME_CACHE = KeyframeCache()
+PROBE_CACHE = JsonCache(os.path.join(DEFAULT_CACHE_DIRPATH, 'probe'))
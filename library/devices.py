@@ -0,0 +1,105 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Which physical drive a file lives on, and nudging the kernel to start reading it before ffmpeg asks.
+    A spinning disk or a USB stick streams one big file at full speed, but seeks itself to death serving three.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+import logging
+from typing import Optional
+
+# project imports
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_DEVICE_LIMIT = 2
+# WILLNEED on a 40GB file just evicts everything else, a head start is plenty
+DEFAULT_PREFETCH_BYTES = 256 * 1024**2
+FADVISE_INSTALLED = hasattr(os, 'posix_fadvise')
+
+
+def existing_path(path):
+    # type: (str) -> str
+    '''
+    Description:
+        nearest ancestor that exists, outputs dont exist until their stage runs but their drive does
+    '''
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def device_id(path):
+    # type: (str) -> int
+    '''
+    Description:
+        st_dev of the path, or of its nearest existing ancestor
+    '''
+    return os.stat(existing_path(path)).st_dev
+
+
+def mountpoint(path):
+    # type: (str) -> str
+    path = existing_path(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def advise(filepath, advice, length=0):
+    # type: (str, int, int) -> bool
+    '''
+    Description:
+        posix_fadvise the first length bytes (0 is all of it), False wherever fadvise doesnt exist
+    '''
+    if not FADVISE_INSTALLED:
+        return False
+    fd = os.open(filepath, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, length, advice)
+    finally:
+        os.close(fd)
+    return True
+
+
+def prefetch(filepath, length=DEFAULT_PREFETCH_BYTES):
+    # type: (str, int) -> bool
+    '''
+    Description:
+        ask the kernel to start pulling the head of filepath into the page cache, returns right away.
+        SEQUENTIAL only lives on the file descriptor its given, so it cant help another process,
+        WILLNEED fills the page cache that everyone shares
+    Returns:
+        bool
+            whether the advice was given
+    '''
+    if not FADVISE_INSTALLED:
+        return False
+    try:
+        advised = advise(filepath, os.POSIX_FADV_WILLNEED, length=length)
+    except OSError as e:
+        LOGGER.debug('could not prefetch "%s": %s', filepath, e)
+        return False
+    if advised:
+        LOGGER.debug('prefetching %d bytes of "%s" on "%s"', length, filepath,
+                     mountpoint(filepath))
+    return advised
+
+
+def describe(path):
+    # type: (str) -> Optional[str]
+    try:
+        return f'{mountpoint(path)} (dev {device_id(path)})'
+    except OSError:
+        return None
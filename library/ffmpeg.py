@@ -11,17 +11,39 @@ from __future__ import absolute_import
 import os
 import sys
 import re
-import shutil
+import json
 import logging
+import shutil
+import threading
 import tempfile
 import subprocess
-from typing import List
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# 3rd party imports
+import numpy as np
 
 # project imports
-from .media import timestamp_to_seconds
-from .stdlib import run_subprocess
+from .stdlib import TIMEOUT_EXIT_CODE, STALLED_EXIT_CODE, CANCEL_TOKEN, CancelToken, CancelledError, run_subprocess, run_subprocesses
+from .progress import TRACKER, ProgressParser, ProgressTracker
+from .scoring import DEFAULT_WEIGHTS, score_frames
+from .phash import HASH_FUNCTIONS, DEFAULT_HAMMING_THRESHOLD, dedupe
+from .cache import FRAME_CACHE, PROBE_CACHE, FrameCache, JsonCache, source_identity
+from .images import ARGUMENT_LENGTH_LIMIT, DEFAULT_MAGICK_TIMEOUT, DEFAULT_QUALITY, convert_images, magick_env
+from .scheduler import CORE_BUDGET, CPU_COUNT, CoreBudget
+from .keyframes import EPSILON, KeyframeIndex, cut_index, keyframe_index
+from .devices import device_id
 
 LOGGER = logging.getLogger(__name__)
+# a 4K HEVC decode on a small box can run well under realtime, be generous
+TIMEOUT_BASE = 10 * 60
+TIMEOUT_FACTOR = 10
+DEFAULT_STALL_TIMEOUT = 5 * 60
+DEFAULT_RETRIES = 1
+DEFAULT_BACKOFF = 10.0
+# ffprobes in flight per drive, a probe is a few small reads at both ends of the file and past a handful
+# a USB / spinning drive just seeks back and forth between them
+DEFAULT_PROBE_CONCURRENCY = 4
 FFMPEG_INSTALLED = False
 try:
     if sys.platform == 'win32':
@@ -53,11 +75,189 @@ except subprocess.CalledProcessError:
     ) from None
 
 
+# -fps_mode took over from -vsync in 5.1, the 4.4 apt hands out only knows -vsync
+FPS_MODE_VERSION = (5, 1)
+VERSION_REGEX = re.compile(r'ffmpeg version n?(\d+)\.(\d+)')
+_FFMPEG_VERSION = []  # type: List[Optional[Tuple[int, int]]]
+
+
+def ffmpeg_version():
+    # type: () -> Optional[Tuple[int, int]]
+    '''
+    Description:
+        (major, minor) of the ffmpeg on the PATH, asked once,
+        None for git builds ("ffmpeg version N-112345-g...") which are newer than any release
+    '''
+    if not _FFMPEG_VERSION:
+        version = None
+        try:
+            output = subprocess.run(['ffmpeg', '-version'],
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL,
+                                    universal_newlines=True).stdout
+            mo = VERSION_REGEX.search(output)
+            if mo:
+                version = (int(mo.group(1)), int(mo.group(2)))
+        except OSError:
+            pass
+        _FFMPEG_VERSION.append(version)
+    return _FFMPEG_VERSION[0]
+
+
+def fps_mode_args(mode='vfr'):
+    # type: (str) -> List[str]
+    version = ffmpeg_version()
+    if version is not None and version < FPS_MODE_VERSION:
+        return ['-vsync', mode]
+    return ['-fps_mode', mode]
+
+
 def ffmpeg_args(input_filepath):
     args = ['ffmpeg', '-y', '-i', input_filepath]
     return args
 
 
+def with_progress(args):
+    # type: (List[str]) -> List[str]
+    '''
+    Description:
+        machine readable progress on stderr (stdout is sometimes the data), no human readable stats line
+    '''
+    if '-progress' in args:
+        return list(args)
+    return args[0:1] + ['-progress', 'pipe:2', '-nostats'] + args[1:]
+
+
+def with_threads(args, threads):
+    # type: (List[str], int) -> List[str]
+    '''
+    Description:
+        cap filtering and decoding of every input at threads, plus encoding of the last output
+        (the only one doing real encoding work in anything this repo runs), 0 leaves it up to ffmpeg.
+        libx265 ignores -threads and sizes its own pool off every core, so it gets "-x265-params pools=" too
+    '''
+    if not threads or '-threads' in args:
+        return list(args)
+    threads = str(threads)
+    threaded = args[0:1] + [
+        '-filter_threads', threads, '-filter_complex_threads', threads
+    ]
+    x265_params = None
+    for arg in args[1:-1]:
+        if arg == '-i':
+            threaded += ['-threads', threads]
+        if threaded[-1] == '-x265-params' and 'pools=' not in arg:
+            arg = f'{arg}:pools={threads}'
+            x265_params = arg
+        threaded.append(arg)
+    if 'libx265' in args and x265_params is None and '-x265-params' not in args:
+        threaded += ['-x265-params', f'pools={threads}']
+    threaded += ['-threads', threads, args[-1]]
+    return threaded
+
+
+def run_ffmpeg(args,
+               descriptive_filepath_for_stdout,
+               duration=None,
+               label=None,
+               tracker=TRACKER,
+               line_callback=None,
+               timeout=None,
+               stall_timeout=DEFAULT_STALL_TIMEOUT,
+               retries=DEFAULT_RETRIES,
+               backoff=DEFAULT_BACKOFF,
+               on_retry=None,
+               threads=None,
+               budget=CORE_BUDGET,
+               cancel_token=CANCEL_TOKEN,
+               **kwargs):
+    # type: (List[str], str, Optional[float], Optional[str], ProgressTracker, Optional[Callable[[str, str], None]], Optional[float], Optional[float], int, float, Optional[Callable[[], None]], Optional[int], CoreBudget, CancelToken, Any) -> Tuple[int, Any, str]
+    '''
+    Description:
+        run_subprocess for ffmpeg, with -progress parsed into the tracker as it runs and a watchdog on top
+    Arguments:
+        args: List[str]
+        descriptive_filepath_for_stdout: str
+        duration: Optional[float]
+            media seconds the job will produce, drives the ETA and the default timeout
+        label: Optional[str]
+            default basename of descriptive_filepath_for_stdout
+        tracker: ProgressTracker
+            default TRACKER
+        line_callback: Optional[Callable[[str, str], None]]
+            still gets every line, see run_subprocess
+        timeout: Optional[float]
+            default TIMEOUT_BASE + TIMEOUT_FACTOR * duration when there is a duration, otherwise none
+        stall_timeout: Optional[float]
+            default DEFAULT_STALL_TIMEOUT
+            kill it if ffmpeg goes this long without printing anything, -progress reports every half second
+            while input is being read, even when palettegen or a sparse select has nothing to write yet,
+            so out_time / bytes written would look stuck when they arent
+        retries: int
+            default DEFAULT_RETRIES
+            how many more times to try after a timeout or a stall, real failures are never retried
+        backoff: float
+            default DEFAULT_BACKOFF
+            seconds before the first retry, doubling after that
+        on_retry: Optional[Callable[[], None]]
+            called before every retry, reset whatever line_callback has been collecting
+        threads: Optional[int]
+            default a lease from budget
+            0 lets ffmpeg pick, see with_threads
+        budget: CoreBudget
+            default CORE_BUDGET
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+            see run_subprocess, a cancel during the backoff raises right away too
+        kwargs:
+            anything else run_subprocess takes
+    Returns:
+        Tuple[int, Any, str]
+            see run_subprocess
+    '''
+    label = label or os.path.basename(descriptive_filepath_for_stdout)
+    if timeout is None and duration:
+        timeout = TIMEOUT_BASE + TIMEOUT_FACTOR * duration
+
+    for attempt in range(retries + 1):
+        if attempt:
+            delay = backoff * 2**(attempt - 1)
+            LOGGER.warning('%s - retrying in %0.0fs (%d / %d)', label, delay,
+                           attempt, retries)
+            if cancel_token.wait(delay):
+                raise CancelledError(cancel_token.reason)
+            if on_retry is not None:
+                on_retry()
+        job = tracker.start_job(label, duration=duration)
+        parser = ProgressParser(tracker, job)
+
+        def on_line(name, line):
+            # type: (str, str) -> None
+            parser(name, line)
+            if line_callback is not None:
+                line_callback(name, line)
+
+        exit_code = -1
+        leased = 0
+        if threads is None:
+            leased = budget.acquire()
+        try:
+            exit_code, stdout, stderr = run_subprocess(
+                with_progress(with_threads(args, threads or leased)),
+                descriptive_filepath_for_stdout,
+                line_callback=on_line,
+                timeout=timeout,
+                stall_timeout=stall_timeout,
+                cancel_token=cancel_token,
+                **kwargs)
+        finally:
+            budget.release(leased)
+            tracker.finish_job(job, exit_code)
+        if exit_code not in (TIMEOUT_EXIT_CODE, STALLED_EXIT_CODE):
+            break
+    return exit_code, stdout, stderr
+
+
 def trim_args(input_filepath, output_filepath, start=None, stop=None):
     args = ffmpeg_args(input_filepath)
     if start:
@@ -68,103 +268,1337 @@ def trim_args(input_filepath, output_filepath, start=None, stop=None):
     return args
 
 
+# the codecs a partial GOP can be re-encoded into and still concat with the stream copied GOPs
+SMART_CUT_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+}
+DEFAULT_SMART_CUT_CRF = 16
+DEFAULT_SMART_CUT_PRESET = 'medium'
+# a stream copy seek has to land on the keyframe, not the one before it thanks to ffprobe rounding to the microsecond
+SMART_CUT_SEEK_NUDGE = 0.001
+
+
+def smart_cut_plan(index, start=None, stop=None):
+    # type: (KeyframeIndex, Optional[float], Optional[float]) -> List[Tuple[bool, float, Optional[float]]]
+    '''
+    Description:
+        split start to stop at the first keyframe after start and the last keyframe before stop,
+        the partial GOPs on either end get re-encoded, everything between is stream copied.
+        start_time relative, like the index and like ffmpeg -ss
+    Returns:
+        List[Tuple[bool, float, Optional[float]]]
+            (re-encode, segment start, segment stop or None for the end of the file), in order
+    '''
+    start = start or 0.0
+    first = index.after(start)
+    if first is None or (stop is not None and first >= stop):
+        # never gets as far as a keyframe
+        return [(True, start, stop)]
+    segments = []
+    if first - start > EPSILON:
+        segments.append((True, start, first))
+    if stop is None:
+        segments.append((False, first, None))
+        return segments
+    last = index.before(stop)
+    if last - first > EPSILON:
+        segments.append((False, first, last))
+    if stop - last > EPSILON:
+        segments.append((True, last, stop))
+    return segments
+
+
+def smart_cut_segment_args(input_filepath,
+                           output_filepath,
+                           encode,
+                           start,
+                           stop=None,
+                           encoder='libx264',
+                           pix_fmt=None,
+                           crf=DEFAULT_SMART_CUT_CRF,
+                           preset=DEFAULT_SMART_CUT_PRESET):
+    # type: (str, str, bool, float, Optional[float], str, Optional[str], int, str) -> List[str]
+    '''
+    Description:
+        one video only mpegts segment, input seeked so nothing before start gets read. mpegts because it carries
+        the parameter sets in-band, so re-encoded and copied GOPs can disagree on them and still concat.
+        start / stop are start_time relative, which is what input -ss takes, ffmpeg adds the start_time itself
+    '''
+    args = ['ffmpeg', '-y']
+    if encode:
+        # decode is frame accurate, the frame at or after start comes first
+        args += ['-noautorotate', '-ss', f'{start:0.6f}', '-i', input_filepath]
+        if stop is not None:
+            args += ['-t', f'{stop - start:0.6f}']
+        args += ['-map', '0:v:0', '-an', '-sn', '-dn']
+        args += ['-c:v', encoder, '-crf', str(crf), '-preset', preset]
+        if pix_fmt:
+            args += ['-pix_fmt', pix_fmt]
+    else:
+        # a copy starts from the keyframe at or before the seek, so nudge past the rounding and take the nudge back off -t
+        args += ['-ss', f'{start + SMART_CUT_SEEK_NUDGE:0.6f}', '-i', input_filepath]
+        if stop is not None:
+            args += ['-t', f'{stop - start - SMART_CUT_SEEK_NUDGE:0.6f}']
+        args += ['-map', '0:v:0', '-an', '-sn', '-dn', '-c:v', 'copy']
+        args += ['-avoid_negative_ts', 'make_zero']
+    args += ['-f', 'mpegts', output_filepath]
+    return args
+
+
+def open_cuts(index, segments):
+    # type: (KeyframeIndex, List[Tuple[bool, float, Optional[float]]]) -> List[float]
+    '''
+    Description:
+        the keyframes a smart_cut_plan cuts at that are open GOP, the leading pictures of the first one reference
+        the GOP that got re-encoded instead, and the copy stops before the leading pictures of the last one
+    '''
+    cuts = []
+    for encode, segment_start, segment_stop in segments:
+        if encode:
+            continue
+        cuts.append(segment_start)
+        if segment_stop is not None:
+            cuts.append(segment_stop)
+    return [cut for cut in cuts if index.is_open(cut)]
+
+
+def concat_with_audio_args(concat_filepath,
+                          input_filepath,
+                          output_filepath,
+                          start=None,
+                          stop=None,
+                          audio_map='1:a?'):
+    # type: (str, str, str, Optional[float], Optional[float], Optional[str]) -> List[str]
+    '''
+    Description:
+        the concatenated video only segments, plus the audio (default every audio stream) and the metadata copied
+        straight from the source between start and stop, audio packets are all keyframes so the input seek
+        is as good as exact. audio_map None for no audio at all
+    '''
+    args = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_filepath]
+    if start:
+        args += ['-ss', f'{start:0.6f}']
+    if stop is not None:
+        args += ['-t', f'{stop - (start or 0.0):0.6f}']
+    args += ['-i', input_filepath]
+    args += ['-map', '0:v:0']
+    if audio_map:
+        args += ['-map', audio_map]
+    args += ['-map_metadata', '1', '-c', 'copy', output_filepath]
+    return args
+
+
+def smart_cut(input_filepath,
+              output_filepath,
+              start=None,
+              stop=None,
+              index=None,
+              crf=DEFAULT_SMART_CUT_CRF,
+              preset=DEFAULT_SMART_CUT_PRESET,
+              label=None,
+              cancel_token=CANCEL_TOKEN):
+    # type: (str, str, Optional[float], Optional[float], Optional[KeyframeIndex], int, str, Optional[str], CancelToken) -> int
+    '''
+    Description:
+        frame accurate trim at near stream copy speed, see smart_cut_plan. only the (at most two) partial GOPs
+        get decoded, and nothing before start gets read at all, unlike trim_args which reads from the top.
+        the keyframes come from a full keyframe_index if theres one already, otherwise cut_index demuxes
+        only a few seconds around start and stop.
+        anything that cant be smart cut (unknown codec, rotated, no keyframes, open GOPs at the cut points)
+        falls back to trim_args, and so does a smart cut that doesnt come out the length it should, the edges
+        are libx264/libx265 stitched onto whatever made the copied GOPs
+    Arguments:
+        input_filepath: str
+        output_filepath: str
+        start: Optional[float]
+            seconds, None for the start
+        stop: Optional[float]
+            seconds, None for the end
+        index: Optional[KeyframeIndex]
+            default keyframe_index(input_filepath) if its been made, otherwise cut_index(input_filepath)
+        crf: int
+            default DEFAULT_SMART_CUT_CRF
+            quality of the re-encoded edges, err on the side of not being able to tell
+        preset: str
+            default DEFAULT_SMART_CUT_PRESET
+        label: Optional[str]
+            see run_ffmpeg
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+    Returns:
+        int
+            exit code, the first one that wasnt 0
+    '''
+    label = label or os.path.basename(output_filepath)
+    probed = probe(input_filepath)
+    encoder = SMART_CUT_ENCODERS.get(probed.codec)
+    if index is None and encoder:
+        index = keyframe_index(input_filepath, scan=False) or cut_index(
+            input_filepath,
+            start=start,
+            stop=stop,
+            start_time=probed.start_time,
+            duration=probed.duration,
+            cancel_token=cancel_token)
+
+    def stream_copy():
+        # type: () -> int
+        args = trim_args(input_filepath,
+                         output_filepath,
+                         start=f'{start:0.6f}' if start else None,
+                         stop=f'{stop:0.6f}' if stop is not None else None)
+        exit_code, _, _ = run_ffmpeg(args,
+                                     output_filepath,
+                                     label=label,
+                                     cancel_token=cancel_token)
+        return exit_code
+
+    if encoder is None or probed.rotation or not index:
+        LOGGER.warning('%s - cant smart cut %s (rotation %d), stream copying instead',
+                       label, probed.codec, probed.rotation)
+        return stream_copy()
+
+    segments = smart_cut_plan(index, start=start, stop=stop)
+    opened = open_cuts(index, segments)
+    if opened:
+        LOGGER.warning('%s - open GOP keyframes at %s, stream copying instead', label,
+                       ', '.join(f'{cut:0.3f}s' for cut in opened))
+        return stream_copy()
+    LOGGER.debug('%s - smart cut %s', label, [
+        ('encode' if encode else 'copy', segment_start, segment_stop)
+        for encode, segment_start, segment_stop in segments
+    ])
+    expected_duration = (probed.duration if stop is None else min(stop, probed.duration)) - (start or 0.0)
+    # next to the output, theyre as big as it is
+    temp_dirpath = tempfile.mkdtemp(prefix='.smart-cut-',
+                                    dir=os.path.dirname(
+                                        os.path.abspath(output_filepath)))
+    try:
+        segment_filepaths = []
+        for s, (encode, segment_start, segment_stop) in enumerate(segments):
+            segment_filepath = os.path.join(temp_dirpath, f'{s:03d}.ts')
+            args = smart_cut_segment_args(input_filepath,
+                                          segment_filepath,
+                                          encode,
+                                          segment_start,
+                                          stop=segment_stop,
+                                          encoder=encoder,
+                                          pix_fmt=probed.video.pix_fmt,
+                                          crf=crf,
+                                          preset=preset)
+            exit_code, _, _ = run_ffmpeg(
+                args,
+                output_filepath,
+                duration=(segment_stop or probed.duration) - segment_start,
+                label=f'{label} {"encode" if encode else "copy"} {s + 1}/{len(segments)}',
+                cancel_token=cancel_token)
+            if exit_code != 0:
+                return exit_code
+            segment_filepaths.append(segment_filepath)
+
+        concat_filepath = os.path.join(temp_dirpath, 'concat.txt')
+        write_concat_list(concat_filepath, segment_filepaths)
+        exit_code, _, _ = run_ffmpeg(concat_with_audio_args(concat_filepath,
+                                                           input_filepath,
+                                                           output_filepath,
+                                                           start=start,
+                                                           stop=stop),
+                                     output_filepath,
+                                     duration=expected_duration,
+                                     label=f'{label} concat',
+                                     cancel_token=cancel_token)
+        if exit_code != 0:
+            return exit_code
+    finally:
+        shutil.rmtree(temp_dirpath, ignore_errors=True)
+
+    try:
+        cut = probe(output_filepath, cache=None)
+        cut_duration = (cut.video.duration if cut.video else None) or cut.duration
+    except RuntimeError:
+        cut_duration = None
+    # a frame of slack per join
+    tolerance = len(segments) / (probed.fps or 10.0)
+    if cut_duration is None or abs(cut_duration - expected_duration) > tolerance + EPSILON:
+        LOGGER.warning('%s - smart cut came out %s long instead of %0.3fs, stream copying instead', label,
+                       'unknown' if cut_duration is None else f'{cut_duration:0.3f}s', expected_duration)
+        os.remove(output_filepath)
+        return stream_copy()
+    LOGGER.debug('%s - %0.3fs smart cut, %0.3fs expected', label, cut_duration, expected_duration)
+    return 0
+
+
+def write_concat_list(filepath, segment_filepaths):
+    # type: (str, List[str]) -> None
+    with open(filepath, 'w', encoding='utf-8') as w:
+        for segment_filepath in segment_filepaths:
+            escaped = segment_filepath.replace("'", "'\\''")
+            w.write(f"file '{escaped}'\n")
+
+
+DEFAULT_CHUNKS = max(1, CPU_COUNT // 4)
+
+
+def chunk_plan(index, chunks, duration=None):
+    # type: (KeyframeIndex, int, Optional[float]) -> List[Tuple[float, Optional[float]]]
+    '''
+    Description:
+        about chunks equal (start, stop) spans, every cut on the keyframe at or before its even split so no chunk
+        decodes anything it throws away, the last one runs to the end (None)
+    '''
+    duration = duration or index.duration
+    targets = [duration * c / chunks for c in range(1, chunks)]
+    cuts = []
+    if targets and len(index):
+        cuts = sorted(set(float(cut) for cut in index.before_many(targets)))
+    cuts = [cut for cut in cuts if EPSILON < cut < duration - EPSILON]
+    starts = [0.0] + cuts
+    return list(zip(starts, cuts + [None]))
+
+
+def chunk_args(input_filepath, output_filepath, encode_args, start, stop=None):
+    # type: (str, str, List[str], float, Optional[float]) -> List[str]
+    '''
+    Description:
+        one video only mpegts chunk, the same start / stop on both sides of a cut so every frame lands in exactly one
+    '''
+    args = ['ffmpeg', '-y', '-ss', f'{start:0.6f}', '-i', input_filepath]
+    if stop is not None:
+        args += ['-t', f'{stop - start:0.6f}']
+    args += ['-map', '0:v:0', '-an', '-sn', '-dn']
+    args += list(encode_args)
+    args += ['-f', 'mpegts', output_filepath]
+    return args
+
+
+def chunked_encode(input_filepath,
+                   output_filepath,
+                   encode_args,
+                   chunks=DEFAULT_CHUNKS,
+                   cores=None,
+                   index=None,
+                   tolerance=None,
+                   label=None,
+                   cancel_token=CANCEL_TOKEN):
+    # type: (str, str, List[str], int, Optional[int], Optional[KeyframeIndex], Optional[float], Optional[str], CancelToken) -> int
+    '''
+    Description:
+        split the video at keyframes into chunks, encode them side by side with cores // chunks threads each,
+        concat them losslessly with the source audio copied in, then make sure the video is as long as the source.
+        one software encoder instance stops scaling well before a big box runs out of cores, several dont.
+        the audio is the one stream a single "ffmpeg -i input ... -c:a copy output" would have picked,
+        see default_audio_stream, so the output doesnt change with the number of chunks
+    Arguments:
+        input_filepath: str
+        output_filepath: str
+        encode_args: List[str]
+            everything about the video between the input and the output, like ["-vf", "...", "-c:v", "libx265", ...],
+            no audio, its copied from the source at the end
+        chunks: int
+            default DEFAULT_CHUNKS
+        cores: Optional[int]
+            default CORE_BUDGET.total
+            split between the chunks encoding at once
+        index: Optional[KeyframeIndex]
+            default keyframe_index(input_filepath)
+        tolerance: Optional[float]
+            default a frame per chunk
+            seconds the output video may be off from the source before its a failure
+        label: Optional[str]
+            see run_ffmpeg
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+    Returns:
+        int
+            exit code, the first one that wasnt 0, 1 (and no output) if the output came out the wrong length
+    '''
+    label = label or os.path.basename(output_filepath)
+    probed = probe(input_filepath)
+    source_duration = (probed.video.duration if probed.video else None) or probed.duration
+    audio = default_audio_stream(probed)
+    if index is None:
+        index = keyframe_index(input_filepath, cancel_token=cancel_token)
+    segments = chunk_plan(index, chunks, duration=source_duration)
+    cores = cores or CORE_BUDGET.total or CPU_COUNT
+    jobs = max(1, min(len(segments), cores))
+    threads = max(1, cores // jobs)
+    LOGGER.info('%s - %d chunks, %d at a time x %d threads', label, len(segments), jobs, threads)
+
+    temp_dirpath = tempfile.mkdtemp(prefix='.chunks-',
+                                    dir=os.path.dirname(
+                                        os.path.abspath(output_filepath)))
+    failed = threading.Event()
+
+    def encode(c):
+        # type: (int) -> Optional[int]
+        if failed.is_set():
+            return None
+        start, stop = segments[c]
+        exit_code, _, _ = run_ffmpeg(
+            chunk_args(input_filepath, segment_filepaths[c], encode_args, start, stop=stop),
+            output_filepath,
+            duration=(stop or source_duration) - start,
+            label=f'{label} chunk {c + 1}/{len(segments)}',
+            threads=threads,
+            cancel_token=cancel_token)
+        if exit_code != 0:
+            # dont start any more, let the ones running finish on their own
+            failed.set()
+        return exit_code
+
+    try:
+        segment_filepaths = [
+            os.path.join(temp_dirpath, f'{c:04d}.ts') for c in range(len(segments))
+        ]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            exit_codes = list(executor.map(encode, range(len(segments))))
+        for exit_code in exit_codes:
+            if exit_code:
+                LOGGER.error('%s - a chunk failed', label)
+                return exit_code
+
+        concat_filepath = os.path.join(temp_dirpath, 'concat.txt')
+        write_concat_list(concat_filepath, segment_filepaths)
+        exit_code, _, _ = run_ffmpeg(concat_with_audio_args(
+            concat_filepath,
+            input_filepath,
+            output_filepath,
+            audio_map=f'1:{audio.index}' if audio else None),
+                                     output_filepath,
+                                     duration=source_duration,
+                                     label=f'{label} concat',
+                                     cancel_token=cancel_token)
+        if exit_code != 0:
+            return exit_code
+    finally:
+        shutil.rmtree(temp_dirpath, ignore_errors=True)
+
+    encoded = probe(output_filepath, cache=None)
+    encoded_duration = (encoded.video.duration if encoded.video else None) or encoded.duration
+    if tolerance is None:
+        tolerance = len(segments) / (encoded.fps or probed.fps or 10.0)
+    if abs(encoded_duration - source_duration) > tolerance + EPSILON:
+        LOGGER.error('%s - "%s" came out %0.3fs long, "%s" is %0.3fs!', label,
+                     output_filepath, encoded_duration, input_filepath,
+                     source_duration)
+        os.remove(output_filepath)
+        return 1
+    LOGGER.debug('%s - %0.3fs encoded, %0.3fs source', label, encoded_duration, source_duration)
+    return 0
+
+
 KB_REGEX = re.compile(r'(\d+)')
+# extension -> codec args for the extra audio outputs next to the mp3
+AUDIO_FORMATS = {
+    'flac': ['-acodec', 'flac'],
+    'wav': ['-acodec', 'pcm_s16le'],
+    'm4a': ['-acodec', 'aac', '-ab', '256k'],
+    'opus': ['-acodec', 'libopus', '-ab', '160k'],
+}
+
+
+def audio_output_args(output_filepath,
+                      fmt='mp3',
+                      bitrate='320k',
+                      sampling_frequency=48000,
+                      start=None,
+                      stop=None):
+    # type: (str, str, str, int, Optional[str], Optional[str]) -> List[str]
+    '''
+    Description:
+        the per output half of an audio encode, so several outputs can share one input
+    '''
+    args = ['-vn']
+    if start:
+        args += ['-ss', start]
+    if stop:
+        args += ['-to', stop]
+    if fmt == 'mp3':
+        numeric_bitrate = KB_REGEX.match(bitrate).groups()[0]
+        args += ['-acodec', 'libmp3lame', '-ab', f'{numeric_bitrate}k']
+    elif fmt in AUDIO_FORMATS:
+        args += AUDIO_FORMATS[fmt]
+    else:
+        raise ValueError(f'unknown audio format "{fmt}", pick from {["mp3"] + list(AUDIO_FORMATS)}!')
+    args += ['-ac', '2', '-ar', str(sampling_frequency), output_filepath]
+    return args
 
 
 def mp3_args(input_filepath,
              output_filepath,
              bitrate='320k',
-             sampling_frequency=48000):
+             sampling_frequency=48000,
+             extra_outputs=None):
+    # type: (str, str, str, int, Optional[List[Tuple[str, str]]]) -> List[str]
+    '''
+    Description:
+        extra_outputs are (filepath, format) pairs, see AUDIO_FORMATS, encoded from the same decode
+    '''
     args = ffmpeg_args(input_filepath)
-    numeric_bitrate = KB_REGEX.match(bitrate).groups()[0]
-    ab = f'{numeric_bitrate}k'
+    args += audio_output_args(output_filepath,
+                              bitrate=bitrate,
+                              sampling_frequency=sampling_frequency)
+    for filepath, fmt in extra_outputs or []:
+        args += audio_output_args(filepath,
+                                  fmt=fmt,
+                                  sampling_frequency=sampling_frequency)
+    return args
 
-    args += [
-        '-vn', '-acodec', 'libmp3lame', '-ac', '2', '-ab', ab, '-ar',
-        str(sampling_frequency), output_filepath
-    ]
+
+def trim_mp3_args(input_filepath,
+                  video_filepath,
+                  audio_filepath,
+                  start=None,
+                  stop=None,
+                  bitrate='320k',
+                  sampling_frequency=48000,
+                  extra_outputs=None):
+    # type: (str, str, str, Optional[str], Optional[str], str, int, Optional[List[Tuple[str, str]]]) -> List[str]
+    '''
+    Description:
+        trim_args and mp3_args fused, one demux of the source feeds the stream copied trim and every audio
+        encode, so a 90 minute set is read off the drive once instead of twice.
+        start / stop are per output options and every output picks its own streams, exactly like trim_args
+        and mp3_args, so the cuts and the streams land where they always did
+    Arguments:
+        extra_outputs: Optional[List[Tuple[str, str]]]
+            (filepath, format) pairs, see AUDIO_FORMATS
+    '''
+    args = ffmpeg_args(input_filepath)
+    if start:
+        args += ['-ss', start]
+    if stop:
+        args += ['-to', stop]
+    args += ['-c', 'copy', video_filepath]
+    args += audio_output_args(audio_filepath,
+                              bitrate=bitrate,
+                              sampling_frequency=sampling_frequency,
+                              start=start,
+                              stop=stop)
+    for filepath, fmt in extra_outputs or []:
+        args += audio_output_args(filepath,
+                                  fmt=fmt,
+                                  sampling_frequency=sampling_frequency,
+                                  start=start,
+                                  stop=stop)
     return args
 
 
-# only get the seconds, not 00:40:37.00
-DURATION_REGEX = re.compile(r'duration: ([\d:]+)\.?', flags=re.IGNORECASE)
+# showinfo prints one line per frame that made it through the select filter
+SHOWINFO_REGEX = re.compile(
+    r'\bn:\s*(\d+)\s+pts:\s*\S+\s+pts_time:\s*([-\d.]+).*?\bs:(\d+)x(\d+)')
+DEFAULT_WORKING_WIDTH = 320
+EXTRACT_INPUTS_PER_PROCESS = 8
+DEFAULT_SIZE_TOLERANCE = 0.1
+DEFAULT_TRIAL_SCALE = 0.25
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_GIF_WIDTH = 720
+THUMBNAIL_REGEX = re.compile(r'thumbnail-([\d.]+)\.\w+$')
+# image2 picks the encoder off the extension, these get it into the same ballpark as convert_images
+FRAME_FORMAT_ARGS = {
+    'bmp': [],
+    'jpg': ['-q:v', '2'],
+    'png': [],
+    'webp': ['-quality', str(DEFAULT_QUALITY)],
+}
+
+
+def _float(value):
+    # type: (Any) -> Optional[float]
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    # type: (Any) -> Optional[int]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate(value):
+    # type: (Optional[str]) -> Optional[float]
+    '''
+    Description:
+        "60000/1001" -> 59.94, "0/0" -> None
+    '''
+    if not value:
+        return None
+    numerator, _, denominator = value.partition('/')
+    numerator, denominator = _float(numerator), _float(denominator or 1)
+    if not numerator or not denominator:
+        return None
+    return numerator / denominator
+
+
+class Stream(object):
+    '''
+    Description:
+        the bits of one ffprobe stream that anybody here cares about
+    '''
+
+    def __init__(self, data):
+        # type: (dict) -> None
+        self.index = data.get('index')  # type: int
+        self.codec_type = data.get('codec_type')  # type: str
+        self.codec = data.get('codec_name')  # type: str
+        self.profile = data.get('profile')  # type: Optional[str]
+        self.pix_fmt = data.get('pix_fmt')  # type: Optional[str]
+        self.width = _int(data.get('width'))  # type: Optional[int]
+        self.height = _int(data.get('height'))  # type: Optional[int]
+        self.fps = _rate(data.get('avg_frame_rate')) or _rate(
+            data.get('r_frame_rate'))  # type: Optional[float]
+        self.bitrate = _int(data.get('bit_rate'))  # type: Optional[int]
+        self.duration = _float(data.get('duration'))  # type: Optional[float]
+        self.sample_rate = _int(data.get('sample_rate'))  # type: Optional[int]
+        self.channels = _int(data.get('channels'))  # type: Optional[int]
+
+        # older ffmpeg puts it in the tags, newer ones in the display matrix side data
+        rotation = _float(data.get('tags', {}).get('rotate'))
+        for side_data in data.get('side_data_list', []):
+            if 'rotation' in side_data:
+                rotation = _float(side_data['rotation'])
+        self.rotation = int(rotation or 0) % 360  # type: int
+
+    def __repr__(self):
+        return f'Stream({self.index}, {self.codec_type}, {self.codec})'
+
+
+def default_audio_stream(probed):
+    # type: (Probe) -> Optional[Stream]
+    '''
+    Description:
+        the audio stream ffmpeg picks when nothing is mapped, the most channels, the first of those on a tie
+    '''
+    audio = [stream for stream in probed.streams if stream.codec_type == 'audio']
+    if not audio:
+        return None
+    return max(audio, key=lambda stream: (stream.channels or 0, -audio.index(stream)))
+
+
+class Probe(object):
+    '''
+    Description:
+        typed "ffprobe -show_format -show_streams", see probe()
+    '''
+
+    def __init__(self, filepath, data):
+        # type: (str, dict) -> None
+        fmt = data.get('format', {})
+        self.filepath = filepath
+        self.data = data
+        self.format_name = fmt.get('format_name')  # type: Optional[str]
+        self.duration = _float(fmt.get('duration')) or 0.0  # type: float
+        # what ffmpeg -ss quietly adds to every input seek, 1.4s on plenty of MTS / TS
+        self.start_time = _float(fmt.get('start_time')) or 0.0  # type: float
+        self.size = _int(fmt.get('size'))  # type: Optional[int]
+        self.bitrate = _int(fmt.get('bit_rate'))  # type: Optional[int]
+        self.streams = [Stream(stream) for stream in data.get('streams', [])]
+
+    @property
+    def video(self):
+        # type: () -> Optional[Stream]
+        for stream in self.streams:
+            if stream.codec_type == 'video':
+                return stream
+        return None
+
+    @property
+    def audio(self):
+        # type: () -> Optional[Stream]
+        for stream in self.streams:
+            if stream.codec_type == 'audio':
+                return stream
+        return None
 
+    @property
+    def codec(self):
+        # type: () -> Optional[str]
+        return self.video.codec if self.video else None
 
-def generate_thumbnails(video_filepath, output_dirpath, samples=50, keep=10):
-    # type: (str, str, int, int) -> List[str]
+    @property
+    def fps(self):
+        # type: () -> Optional[float]
+        return self.video.fps if self.video else None
+
+    @property
+    def rotation(self):
+        # type: () -> int
+        return self.video.rotation if self.video else 0
+
+    @property
+    def width(self):
+        # type: () -> Optional[int]
+        '''as displayed, i.e. after rotation'''
+        if not self.video:
+            return None
+        if self.rotation in (90, 270):
+            return self.video.height
+        return self.video.width
+
+    @property
+    def height(self):
+        # type: () -> Optional[int]
+        '''as displayed, i.e. after rotation'''
+        if not self.video:
+            return None
+        if self.rotation in (90, 270):
+            return self.video.width
+        return self.video.height
+
+    def __repr__(self):
+        return f'Probe("{self.filepath}", {self.width}x{self.height}@{self.fps}, {self.codec}, {self.duration}s)'
+
+
+_PROBES = {}  # type: Dict[tuple, Probe]
+_PROBES_LOCK = threading.Lock()
+
+
+def _probe_key(filepath):
+    # type: (str) -> tuple
+    filepath = os.path.abspath(filepath)
+    stat = os.stat(filepath)
+    return (filepath, stat.st_size, stat.st_mtime_ns)
+
+
+def _probe_args(filepath):
+    # type: (str) -> List[str]
+    return [
+        'ffprobe', '-v', 'error', '-print_format', 'json', '-show_format',
+        '-show_streams', filepath
+    ]
+
+
+def _remember(key, data):
+    # type: (tuple, dict) -> Probe
+    result = Probe(key[0], data)
+    with _PROBES_LOCK:
+        _PROBES[key] = result
+    return result
+
+
+def probe(filepath, cache=PROBE_CACHE):
+    # type: (str, Optional[JsonCache]) -> Probe
+    '''
+    Description:
+        run "ffprobe -print_format json -show_format -show_streams" once per (path, size, mtime),
+        memoized in-process and persisted to cache
+    Arguments:
+        filepath: str
+        cache: Optional[JsonCache]
+            default PROBE_CACHE
+            None to skip the on-disk cache, the in-process memo still applies
+    Returns:
+        Probe
+    '''
+    key = _probe_key(filepath)
+    with _PROBES_LOCK:
+        if key in _PROBES:
+            return _PROBES[key]
+
+    data = cache.get(*key) if cache is not None else None
+    if data is None:
+        # the whole json is needed, not just the tail
+        exit_code, stdout, _ = run_subprocess(_probe_args(key[0]),
+                                              key[0],
+                                              max_lines=None)
+        if exit_code != 0:
+            raise RuntimeError('failed ffprobe!')
+        data = json.loads(stdout)
+        if cache is not None:
+            cache.put(data, *key)
+    else:
+        LOGGER.debug('probe cache hit for "%s"', key[0])
+    return _remember(key, data)
+
+
+def probe_many(filepaths,
+               cache=PROBE_CACHE,
+               concurrency=DEFAULT_PROBE_CONCURRENCY):
+    # type: (List[str], Optional[JsonCache], int) -> List[Union[Probe, Exception]]
+    '''
+    Description:
+        probe, but every uncached file gets its ffprobe on one event loop, a festival folder
+        of 300+ files is a few seconds instead of a few hundred sequential ffprobes
+    Arguments:
+        filepaths: List[str]
+        cache: Optional[JsonCache]
+            see probe
+        concurrency: int
+            default DEFAULT_PROBE_CONCURRENCY
+            ffprobes in flight at once on any one drive, drives dont wait on each other
+    Returns:
+        List[Union[Probe, Exception]]
+            same order as filepaths, whatever went wrong with a file in its place, like gather(return_exceptions=True)
+    '''
+    results = [None] * len(filepaths)  # type: List[Union[Probe, Exception, None]]
+    misses = []  # (index, key)
+    for i, filepath in enumerate(filepaths):
+        try:
+            key = _probe_key(filepath)
+        except OSError as e:
+            results[i] = e
+            continue
+        with _PROBES_LOCK:
+            results[i] = _PROBES.get(key)
+        if results[i] is not None:
+            continue
+        data = cache.get(*key) if cache is not None else None
+        if data is None:
+            misses.append((i, key))
+        else:
+            results[i] = _remember(key, data)
+
+    LOGGER.debug('probing %d files, %d not cached', len(filepaths),
+                 len(misses))
+    outputs = run_subprocesses(
+        [(_probe_args(key[0]), key[0]) for _, key in misses],
+        concurrency=concurrency,
+        groups=[device_id(key[0]) for _, key in misses],
+        max_lines=None)
+    for (i, key), (exit_code, stdout, _) in zip(misses, outputs):
+        if exit_code != 0:
+            results[i] = RuntimeError('failed ffprobe!')
+            continue
+        try:
+            data = json.loads(stdout)
+        except ValueError as e:
+            results[i] = e
+            continue
+        if cache is not None:
+            cache.put(data, *key)
+        results[i] = _remember(key, data)
+    return results
+
+
+def sample_timestamps(seconds, samples):
+    # type: (float, int) -> List[float]
+    '''
+    Description:
+        evenly spread timestamps across a video, never the very first or last frame
+        https://superuser.com/a/821680  just the algo to calculate frame seconds
+    '''
+    return [(i - 0.5) * seconds / (samples + 1) for i in range(1, samples + 1)]
+
+
+def select_expression(timestamps):
+    # type: (List[float]) -> str
+    '''
+    Description:
+        build a "select" filter expression that picks the first frame at or after each timestamp,
+        so all of them come out of a single decode instead of one seek + decode per timestamp
+    '''
+    terms = []
+    for timestamp in timestamps:
+        # prev_pts is NAN on the very first frame, hence the not(gte(...)) rather than lt(...)
+        terms.append(
+            f'gte(t,{timestamp:0.3f})*not(gte(prev_pts*TB,{timestamp:0.3f}))')
+    return '+'.join(terms)
+
+
+def sample_frames(video_filepath,
+                  timestamps,
+                  width=DEFAULT_WORKING_WIDTH,
+                  output_dirpath=None,
+                  keyframes=False,
+                  duration=None,
+                  image_format='bmp',
+                  cancel_token=CANCEL_TOKEN):
+    # type: (str, List[float], Optional[int], Optional[str], bool, Optional[float], str, CancelToken) -> Tuple[List[float], Optional[np.ndarray], List[str]]
+    '''
+    Description:
+        pull every requested timestamp out of ONE ffmpeg decode
+            - downscaled frames are piped out as raw rgb24 and land in memory as an array
+            - optionally, full resolution frames are written to output_dirpath as "{timestamp}.{image_format}"
+    Arguments:
+        video_filepath: str
+        timestamps: List[float]
+            seconds, the first frame at or after each one is taken
+        width: Optional[int]
+            default DEFAULT_WORKING_WIDTH
+            working width of the in-memory frames, height keeps the aspect ratio
+            None to skip the in-memory frames entirely
+        output_dirpath: Optional[str]
+            if provided, also write out the full resolution frames
+        keyframes: bool
+            default False
+            only decode I-frames (-skip_frame nokey), so each timestamp snaps to the first keyframe
+            at or after it. way less decode work, not frame accurate, and timestamps that share a
+            keyframe collapse into one frame, so pay attention to the returned timestamps
+        duration: Optional[float]
+            seconds of video, only for the progress ETA
+        image_format: str
+            default bmp
+            one of FRAME_FORMAT_ARGS, encoded by ffmpeg on the way out
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+    Returns:
+        Tuple[List[float], Optional[np.ndarray], List[str]]
+            the actual timestamps of the frames that were picked,
+            frames shaped (N, height, width, 3) uint8 or None,
+            full resolution filepaths (empty if no output_dirpath)
+    '''
+    if width is None and output_dirpath is None:
+        raise ValueError('must provide a width, an output_dirpath, or both!')
+    timestamps = sorted(timestamps)
+    select = f"select='{select_expression(timestamps)}'"
+    args = ['ffmpeg', '-y', '-hide_banner', '-nostats']
+    if keyframes:
+        # decoder option, must come before the -i
+        args += ['-skip_frame', 'nokey']
+    args += ['-i', video_filepath]
+    if width is not None and output_dirpath is not None:
+        filtergraph = (f'[0:v:0]{select},split=2[full][small];'
+                       f'[small]scale={width}:-2,showinfo[small_out]')
+    elif width is not None:
+        filtergraph = f'[0:v:0]{select},scale={width}:-2,showinfo[small_out]'
+    else:
+        filtergraph = f'[0:v:0]{select},showinfo[full]'
+    args += ['-filter_complex', filtergraph]
+
+    if output_dirpath is not None:
+        os.makedirs(output_dirpath, exist_ok=True)
+        args += ['-map', '[full]'] + fps_mode_args('vfr')
+        args += FRAME_FORMAT_ARGS[image_format]
+        args += [
+            '-f', 'image2',
+            os.path.join(output_dirpath, f'sample-%06d.{image_format}')
+        ]
+    if width is not None:
+        args += ['-map', '[small_out]'] + fps_mode_args('vfr')
+        args += ['-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1']
+
+    LOGGER.debug('sampling %d frames from "%s"', len(timestamps),
+                 video_filepath)
+    actual_timestamps = []
+    frame_dimensions = []
+
+    def on_line(name, line):
+        # type: (str, str) -> None
+        # the stderr ring buffer would drop early frames on a long decode, so collect as they come
+        if name != 'stderr':
+            return
+        mo = SHOWINFO_REGEX.search(line)
+        if mo:
+            _, pts_time, frame_width, frame_height = mo.groups()
+            actual_timestamps.append(float(pts_time))
+            frame_dimensions[:] = [int(frame_width), int(frame_height)]
+
+    def on_retry():
+        # type: () -> None
+        del actual_timestamps[:]
+        del frame_dimensions[:]
+
+    # a fixed kind, so the adaptive controller compares sampling runs across files
+    exit_code, stdout, _ = run_ffmpeg(args,
+                                      video_filepath,
+                                      duration=duration,
+                                      label=f'sample_frames {os.path.basename(video_filepath)}',
+                                      line_callback=on_line,
+                                      on_retry=on_retry,
+                                      binary_stdout=True,
+                                      cancel_token=cancel_token)
+    if exit_code != 0:
+        raise RuntimeError('failed frame sampling!')
+
+    frames = None
+    if width is not None:
+        if not frame_dimensions:
+            frames = np.zeros((0, 0, width, 3), dtype=np.uint8)
+        else:
+            frame_width, frame_height = frame_dimensions
+            frame_size = frame_width * frame_height * 3
+            count = len(stdout) // frame_size
+            if count != len(actual_timestamps):
+                LOGGER.warning(
+                    '"%s" produced %d frames but reported %d timestamps!',
+                    video_filepath, count, len(actual_timestamps))
+                count = min(count, len(actual_timestamps))
+                actual_timestamps = actual_timestamps[0:count]
+            frames = np.frombuffer(stdout, dtype=np.uint8,
+                                   count=count * frame_size).reshape(
+                                       count, frame_height, frame_width, 3)
+
+    filepaths = []
+    if output_dirpath is not None:
+        for i, timestamp in enumerate(actual_timestamps):
+            sample_filepath = os.path.join(output_dirpath,
+                                           f'sample-{i + 1:06d}.{image_format}')
+            filepath = os.path.join(output_dirpath,
+                                    f'{timestamp:0.2f}.{image_format}')
+            os.replace(sample_filepath, filepath)
+            filepaths.append(filepath)
+
+    if len(actual_timestamps) < len(timestamps):
+        LOGGER.debug('asked for %d frames from "%s" but only got %d',
+                     len(timestamps), video_filepath, len(actual_timestamps))
+    LOGGER.debug('sampled %d frames from "%s"', len(actual_timestamps),
+                 video_filepath)
+    return actual_timestamps, frames, filepaths
+
+
+def extract_frames(video_filepath,
+                   timestamps,
+                   output_dirpath,
+                   keyframes=False,
+                   inputs_per_process=EXTRACT_INPUTS_PER_PROCESS,
+                   cancel_token=CANCEL_TOKEN):
+    # type: (str, List[float], str, bool, int, CancelToken) -> List[str]
+    '''
+    Description:
+        full resolution "{timestamp}.bmp" of the first frame at or after each timestamp
+        a handful of fast input seeks per ffmpeg rather than a full decode, since its only ever the keepers
+    Arguments:
+        video_filepath: str
+        timestamps: List[float]
+        output_dirpath: str
+        keyframes: bool
+            default False
+            see sample_frames
+        inputs_per_process: int
+            default EXTRACT_INPUTS_PER_PROCESS
+            every input is its own decoder, so too many at once on a 4K HEVC file eats RAM
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+    Returns:
+        List[str]
+            same order as timestamps
+    '''
+    os.makedirs(output_dirpath, exist_ok=True)
+    filepaths = [
+        os.path.join(output_dirpath, f'{timestamp:0.2f}.bmp')
+        for timestamp in timestamps
+    ]
+    for start in range(0, len(timestamps), inputs_per_process):
+        chunk = range(start, min(start + inputs_per_process, len(timestamps)))
+        args = ['ffmpeg', '-y', '-hide_banner', '-nostats']
+        for idx in chunk:
+            if keyframes:
+                args += ['-skip_frame', 'nokey']
+            # incredibly fast, args must be in this order...
+            args += [
+                '-accurate_seek', '-ss', f'{max(timestamps[idx], 0):0.3f}',
+                '-i', video_filepath
+            ]
+        for i, idx in enumerate(chunk):
+            args += [
+                '-map', f'{i}:v:0', '-frames:v', '1', '-update', '1',
+                filepaths[idx]
+            ]
+        exit_code, _, _ = run_ffmpeg(args,
+                                     video_filepath,
+                                     cancel_token=cancel_token)
+        if exit_code != 0:
+            raise RuntimeError('failed thumbnail generation!')
+    return filepaths
+
+
+def sample_frames_cached(video_filepath,
+                         timestamps,
+                         width=DEFAULT_WORKING_WIDTH,
+                         keyframes=False,
+                         cache=FRAME_CACHE,
+                         duration=None,
+                         output_dirpath=None,
+                         image_format='bmp',
+                         source_id=None,
+                         cancel_token=CANCEL_TOKEN):
+    # type: (str, List[float], int, bool, Optional[FrameCache], Optional[float], Optional[str], str, Optional[str], CancelToken) -> Tuple[List[float], np.ndarray, List[Dict[str, float]], Dict[float, int], Dict[float, str]]
+    '''
+    Description:
+        sample_frames, but only decodes the timestamps the cache hasnt seen before.
+        output_dirpath / image_format, see sample_frames, only the decoded misses get written.
+        source_id, default source_identity(video_filepath), pass it in if you already have it
+    Returns:
+        Tuple[List[float], np.ndarray, List[Dict[str, float]], Dict[float, int], Dict[float, str]]
+            unique actual timestamps in order, their frames, any raw scores cached alongside them,
+            which of those frames each requested timestamp landed on,
+            and actual timestamp -> full resolution filepath for whichever frames were decoded this time
+    '''
+    if cache is not None and source_id is None:
+        source_id = source_identity(video_filepath)
+    found = {}  # requested timestamp -> (actual timestamp, frame, scores)
+    misses = []
+    for timestamp in timestamps:
+        hit = None
+        if cache is not None:
+            hit = cache.get(source_id, timestamp, width, keyframes)
+        if hit is None:
+            misses.append(timestamp)
+        else:
+            found[timestamp] = hit
+    LOGGER.debug('frame cache for "%s": %d hits, %d misses', video_filepath,
+                 len(found), len(misses))
+
+    full_filepaths = {}
+    if misses:
+        actual_timestamps, frames, filepaths = sample_frames(
+            video_filepath,
+            misses,
+            width=width,
+            output_dirpath=output_dirpath,
+            keyframes=keyframes,
+            duration=duration,
+            image_format=image_format,
+            cancel_token=cancel_token)
+        full_filepaths = dict(zip(actual_timestamps, filepaths))
+        # select hands back the first frame at or after each (rounded) request, line them back up
+        starts = np.asarray(actual_timestamps) + 0.0005
+        for timestamp in misses:
+            idx = int(np.searchsorted(starts, round(timestamp, 3)))
+            if idx >= len(actual_timestamps):
+                continue  # ran off the end of the video
+            found[timestamp] = (actual_timestamps[idx], frames[idx], {})
+            if cache is not None:
+                cache.put(source_id, timestamp, width, keyframes,
+                          actual_timestamps[idx], frames[idx])
+        if cache is not None:
+            cache.evict()
+
+    unique = {}
+    for actual_timestamp, frame, scores in found.values():
+        unique.setdefault(actual_timestamp, (frame, scores))
+    ordered = sorted(unique)
+    if not ordered:
+        return [], np.zeros((0, 0, width, 3), dtype=np.uint8), [], {}, {}
+    frames = np.stack([unique[timestamp][0] for timestamp in ordered])
+    scores = [unique[timestamp][1] for timestamp in ordered]
+    positions = {timestamp: idx for idx, timestamp in enumerate(ordered)}
+    placements = {
+        timestamp: positions[actual[0]]
+        for timestamp, actual in found.items()
+    }
+    return ordered, frames, scores, placements, full_filepaths
+
+
+def generate_thumbnails(video_filepath,
+                        output_dirpath,
+                        samples=50,
+                        keep=10,
+                        keyframes=False,
+                        weights=None,
+                        working_width=DEFAULT_WORKING_WIDTH,
+                        hamming_threshold=DEFAULT_HAMMING_THRESHOLD,
+                        hash_function='dhash',
+                        cache=FRAME_CACHE,
+                        image_format='jpg',
+                        image_backend=None,
+                        cancel_token=CANCEL_TOKEN):
+    # type: (str, str, int, int, bool, Optional[Dict[str, float]], int, Optional[int], str, Optional[FrameCache], str, Optional[str], CancelToken) -> List[str]
     '''
+    keyframes=True only decodes I-frames, see sample_frames, the filenames carry the actual timestamps
+    weights picks and weighs the scorers in library.scoring, default DEFAULT_WEIGHTS
+    near-duplicates (within hamming_threshold bits of hash_function) collapse to their best scoring
+    frame before the keepers are picked, None to keep the lookalikes
+    cache keeps the working size frames and their scores around so a different keep/weights is cheap,
+    None to always decode
+    the full resolution frames come out of that same decode (straight into image_format) and only the keepers
+    survive, keepers that were cache hits werent decoded this time so only those get a seek
+    image_format / image_backend, see library.images.convert_images
+    cancel_token is shared with every child, a cancel kills them and cleans up the half made thumbnails
+
     # going with
     https://superuser.com/a/821680  just the algo to calculate frame seconds
     https://stackoverflow.com/a/28321986
     https://alvinalexander.com/mac-os-x/mac-convert-bmp-images-jpeg-jpg-imagemagick
     '''
     os.makedirs(output_dirpath, exist_ok=True)
+    seconds = probe(video_filepath).duration
+    source_id = source_identity(video_filepath) if cache is not None else None
+    # every sample lands here at full resolution, the losers get thrown out with the directory
+    samples_dirpath = tempfile.mkdtemp(prefix='.samples-', dir=output_dirpath)
+    try:
+        return _generate_thumbnails(video_filepath, output_dirpath,
+                                    samples_dirpath, seconds, source_id,
+                                    samples, keep, keyframes, weights,
+                                    working_width, hamming_threshold,
+                                    hash_function, cache, image_format,
+                                    image_backend, cancel_token)
+    finally:
+        shutil.rmtree(samples_dirpath, ignore_errors=True)
 
-    args = ['ffprobe', video_filepath]
-    exit_code, stdout, stderr = run_subprocess(args, video_filepath)
-    if exit_code != 0:
-        raise RuntimeError('failed ffprobe!')
 
-    duration_timestamp = DURATION_REGEX.search(stdout +
-                                               stderr).groups()[0].strip()
-    seconds = timestamp_to_seconds(duration_timestamp)
+def _generate_thumbnails(video_filepath, output_dirpath, samples_dirpath,
+                         seconds, source_id, samples, keep, keyframes,
+                         weights, working_width, hamming_threshold,
+                         hash_function, cache, image_format, image_backend,
+                         cancel_token):
+    # type: (str, str, str, float, Optional[str], int, int, bool, Optional[Dict[str, float]], int, Optional[int], str, Optional[FrameCache], str, Optional[str], CancelToken) -> List[str]
+    # one decode for all of the (uncached) samples rather than one ffmpeg per sample
+    requested = [
+        round(timestamp, 3)
+        for timestamp in sample_timestamps(seconds, samples)
+    ]
+    timestamps, frames, cached_scores, placements, full_filepaths = sample_frames_cached(
+        video_filepath,
+        requested,
+        width=working_width,
+        keyframes=keyframes,
+        cache=cache,
+        duration=seconds,
+        output_dirpath=samples_dirpath,
+        image_format=image_format,
+        source_id=source_id,
+        cancel_token=cancel_token)
 
-    thumbnails = []
-    for i in range(1, samples + 1):
-        skip_to = (i - 0.5) * seconds / (samples + 1)
-        skip_to = f'{skip_to:0.2f}'
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    precomputed = {
+        name: [scores[name] for scores in cached_scores]
+        for name in weights
+        if all(name in scores for scores in cached_scores)
+    }
+    scores, raw = score_frames(frames,
+                               weights=weights,
+                               precomputed=precomputed)
+    if cache is not None and set(raw) - set(precomputed):
+        for requested_timestamp, idx in placements.items():
+            frame_scores = dict(cached_scores[idx])
+            frame_scores.update(
+                {name: values[idx]
+                 for name, values in raw.items()})
+            cache.put(source_id,
+                      requested_timestamp,
+                      working_width,
+                      keyframes,
+                      timestamps[idx],
+                      frames[idx],
+                      scores=frame_scores)
 
-        # incredibly fast, args must be in this order...
-        # ffmpeg -accurate_seek -ss 2000.30 -i 'whatever.mov'
-        #     -frames:v 1 period_down_%d.bmp
-        thumbnail_filepath = os.path.join(output_dirpath, f'{skip_to}.bmp')
-        args = [
-            'ffmpeg', '-y', '-accurate_seek', '-ss', skip_to, '-i',
-            video_filepath, '-frames:v', '1', thumbnail_filepath
-        ]
-        exit_code, _, _ = run_subprocess(subprocess.list2cmdline(args),
-                                         video_filepath)
-        if exit_code != 0:
-            raise RuntimeError('failed thumbnail generation!')
-        thumbnails.append(thumbnail_filepath)
-
-    small_thumbnails = []
-    for thumbnail in thumbnails:
-        ext = os.path.splitext(thumbnail)[1]
-        jpg_thumbnail = thumbnail.replace(ext, '.jpg')
-        small_thumbnails.append(jpg_thumbnail)
-        # TODO: think about processing a few at once, but not too many such that the arguments length is too long for the os...
-        args = ['magick', 'mogrify', '-format', 'jpg', thumbnail]
-        exit_code, _, _ = run_subprocess(args, video_filepath)
-        if exit_code != 0:
-            raise RuntimeError('failed thumbnail generation!')
+    rankings = np.argsort(-scores, kind='stable')
+    if hamming_threshold is not None:
+        hashes = HASH_FUNCTIONS[hash_function](frames)
+        rankings = dedupe(hashes, order=rankings, threshold=hamming_threshold)
+    rankings = list(rankings[0:keep])
+
+    # keepers that came out of the cache were never decoded this run, those (and only those) get a seek
+    seeks = [idx for idx in rankings if timestamps[idx] not in full_filepaths]
+    if seeks:
+        LOGGER.debug('seeking %d cached keepers out of "%s"', len(seeks),
+                     video_filepath)
+        # back up a hair so the seek lands on exactly the frame that was scored
+        extracted = extract_frames(video_filepath,
+                                   [timestamps[idx] - 0.001 for idx in seeks],
+                                   os.path.join(samples_dirpath, 'seeks'),
+                                   keyframes=keyframes,
+                                   cancel_token=cancel_token)
+        converted = convert_images(
+            extracted,
+            fmt=image_format,
+            backend=image_backend,
+            descriptive_filepath_for_stdout=video_filepath,
+            cancel_token=cancel_token)
+        for idx, filepath in zip(seeks, converted):
+            full_filepaths[timestamps[idx]] = filepath
 
-    # more size == more "detail" in the picture, but you could use any algo here
-    # TODO: offer different algos to try
-    rankings = list(sorted(small_thumbnails, key=os.path.getsize,
-                           reverse=True))
     keepers = []
-    for top_candidate in rankings[0:keep]:
+    for idx in rankings:
         destination = os.path.join(
-            output_dirpath, f'thumbnail-{os.path.basename(top_candidate)}')
-        shutil.copy2(top_candidate, destination)
+            output_dirpath, f'thumbnail-{timestamps[idx]:0.2f}.{image_format}')
+        os.replace(full_filepaths[timestamps[idx]], destination)
         keepers.append(destination)
-
-    for thumbnail in thumbnails + small_thumbnails:
-        os.remove(thumbnail)
+        LOGGER.debug('keeping %0.2fs with score %0.3f', timestamps[idx],
+                     scores[idx])
 
     LOGGER.debug('found %d thumbnails to keep: %s', len(keepers), keepers)
     return keepers
 
 
-def generate_gif(filepaths, output_filepath, delay=10, megabytes=10, loop=0):
-    # type: (List[str], str, int, int, int) -> bool
+def fit_to_size(encode,
+                megabytes,
+                tolerance=DEFAULT_SIZE_TOLERANCE,
+                trial_scale=DEFAULT_TRIAL_SCALE,
+                max_attempts=DEFAULT_MAX_ATTEMPTS):
+    # type: (Callable[[float], int], float, float, float, int) -> Tuple[float, int]
+    '''
+    Description:
+        find the biggest scale whose encode lands in [megabytes * (1 - tolerance), megabytes]
+            - one small trial encode gives bytes per (scale ** 2), a straight prediction for the rest
+            - every real encode after that tightens the bracket, predicting from the closest result
+              and falling back to plain bisection if the prediction leaves the bracket
+    Arguments:
+        encode: Callable[[float], int]
+            encode at this scale (0-1] and return the bytes written, the last call should be the keeper
+        megabytes: float
+        tolerance: float
+            default DEFAULT_SIZE_TOLERANCE
+            how far under budget is close enough
+        trial_scale: float
+            default DEFAULT_TRIAL_SCALE
+        max_attempts: int
+            default DEFAULT_MAX_ATTEMPTS
+            full size encodes after the trial
+    Returns:
+        Tuple[float, int]
+            the scale and the size in bytes of whatever encode() wrote last,
+            0 bytes means an encode came back empty and the search gave up
+    '''
+    budget = megabytes * 1024 * 1024
+    floor = budget * (1 - tolerance)
+
+    trial_bytes = encode(trial_scale)
+    LOGGER.debug('trial encode at %0.3f is %d bytes', trial_scale, trial_bytes)
+    if trial_bytes <= 0:
+        LOGGER.error('trial encode at %0.3f wrote nothing!', trial_scale)
+        return trial_scale, 0
+    low, high = 0.0, 1.0  # low always fits, high never does (except 1.0, which is untested)
+    if trial_bytes <= budget:
+        low = trial_scale
+    else:
+        high = trial_scale
+    best = (trial_scale, trial_bytes) if trial_bytes <= budget else None
+    # bytes scale with the pixel count, i.e. scale ** 2
+    scale = min(1.0, trial_scale * (floor / trial_bytes)**0.5)
+
+    for attempt in range(max_attempts):
+        size = encode(scale)
+        LOGGER.debug('attempt %d at %0.3f is %d bytes', attempt + 1, scale,
+                     size)
+        if size <= 0:
+            LOGGER.error('encode at %0.3f wrote nothing!', scale)
+            return scale, 0
+        if size <= budget:
+            if best is None or scale > best[0]:
+                best = (scale, size)
+            if size >= floor or scale >= 1.0:
+                return scale, size
+            low = scale
+        else:
+            high = scale
+        target = (budget + floor) / 2
+        predicted = scale * (target / size)**0.5
+        if low < predicted < high:
+            scale = min(1.0, predicted)
+        else:
+            scale = (low + high) / 2
+
+    if best is None:
+        return scale, size
+    if best[0] != scale:
+        # the last encode isnt the one we want sitting on disk
+        size = encode(best[0])
+    return best[0], size
+
+
+def generate_gif(filepaths,
+                 output_filepath,
+                 delay=10,
+                 megabytes=10,
+                 loop=0,
+                 size_targeted=True,
+                 tolerance=DEFAULT_SIZE_TOLERANCE,
+                 timeout=DEFAULT_MAGICK_TIMEOUT,
+                 cancel_token=CANCEL_TOKEN):
+    # type: (List[str], str, int, int, int, bool, float, Optional[float], CancelToken) -> bool
     '''
     Description:
         create a gif out of a bunch of images and keep it under a certain megabytes
     Arguments:
         filepaths: str
-            a list of images in order
+            a list of images in order, read where they are
         output_filepath: str
         framerate: int
             default 20
@@ -173,18 +1607,33 @@ def generate_gif(filepaths, output_filepath, delay=10, megabytes=10, loop=0):
             while greater than filezie, keep resizing down
         loop: int
             default 0--infinite
+        size_targeted: bool
+            default True
+            predict the scale from a small trial encode and bisect to within tolerance of megabytes,
+            otherwise step down 100%, 75%, 54%... until it fits
+        tolerance: float
+            default DEFAULT_SIZE_TOLERANCE
+            see fit_to_size
+        timeout: Optional[float]
+            default DEFAULT_MAGICK_TIMEOUT
+            seconds any one imagemagick run gets before it is killed
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+            a cancel kills imagemagick and removes the half written gif
     '''
-    temp_dirpath = tempfile.mkdtemp()
-    for f, filepath in enumerate(filepaths):
-        ext = os.path.splitext(filepath)[1]
-        new_filepath = os.path.join(temp_dirpath, f'{f}{ext}')
-        shutil.copy(filepath, new_filepath)
     output_dirpath = os.path.dirname(output_filepath)
     os.makedirs(output_dirpath, exist_ok=True)
+    list_filepath = None
+    inputs = list(filepaths)
+    if len(subprocess.list2cmdline(inputs)) > ARGUMENT_LENGTH_LIMIT:
+        # imagemagick reads a list of filenames from "@file"
+        fd, list_filepath = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w', encoding='utf-8') as w:
+            w.write('\n'.join(inputs))
+        inputs = [f'@{list_filepath}']
 
-    percentage = 100
-    output_filepath_size = 0
-    while percentage > 0:
+    def encode(scale):
+        # type: (float) -> int
         args = [
             'magick',
             'convert',
@@ -193,26 +1642,217 @@ def generate_gif(filepaths, output_filepath, delay=10, megabytes=10, loop=0):
             '-loop',
             str(loop),
         ]
-        if percentage < 100:
+        args += inputs
+        if scale < 1.0:
             args += [
                 '-resize',
-                f'{percentage}%',
+                f'{max(scale * 100, 1):0.2f}%',
             ]
-        args += ['*', output_filepath]
-        exit_code, _, _ = run_subprocess(subprocess.list2cmdline(args),
-                                         os.path.basename(output_filepath),
-                                         cwd=temp_dirpath)
+        args += [output_filepath]
+        with CORE_BUDGET.lease() as threads:
+            exit_code, _, _ = run_subprocess(args,
+                                             os.path.basename(output_filepath),
+                                             timeout=timeout,
+                                             env=magick_env(threads),
+                                             cancel_token=cancel_token)
         if exit_code != 0:
             LOGGER.error('failed gif generation!')
             raise RuntimeError('failed gif generation!')
+        return os.path.getsize(output_filepath)
 
-        output_filepath_size = os.path.getsize(output_filepath) / (1024 * 1024)
-        if output_filepath_size <= megabytes:
-            break
-        else:
-            percentage = percentage // 4 * 3
+    try:
+        with cancel_token.partial(output_filepath):
+            if size_targeted:
+                _, output_filepath_size = fit_to_size(encode,
+                                                      megabytes,
+                                                      tolerance=tolerance)
+                output_filepath_size /= 1024 * 1024
+            else:
+                percentage = 100
+                output_filepath_size = 0
+                while percentage > 0:
+                    output_filepath_size = encode(
+                        percentage / 100) / (1024 * 1024)
+                    if output_filepath_size <= megabytes:
+                        break
+                    else:
+                        percentage = percentage // 4 * 3
+    finally:
+        if list_filepath is not None:
+            os.remove(list_filepath)
+
+    if output_filepath_size <= 0:
+        LOGGER.error('generated gif "%s" is empty!', output_filepath)
+        return False
+    if output_filepath_size > megabytes:
+        LOGGER.error(
+            'generated gif "%s" has size %0.2fMB which is greater than requested %0.2fMB',
+            output_filepath, output_filepath_size, megabytes)
+        return False
+    else:
+        LOGGER.info('generated gif "%s" with size %0.2fMB!', output_filepath,
+                    output_filepath_size)
+        return True
 
-    shutil.rmtree(temp_dirpath)
+
+def thumbnail_timestamp(filepath):
+    # type: (str) -> float
+    '''
+    Description:
+        "thumbnails/thumbnail-2000.30.jpg" -> 2000.3, rounded to the hundredth like the filename is
+    '''
+    mo = THUMBNAIL_REGEX.search(os.path.basename(filepath))
+    if not mo:
+        raise ValueError(f'"{filepath}" is not a generated thumbnail!')
+    return float(mo.groups()[0])
+
+
+def gif_select_filtergraph(timestamps, width, delay=10, clip_seconds=0.0):
+    # type: (List[float], int, int, float) -> str
+    '''
+    Description:
+        select the frames (or short clips) and bring them down to width,
+        the only part of making a gif that has to look at the source.
+        the frames keep their source times so -progress reads against the source duration
+    '''
+    rate = 100 / delay  # delay is in 1/100th of a second ticks
+    if clip_seconds > 0:
+        between = '+'.join(
+            f'between(t,{timestamp:0.3f},{timestamp + clip_seconds:0.3f})'
+            for timestamp in sorted(timestamps))
+        select = f"fps={rate:g},select='{between}'"
+    else:
+        select = f"select='{select_expression(sorted(timestamps))}'"
+    return f'[0:v:0]{select},scale={width}:-2:flags=lanczos[frames]'
+
+
+def gif_palette_filtergraph(width, delay=10):
+    # type: (int, int) -> str
+    '''
+    Description:
+        retime the already selected frames and do the two pass palette in one graph
+        https://superuser.com/a/556031
+    '''
+    rate = 100 / delay
+    return (f'[0:v:0]setpts=N/({rate:g}*TB),'
+            f'scale={width}:-2:flags=lanczos,split[s0][s1];'
+            '[s0]palettegen=stats_mode=diff[p];'
+            '[s1][p]paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle[gif]')
+
+
+def generate_gif_from_video(video_filepath,
+                            timestamps,
+                            output_filepath,
+                            delay=10,
+                            megabytes=10,
+                            loop=0,
+                            width=DEFAULT_GIF_WIDTH,
+                            clip_seconds=0.0,
+                            keyframes=False,
+                            tolerance=DEFAULT_SIZE_TOLERANCE,
+                            cancel_token=CANCEL_TOKEN):
+    # type: (str, List[float], str, int, float, int, int, float, bool, float, CancelToken) -> bool
+    '''
+    Description:
+        create a gif straight from the video, palettegen + paletteuse, no imagemagick holding 50 4K frames in memory
+            - the source is decoded ONCE, the selected frames land at width in a small lossless ffv1 file
+            - every fit_to_size attempt only reads that file
+    Arguments:
+        video_filepath: str
+        timestamps: List[float]
+            the first frame at or after each one, or a clip starting at each one, in time order
+        output_filepath: str
+        delay: int
+            default 10
+            amount of ticks (1/100th second) to spend on each frame
+        megabytes: float
+            the gif is fit under this, see fit_to_size
+        loop: int
+            default 0--infinite
+        width: int
+            default DEFAULT_GIF_WIDTH
+            widest the gif will be, it only shrinks from here to fit megabytes
+        clip_seconds: float
+            default 0--a single frame per timestamp, otherwise this many seconds of motion per timestamp
+        keyframes: bool
+            default False
+            only decode keyframes, WAY faster, only makes sense when the timestamps came from keyframes
+        tolerance: float
+            default DEFAULT_SIZE_TOLERANCE
+            see fit_to_size
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+            a cancel kills ffmpeg and removes the half written gif
+    '''
+    output_dirpath = os.path.dirname(output_filepath)
+    os.makedirs(output_dirpath, exist_ok=True)
+    source_duration = probe(video_filepath).duration
+    width = width // 2 * 2
+    fd, frames_filepath = tempfile.mkstemp(prefix='.gif-frames-',
+                                           suffix='.mkv',
+                                           dir=output_dirpath)
+    os.close(fd)
+    if clip_seconds > 0:
+        gif_duration = len(timestamps) * clip_seconds
+    else:
+        gif_duration = len(timestamps) * delay / 100
+
+    def encode(scale):
+        # type: (float) -> int
+        scaled_width = max(int(width * scale) // 2 * 2, 2)
+        args = [
+            'ffmpeg', '-y', '-hide_banner', '-nostats', '-i', frames_filepath,
+            '-filter_complex',
+            gif_palette_filtergraph(scaled_width, delay=delay), '-map', '[gif]'
+        ]
+        args += fps_mode_args('vfr')
+        args += ['-loop', str(loop), output_filepath]
+        exit_code, _, _ = run_ffmpeg(args,
+                                     output_filepath,
+                                     duration=gif_duration,
+                                     label=f'gif {os.path.basename(output_filepath)}',
+                                     cancel_token=cancel_token)
+        if exit_code != 0:
+            LOGGER.error('failed gif generation!')
+            raise RuntimeError('failed gif generation!')
+        return os.path.getsize(output_filepath)
+
+    try:
+        args = ['ffmpeg', '-y', '-hide_banner', '-nostats']
+        if keyframes:
+            args += ['-skip_frame', 'nokey']
+        args += [
+            '-i', video_filepath, '-filter_complex',
+            gif_select_filtergraph(timestamps,
+                                   width,
+                                   delay=delay,
+                                   clip_seconds=clip_seconds), '-map',
+            '[frames]'
+        ]
+        args += fps_mode_args('vfr')
+        args += [
+            '-c:v', 'ffv1', '-an', '-sn', '-dn', '-f', 'matroska',
+            frames_filepath
+        ]
+        exit_code, _, _ = run_ffmpeg(args,
+                                     output_filepath,
+                                     duration=source_duration,
+                                     label=f'gif_frames {os.path.basename(video_filepath)}',
+                                     cancel_token=cancel_token)
+        if exit_code != 0:
+            LOGGER.error('failed to pull the gif frames out of "%s"!',
+                         video_filepath)
+            raise RuntimeError('failed gif generation!')
+        with cancel_token.partial(output_filepath):
+            _, output_filepath_size = fit_to_size(encode,
+                                                  megabytes,
+                                                  tolerance=tolerance)
+    finally:
+        os.remove(frames_filepath)
+    output_filepath_size /= 1024 * 1024
+    if output_filepath_size <= 0:
+        LOGGER.error('generated gif "%s" is empty!', output_filepath)
+        return False
     if output_filepath_size > megabytes:
         LOGGER.error(
             'generated gif "%s" has size %0.2fMB which is greater than requested %0.2fMB',
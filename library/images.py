@@ -0,0 +1,165 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Batch image conversion, in-process with Pillow if its around, otherwise as few "magick mogrify" as the OS allows
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+import sys
+import logging
+import subprocess
+import concurrent.futures
+from typing import Dict, List, Optional
+
+# project imports
+from .stdlib import CANCEL_TOKEN, CancelToken, run_subprocess
+from .scheduler import CORE_BUDGET
+
+LOGGER = logging.getLogger(__name__)
+PILLOW_INSTALLED = False
+try:
+    from PIL import Image
+    PILLOW_INSTALLED = True
+except ImportError:
+    Image = None
+BACKENDS = ['pillow', 'magick']
+FORMATS = {
+    'jpg': 'JPEG',
+    'webp': 'WEBP',
+    'png': 'PNG',
+}
+DEFAULT_QUALITY = 92
+# imagemagick has no progress to watch, so just cap the wall clock
+DEFAULT_MAGICK_TIMEOUT = 30 * 60
+if sys.platform == 'win32':
+    # CreateProcess caps the whole command line at 32767 characters
+    ARGUMENT_LENGTH_LIMIT = 32767 - 1024
+else:
+    # the environment shares ARG_MAX with argv, so only claim a slice of it
+    ARGUMENT_LENGTH_LIMIT = min(os.sysconf('SC_ARG_MAX') // 4, 128 * 1024)
+
+
+def batch_arguments(prefix, filepaths, limit=ARGUMENT_LENGTH_LIMIT):
+    # type: (List[str], List[str], int) -> List[List[str]]
+    '''
+    Description:
+        split filepaths across as few invocations of prefix as possible without blowing the OS limit
+    '''
+    prefix_length = len(subprocess.list2cmdline(prefix))
+    batches = []
+    batch = []
+    length = prefix_length
+    for filepath in filepaths:
+        # +1 for the space, +2 in case it needs quoting
+        cost = len(filepath) + 3
+        if batch and length + cost > limit:
+            batches.append(prefix + batch)
+            batch = []
+            length = prefix_length
+        batch.append(filepath)
+        length += cost
+    if batch:
+        batches.append(prefix + batch)
+    return batches
+
+
+def magick_env(threads):
+    # type: (int) -> Optional[Dict[str, str]]
+    '''
+    Description:
+        imagemagick takes its OpenMP thread cap from the environment, None when threads is 0 (uncapped)
+    '''
+    if not threads:
+        return None
+    return {'MAGICK_THREAD_LIMIT': str(threads)}
+
+
+def converted_filepath(filepath, fmt):
+    # type: (str, str) -> str
+    return f'{os.path.splitext(filepath)[0]}.{fmt}'
+
+
+def _convert_with_pillow(filepath, fmt, quality):
+    # type: (str, str, int) -> str
+    output_filepath = converted_filepath(filepath, fmt)
+    with Image.open(filepath) as image:
+        image.convert('RGB').save(output_filepath,
+                                  FORMATS[fmt],
+                                  quality=quality)
+    return output_filepath
+
+
+def convert_images(filepaths,
+                   fmt='jpg',
+                   quality=DEFAULT_QUALITY,
+                   backend=None,
+                   max_workers=None,
+                   descriptive_filepath_for_stdout='convert_images',
+                   timeout=DEFAULT_MAGICK_TIMEOUT,
+                   cancel_token=CANCEL_TOKEN):
+    # type: (List[str], str, int, Optional[str], Optional[int], str, Optional[float], CancelToken) -> List[str]
+    '''
+    Description:
+        convert images next to themselves, same name, new extension, like "magick mogrify -format" does
+    Arguments:
+        filepaths: List[str]
+        fmt: str
+            default jpg
+            one of FORMATS
+        quality: int
+            default DEFAULT_QUALITY
+        backend: Optional[str]
+            default pillow if its installed, otherwise magick
+        max_workers: Optional[int]
+            pillow process pool size, default a lease from CORE_BUDGET
+        descriptive_filepath_for_stdout: str
+            see run_subprocess
+        timeout: Optional[float]
+            default DEFAULT_MAGICK_TIMEOUT
+            seconds any one mogrify gets before it is killed
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+            see run_subprocess
+    Returns:
+        List[str]
+            converted filepaths, same order as filepaths
+    '''
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown format "{fmt}", pick from {list(FORMATS)}!')
+    if backend is None:
+        backend = 'pillow' if PILLOW_INSTALLED else 'magick'
+    if backend == 'pillow' and not PILLOW_INSTALLED:
+        raise ImportError('"pillow" not installed! pip install pillow')
+    if not filepaths:
+        return []
+
+    LOGGER.debug('converting %d images to %s with %s', len(filepaths), fmt,
+                 backend)
+    if backend == 'pillow':
+        cancel_token.check()
+        with CORE_BUDGET.lease() as threads:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers or threads or None) as executor:
+                return list(
+                    executor.map(_convert_with_pillow, filepaths,
+                                 [fmt] * len(filepaths),
+                                 [quality] * len(filepaths)))
+    elif backend == 'magick':
+        prefix = ['magick', 'mogrify', '-format', fmt, '-quality', str(quality)]
+        for args in batch_arguments(prefix, filepaths):
+            with CORE_BUDGET.lease() as threads:
+                exit_code, _, _ = run_subprocess(
+                    args,
+                    descriptive_filepath_for_stdout,
+                    timeout=timeout,
+                    env=magick_env(threads),
+                    cancel_token=cancel_token)
+            if exit_code != 0:
+                raise RuntimeError('failed image conversion!')
+        return [converted_filepath(filepath, fmt) for filepath in filepaths]
+    else:
+        raise ValueError(f'unknown backend "{backend}", pick from {BACKENDS}!')
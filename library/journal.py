@@ -0,0 +1,202 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Make-style bookkeeping for pipeline stages. One journal per output directory remembers what went into
+    every stage (input fingerprints, arguments) and what came out (output fingerprints), so a rerun only
+    redoes the stages whose inputs, arguments, or outputs changed.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+# project imports
+from .cache import atomic_write, source_identity
+
+LOGGER = logging.getLogger(__name__)
+JOURNAL_FILENAME = '.stages.json'
+JOURNAL_VERSION = 1
+# thumbnails, gifs, and mp3s are small enough to hash outright, so a copy that lost its mtime still counts
+FULL_HASH_BYTES = 64 * 1024**2
+HASH_CHUNK_BYTES = 1024**2
+
+
+def content_digest(filepath):
+    # type: (str) -> str
+    hasher = hashlib.sha1()
+    with open(filepath, 'rb') as rb:
+        for chunk in iter(lambda: rb.read(HASH_CHUNK_BYTES), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def fingerprint(filepath):
+    # type: (str) -> Optional[Dict[str, Any]]
+    '''
+    Returns:
+        Optional[Dict[str, Any]]
+            size, mtime, source_identity, and for small files a full content digest, None if the file isnt there
+    '''
+    try:
+        stat = os.stat(filepath)
+        identity = source_identity(filepath)
+        digest = content_digest(filepath) if stat.st_size <= FULL_HASH_BYTES else None
+    except OSError:
+        return None
+    return dict(size=stat.st_size, mtime_ns=stat.st_mtime_ns, identity=identity, digest=digest)
+
+
+def matches(filepath, recorded):
+    # type: (str, Optional[Dict[str, Any]]) -> bool
+    '''
+    Description:
+        same size and mtime is trusted outright. a new mtime is stale, unless the file is small enough
+        to have a full digest and that still matches. source_identity only samples a few chunks,
+        an edit in between would slip past it
+    '''
+    if not recorded:
+        return False
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return False
+    if stat.st_size != recorded['size']:
+        return False
+    if stat.st_mtime_ns == recorded['mtime_ns']:
+        return True
+    if not recorded.get('digest') or stat.st_size > FULL_HASH_BYTES:
+        return False
+    try:
+        return content_digest(filepath) == recorded['digest']
+    except OSError:
+        return False
+
+
+def _normalize(arguments):
+    # type: (Dict[str, Any]) -> Dict[str, Any]
+    # whatever json would hand back, so tuples and lists compare equal after a reload
+    return json.loads(json.dumps(arguments, sort_keys=True, default=str))
+
+
+class StageJournal(object):
+    '''
+    Description:
+        "{dirpath}/.stages.json", safe to share between the threads working in that directory
+    '''
+
+    def __init__(self, dirpath):
+        # type: (str) -> None
+        self.dirpath = os.path.abspath(dirpath)
+        self.filepath = os.path.join(self.dirpath, JOURNAL_FILENAME)
+        self._lock = threading.Lock()
+        self.stages = self._load()
+
+    def _load(self):
+        # type: () -> Dict[str, dict]
+        try:
+            with open(self.filepath, encoding='utf-8') as r:
+                data = json.load(r)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != JOURNAL_VERSION:
+            LOGGER.warning('ignoring journal "%s" from another version',
+                           self.filepath)
+            return {}
+        return data.get('stages', {})
+
+    def _save(self):
+        # type: () -> None
+        os.makedirs(self.dirpath, exist_ok=True)
+        with atomic_write(self.filepath, 'w', encoding='utf-8') as w:
+            json.dump(dict(version=JOURNAL_VERSION, stages=self.stages),
+                      w,
+                      indent=2,
+                      sort_keys=True)
+
+    def is_current(self, key, inputs, arguments):
+        # type: (str, List[str], Dict[str, Any]) -> bool
+        '''
+        Description:
+            whether the stage ran before with the same arguments, on the same inputs, and its outputs are untouched
+        '''
+        with self._lock:
+            entry = self.stages.get(key)
+        if entry is None:
+            return False
+        if entry['arguments'] != _normalize(arguments):
+            LOGGER.debug('%s - arguments changed', key)
+            return False
+        if sorted(entry['inputs']) != sorted(os.path.abspath(filepath) for filepath in inputs):
+            LOGGER.debug('%s - inputs changed', key)
+            return False
+        for files in (entry['inputs'], entry['outputs']):
+            for filepath, recorded in files.items():
+                if not matches(filepath, recorded):
+                    LOGGER.debug('%s - "%s" changed', key, filepath)
+                    return False
+        return True
+
+    def record(self, key, inputs, arguments, outputs):
+        # type: (str, List[str], Dict[str, Any], List[str]) -> None
+        entry = dict(
+            arguments=_normalize(arguments),
+            inputs={
+                os.path.abspath(filepath): fingerprint(filepath)
+                for filepath in inputs
+            },
+            outputs={
+                os.path.abspath(filepath): fingerprint(filepath)
+                for filepath in outputs
+            },
+            finished=time.time(),
+        )
+        with self._lock:
+            self.stages[key] = entry
+            self._save()
+
+    def restamp(self, key):
+        # type: (str) -> None
+        '''
+        Description:
+            a later stage edited this stage's outputs in place on purpose (tagging an mp3), accept them as they are now
+        '''
+        with self._lock:
+            entry = self.stages.get(key)
+            if entry is None:
+                return
+            entry['outputs'] = {
+                filepath: fingerprint(filepath)
+                for filepath in entry['outputs']
+            }
+            self._save()
+
+    def outputs(self, key):
+        # type: (str) -> List[str]
+        with self._lock:
+            entry = self.stages.get(key)
+        return list(entry['outputs']) if entry else []
+
+
+_JOURNALS = {}  # type: Dict[str, StageJournal]
+_JOURNALS_LOCK = threading.Lock()
+
+
+def journal_for(dirpath):
+    # type: (str) -> StageJournal
+    '''
+    Description:
+        one StageJournal per directory per process, so concurrent stages dont clobber each others entries
+    '''
+    dirpath = os.path.abspath(dirpath)
+    with _JOURNALS_LOCK:
+        if dirpath not in _JOURNALS:
+            _JOURNALS[dirpath] = StageJournal(dirpath)
+        return _JOURNALS[dirpath]
@@ -0,0 +1,422 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Where the keyframes (and every other packet) are in a video, from one demux only "ffprobe -show_packets",
+    cached as memory mapped .npy next to the other caches so every later lookup is a binary search, not a probe.
+    Smart cuts, keyframe thumbnails, and GOP aligned chunking all ask the same questions of the same file.
+    Every time is relative to the container's start_time, the same clock ffmpeg's input -ss and -t run on,
+    so an MTS that starts at 1.4s (or an MP4 with an edit list) still cuts where the index says.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 3rd party imports
+import numpy as np
+
+# project imports
+from .stdlib import CANCEL_TOKEN, CancelToken, run_subprocess
+from .cache import KEYFRAME_CACHE, KeyframeCache, source_identity
+
+LOGGER = logging.getLogger(__name__)
+PACKET_DTYPE = np.dtype([('pts', '<f8'), ('duration', '<f8'), ('pos', '<i8'),
+                         ('size', '<i8'), ('flags', 'u1')])
+# bump whenever whats in the cached arrays changes, old indexes are just never read again
+INDEX_VERSION = 3
+KEYFRAME_FLAG = 1
+DISCARD_FLAG = 2
+# ours, not ffprobe's: a keyframe with leading pictures (open GOP, CRA / RASL) that reference the GOP before it
+OPEN_GOP_FLAG = 4
+# timestamps come back from ffprobe rounded to the microsecond
+EPSILON = 1e-6
+# a demux only pass prints a line per packet, quiet this long means its stuck
+INDEX_STALL_TIMEOUT = 5 * 60
+# seconds of packets read either side of a cut point, x4 until a keyframe turns up, GOPs are rarely over 10s
+DEFAULT_WINDOW_SECONDS = 10.0
+MAX_WINDOW_SECONDS = 640.0
+
+
+def packet_args(filepath, stream='v:0', intervals=None):
+    # type: (str, str, Optional[List[Tuple[float, float]]]) -> List[str]
+    '''
+    Description:
+        intervals are (start, stop) on ffprobe's clock (NOT start_time relative), ffprobe seeks to the keyframe
+        at or before each start and reads until a packet is past stop
+    '''
+    args = ['ffprobe', '-v', 'error', '-select_streams', stream]
+    if intervals:
+        args += [
+            '-read_intervals',
+            ','.join(f'{start:0.6f}%{stop:0.6f}' for start, stop in intervals)
+        ]
+    # section names on, the one format|start_time line comes after all of the packet| lines
+    args += [
+        '-show_entries',
+        'packet=pts_time,dts_time,duration_time,size,pos,flags:format=start_time',
+        '-of', 'compact', filepath
+    ]
+    return args
+
+
+def merge_intervals(intervals):
+    # type: (Sequence[Tuple[float, float]]) -> List[Tuple[float, float]]
+    merged = []  # type: List[Tuple[float, float]]
+    for start, stop in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _number(value, cast, default):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_fields(line):
+    # type: (str) -> Dict[str, str]
+    '''
+    Description:
+        "packet|pts_time=1.001000|size=4242" -> {"pts_time": "1.001000", "size": "4242"}
+    '''
+    return dict(
+        field.split('=', 1) for field in line.strip().split('|')
+        if '=' in field)
+
+
+def parse_packet(line):
+    # type: (str) -> Optional[Tuple[float, float, int, int, int]]
+    '''
+    Description:
+        "packet|pts_time=1.001000|dts_time=0.967633|duration_time=0.033367|size=4242|pos=1337|flags=K__"
+        -> (pts, duration, pos, size, flags), keyed rather than positional since ffprobe prints fields
+        in its own order, None if theres no usable time
+    '''
+    fields = parse_fields(line)
+    pts = _number(fields.get('pts_time'), float, None)
+    if pts is None:
+        pts = _number(fields.get('dts_time'), float, None)
+    if pts is None:
+        return None
+    flags = fields.get('flags', '')
+    return (
+        pts,
+        _number(fields.get('duration_time'), float, 0.0),
+        _number(fields.get('pos'), int, -1),
+        _number(fields.get('size'), int, 0),
+        (KEYFRAME_FLAG if 'K' in flags else 0) |
+        (DISCARD_FLAG if 'D' in flags else 0),
+    )
+
+
+def scan_packets(filepath,
+                 stream='v:0',
+                 intervals=None,
+                 start_time=0.0,
+                 cancel_token=CANCEL_TOKEN):
+    # type: (str, str, Optional[Sequence[Tuple[float, float]]], float, CancelToken) -> Tuple[np.ndarray, float]
+    '''
+    Description:
+        demux (no decode) the whole stream once, or only the (start, stop) intervals,
+        start_time relative like everything else, start_time being the probed one so they can be made absolute
+    Returns:
+        Tuple[np.ndarray, float]
+            PACKET_DTYPE in presentation order with pts relative to the start_time,
+            and the container start_time itself
+    '''
+    packets = []
+    probed_start_time = [start_time]
+
+    def on_line(name, line):
+        # type: (str, str) -> None
+        if name != 'stdout':
+            return
+        if line.startswith('format|'):
+            probed_start_time[0] = _number(parse_fields(line).get('start_time'), float, start_time)
+            return
+        packet = parse_packet(line)
+        if packet is not None:
+            packets.append(packet)
+
+    if intervals:
+        intervals = [(max(start, 0.0) + start_time, stop + start_time)
+                     for start, stop in merge_intervals(intervals)]
+    exit_code, _, _ = run_subprocess(packet_args(filepath,
+                                                 stream=stream,
+                                                 intervals=intervals),
+                                     filepath,
+                                     line_callback=on_line,
+                                     stall_timeout=INDEX_STALL_TIMEOUT,
+                                     cancel_token=cancel_token)
+    if exit_code != 0:
+        raise RuntimeError(f'failed to index the packets of "{filepath}"!')
+    array = np.array(packets, dtype=PACKET_DTYPE)
+    array['pts'] -= probed_start_time[0]
+    # still in decode order, anything between a keyframe and the next one that shows before it is a leading picture
+    keys = np.flatnonzero(array['flags'] & KEYFRAME_FLAG)
+    if len(keys):
+        lowest = np.minimum.reduceat(array['pts'], keys)
+        opened = keys[lowest < array['pts'][keys] - EPSILON]
+        array['flags'][opened] |= OPEN_GOP_FLAG
+    # packets arrive in decode order, b-frames put presentation order somewhere else,
+    # and intervals that seek back to the same keyframe read the same packets twice
+    _, unique = np.unique(array['pts'], return_index=True)
+    return array[unique], probed_start_time[0]
+
+
+class KeyframeIndex(object):
+    '''
+    Description:
+        sorted keyframe (and packet) timestamps with searchsorted lookups, works the same on
+        plain arrays or the read only memory maps KeyframeCache hands back.
+        every time in and out is relative to start_time, i.e. what ffmpeg -ss means
+    '''
+
+    def __init__(self, filepath, packets, keyframes, start_time=0.0):
+        # type: (str, np.ndarray, np.ndarray, float) -> None
+        self.filepath = filepath
+        self.packets = packets
+        self.keyframes = keyframes
+        self.start_time = start_time
+        # strided views into the maps, no copies
+        self.keyframe_times = keyframes['pts']
+
+    def __len__(self):
+        return len(self.keyframes)
+
+    def __repr__(self):
+        return f'KeyframeIndex("{self.filepath}", {len(self.packets)} packets, {len(self)} keyframes)'
+
+    @property
+    def duration(self):
+        # type: () -> float
+        '''
+        Description:
+            where the last frame stops showing, not where it starts
+        '''
+        if not len(self.packets):
+            return 0.0
+        return float(np.max(self.packets['pts'] + self.packets['duration']))
+
+    def before(self, timestamp):
+        # type: (float) -> float
+        '''
+        Description:
+            the last keyframe at or before timestamp, where a stream copy starting at timestamp really starts
+        '''
+        return float(self.before_many([timestamp])[0])
+
+    def before_many(self, timestamps):
+        # type: (Sequence[float]) -> np.ndarray
+        '''
+        Description:
+            before, vectorized, anything before the first keyframe gets the first keyframe
+        '''
+        if not len(self):
+            raise ValueError(f'"{self.filepath}" has no keyframes!')
+        idxs = np.searchsorted(self.keyframe_times,
+                               np.asarray(timestamps, dtype=np.float64) + EPSILON,
+                               side='right') - 1
+        return np.asarray(self.keyframe_times[np.clip(idxs, 0, len(self) - 1)])
+
+    def after(self, timestamp):
+        # type: (float) -> Optional[float]
+        '''
+        Description:
+            the first keyframe at or after timestamp, None if theres nothing but the tail left
+        '''
+        idx = int(
+            np.searchsorted(self.keyframe_times, timestamp - EPSILON,
+                            side='left'))
+        if idx >= len(self):
+            return None
+        return float(self.keyframe_times[idx])
+
+    def offset(self, timestamp):
+        # type: (float) -> int
+        '''
+        Description:
+            byte offset of the keyframe before timestamp, -1 if the container didnt say
+        '''
+        idx = int(
+            np.searchsorted(self.keyframe_times, timestamp + EPSILON,
+                            side='right')) - 1
+        return int(self.keyframes['pos'][max(idx, 0)])
+
+    def is_keyframe(self, timestamp):
+        # type: (float) -> bool
+        idx = int(
+            np.searchsorted(self.keyframe_times, timestamp - EPSILON,
+                            side='left'))
+        return idx < len(self) and abs(self.keyframe_times[idx] -
+                                       timestamp) <= EPSILON
+
+    def is_open(self, timestamp):
+        # type: (float) -> bool
+        '''
+        Description:
+            whether the keyframe at timestamp has leading pictures, cutting there drops or corrupts them
+        '''
+        idx = int(
+            np.searchsorted(self.keyframe_times, timestamp - EPSILON,
+                            side='left'))
+        if idx >= len(self) or abs(self.keyframe_times[idx] - timestamp) > EPSILON:
+            return False
+        return bool(self.keyframes['flags'][idx] & OPEN_GOP_FLAG)
+
+    def gops(self, start=0.0, stop=None):
+        # type: (float, Optional[float]) -> List[Tuple[float, float]]
+        '''
+        Description:
+            (keyframe, next keyframe) spans covering start to stop, the last one ends at stop (or the end)
+        '''
+        stop = self.duration if stop is None else stop
+        idxs = np.searchsorted(self.keyframe_times, [start + EPSILON, stop - EPSILON],
+                               side='right') - 1
+        boundaries = [float(t) for t in self.keyframe_times[max(idxs[0], 0):max(idxs[1], 0) + 1]]
+        if not boundaries:
+            return []
+        return list(zip(boundaries, boundaries[1:] + [stop]))
+
+
+def settled(index, start, stop, window, duration=None):
+    # type: (KeyframeIndex, float, Optional[float], float, Optional[float]) -> bool
+    '''
+    Description:
+        whether a cut_index read window seconds around start / stop is enough to plan start to stop,
+        i.e. the keyframe after start and the keyframe before stop are both somewhere it actually read.
+        if the two windows ran together everything in between was read anyway
+    '''
+    start_read = start + window
+    if duration is not None and start_read >= duration:
+        return True
+    first = index.after(start)
+    if stop is not None and stop <= start_read:
+        return True
+    if first is None or first > start_read:
+        return False
+    if stop is None or stop - window <= start_read:
+        return True
+    return index.before(stop) >= stop - window
+
+
+def cut_index(filepath,
+              start=None,
+              stop=None,
+              start_time=0.0,
+              duration=None,
+              stream='v:0',
+              window=DEFAULT_WINDOW_SECONDS,
+              cancel_token=CANCEL_TOKEN):
+    # type: (str, Optional[float], Optional[float], float, Optional[float], str, float, CancelToken) -> Optional[KeyframeIndex]
+    '''
+    Description:
+        a KeyframeIndex of only the packets around start and stop, ffprobe -read_intervals, so the first
+        smart cut of a 50GB file reads a few windows instead of demuxing all of it. its only good for planning
+        that one cut, so it isnt memoized or cached. the window grows x4 until settled() says so
+    Arguments:
+        filepath: str
+        start / stop: Optional[float]
+            start_time relative seconds, None for the ends
+        start_time: float
+            the probed start_time, ffprobe wants absolute times
+        duration: Optional[float]
+            the probed duration, no point looking for a keyframe past it
+        stream: str
+        window: float
+            default DEFAULT_WINDOW_SECONDS
+        cancel_token: CancelToken
+    Returns:
+        Optional[KeyframeIndex]
+            None if even MAX_WINDOW_SECONDS didnt turn up the keyframes
+    '''
+    start = start or 0.0
+    while window <= MAX_WINDOW_SECONDS:
+        intervals = [(start - window, start + window)]
+        if stop is not None:
+            intervals.append((stop - window, stop + window))
+        packets, probed_start_time = scan_packets(filepath,
+                                                  stream=stream,
+                                                  intervals=intervals,
+                                                  start_time=start_time,
+                                                  cancel_token=cancel_token)
+        keyframes = packets[(packets['flags'] & KEYFRAME_FLAG) != 0]
+        index = KeyframeIndex(filepath, packets, keyframes, start_time=probed_start_time)
+        if settled(index, start, stop, window, duration=duration):
+            LOGGER.debug('%r settled within %0.0fs of the cut', index, window)
+            return index
+        window *= 4
+    return None
+
+
+_INDEXES = {}  # type: Dict[tuple, KeyframeIndex]
+_INDEXES_LOCK = threading.Lock()
+
+
+def keyframe_index(filepath,
+                   stream='v:0',
+                   cache=KEYFRAME_CACHE,
+                   scan=True,
+                   cancel_token=CANCEL_TOKEN):
+    # type: (str, str, Optional[KeyframeCache], bool, CancelToken) -> Optional[KeyframeIndex]
+    '''
+    Description:
+        scan_packets once per (path, size, mtime, stream), memoized in-process and persisted to cache
+        keyed by source_identity, so a moved or copied file doesnt get rescanned
+    Arguments:
+        filepath: str
+        stream: str
+            default v:0
+            ffprobe stream specifier
+        cache: Optional[KeyframeCache]
+            default KEYFRAME_CACHE
+            None to skip the on-disk cache, the in-process memo still applies
+        scan: bool
+            default True
+            False to only ever hand back an index that was already made, None if there isnt one
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+    Returns:
+        Optional[KeyframeIndex]
+    '''
+    filepath = os.path.abspath(filepath)
+    stat = os.stat(filepath)
+    key = (filepath, stat.st_size, stat.st_mtime_ns, stream)
+    with _INDEXES_LOCK:
+        if key in _INDEXES:
+            return _INDEXES[key]
+
+    arrays = None
+    if cache is not None:
+        # ":" isnt allowed in windows filenames
+        cache_id = f'{source_identity(filepath)}-{stream.replace(":", "")}-v{INDEX_VERSION}'
+        arrays = cache.get(cache_id, 'packets', 'keyframes', 'start_time')
+    if arrays is None and not scan:
+        return None
+    if arrays is None:
+        LOGGER.debug('indexing the packets of "%s"', filepath)
+        packets, start_time = scan_packets(filepath, stream=stream, cancel_token=cancel_token)
+        keyframes = packets[(packets['flags'] & KEYFRAME_FLAG) != 0]
+        arrays = dict(packets=packets,
+                      keyframes=keyframes,
+                      start_time=np.array([start_time], dtype=np.float64))
+        if cache is not None:
+            cache.put(cache_id, **arrays)
+    else:
+        LOGGER.debug('keyframe cache hit for "%s"', filepath)
+    index = KeyframeIndex(filepath,
+                          arrays['packets'],
+                          arrays['keyframes'],
+                          start_time=float(arrays['start_time'][0]))
+    with _INDEXES_LOCK:
+        _INDEXES[key] = index
+    return index
@@ -0,0 +1,214 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Putting a source video into the output tree without paying for a 20-60GB copy when the filesystem can help.
+    reflink shares the extents copy-on-write (btrfs, XFS), hardlink / symlink point at the same file,
+    copy_file_range lets the kernel (or the NFS / SMB server) move the bytes, and copy is a plain read / write.
+
+Notes:
+    - auto only picks strategies that give a real, independent file: reflink, then copy_file_range, then copy.
+      hardlink and symlink have to be asked for, editing either path edits the original recording.
+    - whichever strategy worked for a pair of devices is remembered, so the next file doesnt retry the misses.
+    - copy_file_range and copy go COPY_CHUNK_BYTES at a time and check the cancel token in between,
+      a 60GB copy2 cant be ctrl + c'd.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+import errno
+import shutil
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# project imports
+from .stdlib import CANCEL_TOKEN, CancelToken
+
+LOGGER = logging.getLogger(__name__)
+FCNTL_INSTALLED = False
+try:
+    import fcntl
+    FCNTL_INSTALLED = True
+except ImportError:
+    fcntl = None
+STRATEGIES = ['auto', 'reflink', 'hardlink', 'symlink', 'copy_file_range', 'copy']
+AUTO_STRATEGIES = ['reflink', 'copy_file_range', 'copy']
+# linux/fs.h, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+COPY_FILE_RANGE_INSTALLED = hasattr(os, 'copy_file_range')
+# small enough to notice a ctrl + c, big enough that the syscalls dont matter
+COPY_CHUNK_BYTES = 64 * 1024**2
+# the filesystem just doesnt do it, as opposed to something actually being wrong
+UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOTTY,
+    errno.ENOSYS,
+    errno.EPERM,
+    getattr(errno, 'EOPNOTSUPP', errno.ENOTSUP),
+    errno.ENOTSUP,
+}
+
+_DEVICE_STRATEGIES = {}  # type: Dict[Tuple[int, int], str]
+_DEVICE_STRATEGIES_LOCK = threading.Lock()
+
+
+class UnsupportedStrategy(OSError):
+    pass
+
+
+def _reflink(src, dst, cancel_token):
+    # type: (str, str, CancelToken) -> None
+    if not FCNTL_INSTALLED:
+        raise UnsupportedStrategy(errno.ENOTSUP, 'no fcntl, no FICLONE', src)
+    with open(src, 'rb') as rb, open(dst, 'wb') as wb:
+        try:
+            fcntl.ioctl(wb.fileno(), FICLONE, rb.fileno())
+        except OSError as e:
+            if e.errno in UNSUPPORTED_ERRNOS:
+                raise UnsupportedStrategy(e.errno, f'FICLONE: {e.strerror}', src)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _hardlink(src, dst, cancel_token):
+    # type: (str, str, CancelToken) -> None
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno in UNSUPPORTED_ERRNOS:
+            raise UnsupportedStrategy(e.errno, f'link: {e.strerror}', src)
+        raise
+
+
+def _symlink(src, dst, cancel_token):
+    # type: (str, str, CancelToken) -> None
+    try:
+        os.symlink(os.path.abspath(src), dst)
+    except OSError as e:
+        # windows wants developer mode or admin for symlinks
+        if e.errno in UNSUPPORTED_ERRNOS or getattr(e, 'winerror', None) == 1314:
+            raise UnsupportedStrategy(e.errno, f'symlink: {e.strerror}', src)
+        raise
+
+
+def _copy_file_range(src, dst, cancel_token):
+    # type: (str, str, CancelToken) -> None
+    if not COPY_FILE_RANGE_INSTALLED:
+        raise UnsupportedStrategy(errno.ENOSYS, 'no os.copy_file_range', src)
+    with open(src, 'rb') as rb, open(dst, 'wb') as wb:
+        remaining = os.fstat(rb.fileno()).st_size
+        while remaining > 0:
+            cancel_token.check()
+            try:
+                copied = os.copy_file_range(rb.fileno(), wb.fileno(),
+                                            min(remaining, COPY_CHUNK_BYTES))
+            except OSError as e:
+                if e.errno in UNSUPPORTED_ERRNOS:
+                    raise UnsupportedStrategy(e.errno, f'copy_file_range: {e.strerror}', src)
+                raise
+            if copied == 0:
+                break
+            remaining -= copied
+    shutil.copystat(src, dst)
+
+
+def _copy(src, dst, cancel_token):
+    # type: (str, str, CancelToken) -> None
+    with open(src, 'rb') as rb, open(dst, 'wb') as wb:
+        while True:
+            cancel_token.check()
+            chunk = rb.read(COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            wb.write(chunk)
+    shutil.copystat(src, dst)
+
+
+FUNCTIONS = {
+    'reflink': _reflink,
+    'hardlink': _hardlink,
+    'symlink': _symlink,
+    'copy_file_range': _copy_file_range,
+    'copy': _copy,
+}
+
+
+def _remove(filepath):
+    # type: (str) -> None
+    # unlink, never truncate, dst could be a hardlink to (or a symlink at) the source
+    if os.path.lexists(filepath):
+        os.remove(filepath)
+
+
+def candidates(src, dst, strategy='auto'):
+    # type: (str, str, str) -> List[str]
+    '''
+    Description:
+        the strategies to try in order, auto starts from whatever worked last time between these two devices
+    '''
+    if strategy not in STRATEGIES:
+        raise ValueError(f'unknown materialize strategy "{strategy}", pick from {STRATEGIES}!')
+    if strategy != 'auto':
+        return [strategy]
+    key = _device_pair(src, dst)
+    with _DEVICE_STRATEGIES_LOCK:
+        remembered = _DEVICE_STRATEGIES.get(key)
+    if remembered:
+        return AUTO_STRATEGIES[AUTO_STRATEGIES.index(remembered):]
+    return list(AUTO_STRATEGIES)
+
+
+def _device_pair(src, dst):
+    # type: (str, str) -> Tuple[int, int]
+    return os.stat(src).st_dev, os.stat(os.path.dirname(os.path.abspath(dst))).st_dev
+
+
+def materialize(src, dst, strategy='auto', cancel_token=CANCEL_TOKEN):
+    # type: (str, str, Optional[str], CancelToken) -> str
+    '''
+    Description:
+        make dst have the contents of src as cheaply as the filesystem allows, replacing whatever dst was
+    Arguments:
+        src: str
+        dst: str
+        strategy: Optional[str]
+            default auto
+            one of STRATEGIES, an explicit one that the filesystem cant do raises instead of falling back
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+            checked between copy_file_range / copy chunks, a cancelled copy is removed
+    Returns:
+        str
+            the strategy that worked
+    '''
+    strategy = strategy or 'auto'
+    src = os.path.abspath(src)
+    dst = os.path.abspath(dst)
+    if not os.path.islink(dst) and os.path.normcase(os.path.realpath(src)) == os.path.normcase(os.path.realpath(dst)):
+        raise ValueError(f'refusing to materialize "{src}" onto itself!')
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+    unsupported = []
+    for candidate in candidates(src, dst, strategy):
+        _remove(dst)
+        try:
+            FUNCTIONS[candidate](src, dst, cancel_token)
+        except UnsupportedStrategy as e:
+            LOGGER.debug('"%s" -> "%s" cant %s: %s', src, dst, candidate, e)
+            unsupported.append(candidate)
+            _remove(dst)
+            continue
+        except BaseException:
+            _remove(dst)
+            raise
+        if strategy == 'auto':
+            with _DEVICE_STRATEGIES_LOCK:
+                _DEVICE_STRATEGIES[_device_pair(src, dst)] = candidate
+        LOGGER.debug('materialized "%s" -> "%s" with %s', src, dst, candidate)
+        return candidate
+    raise OSError(errno.ENOTSUP,
+                  f'could not materialize "{src}" with any of {unsupported}', dst)
@@ -8,15 +8,20 @@ Description:
 '''
 # stdlib imports
 import os
+import re
 import copy
 import logging
+from typing import List, Optional, Tuple
 
 # project imports
 from .stdlib import indent, LiveDict
+from .materialize import STRATEGIES as MATERIALIZE_STRATEGIES
 from .thirdparty import load_yaml
 
 LOGGER = logging.getLogger(__name__)
 ARTIST_DB_FILEPATH = os.path.join(os.path.dirname(__file__), 'artist-db.yaml')
+# copy: stream copy, cuts snap to keyframes, smart: frame accurate, see library.ffmpeg.smart_cut
+TRIM_MODES = ['copy', 'smart']
 
 
 def tpl_to_seconds(h, m, s):
@@ -67,6 +72,71 @@ def timestamp_to_seconds(timestamp):
     return seconds
 
 
+RESOLUTION_LABELS = [
+    (3840, '4K'),
+    (2560, '1440p'),
+    (1920, '1080p'),
+    (1280, '720p'),
+]
+# "4K60", "1080p", "2160p @ 29.97fps", the class and the (optional) frame rate
+RESOLUTION_REGEX = re.compile(
+    r'^\s*(\d+[pk]|uhd)\s*@?\s*(\d+(?:\.\d+)?)?\s*(?:fps)?\s*$', re.IGNORECASE)
+RESOLUTION_ALIASES = {'2160p': '4k', 'uhd': '4k'}
+
+
+def resolution_label(width, height, fps=None):
+    # type: (int, int, float) -> str
+    '''
+    Description:
+        3840x2160 @ 59.94 -> "4K60", 1080x1920 @ 29.97 -> "1080p30", portrait or not
+    '''
+    label = f'{min(width, height)}p'
+    for long_side, name in RESOLUTION_LABELS:
+        if max(width, height) >= long_side:
+            label = name
+            break
+    if fps:
+        label += str(int(round(fps)))
+    return label
+
+
+def split_resolution(label):
+    # type: (str) -> Optional[Tuple[str, Optional[int]]]
+    '''
+    Description:
+        "4K60" -> ("4k", 60), "2160p" -> ("4k", None), "1080p @ 29.97" -> ("1080p", 30), None if its not a label
+    '''
+    mo = RESOLUTION_REGEX.match(str(label))
+    if not mo:
+        return None
+    resolution, fps = mo.groups()
+    resolution = resolution.lower()
+    return (RESOLUTION_ALIASES.get(resolution, resolution),
+            int(round(float(fps))) if fps else None)
+
+
+def same_fps(a, b):
+    # type: (object, object) -> bool
+    try:
+        return int(round(float(a))) == int(round(float(b)))
+    except (TypeError, ValueError):
+        return str(a).strip().lower() == str(b).strip().lower()
+
+
+def same_resolution(value, probed_value):
+    # type: (str, str) -> bool
+    '''
+    Description:
+        the class has to agree, the frame rate only if the YAML bothered to say one, "4K" is fine for a "4K60" file
+    '''
+    ours, theirs = split_resolution(value), split_resolution(probed_value)
+    if ours is None or theirs is None:
+        return str(value).strip().lower() == str(probed_value).strip().lower()
+    if ours[0] != theirs[0]:
+        return False
+    return ours[1] is None or theirs[1] is None or ours[1] == theirs[1]
+
+
 class Video(object):
     CRITICAL_STATIC_ATTRIBUTES = [
         'title',
@@ -85,6 +155,9 @@ class Video(object):
         'stop',
         'recording',
         'resolution',
+        'fps',
+        'codec',
+        'video_bitrate',
         'bitrate',
         'video_stats',
         'commentary',
@@ -97,6 +170,8 @@ class Video(object):
         'manifest_basename',
         'manifest_dirpath',
         'manifest_filename',
+        'materialize',
+        'trim_mode',
     ]
     CRITICAL_FORMATTABLE_ATTRIBUTES = [
         'filepath',
@@ -126,6 +201,9 @@ class Video(object):
     stop = None
     recording = None
     resolution = None
+    fps = None
+    codec = None
+    video_bitrate = None
     bitrate = None
     video_stats = None
     commentary = None
@@ -138,6 +216,8 @@ class Video(object):
     manifest_basename = None
     manifest_dirpath = None
     manifest_filename = None
+    materialize = None
+    trim_mode = None
 
     # critical formattable attributes
     _filepath = None
@@ -169,6 +249,9 @@ class Video(object):
         stop=None,
         recording=None,
         resolution=None,
+        fps=None,
+        codec=None,
+        video_bitrate=None,
         bitrate=None,
         video_stats=None,
         commentary=None,
@@ -181,6 +264,8 @@ class Video(object):
         manifest_basename=None,
         manifest_dirpath=None,
         manifest_filename=None,
+        materialize=None,
+        trim_mode=None,
         # non-critical formattable attributes
         long_title=None,
         video_filename=None,
@@ -204,6 +289,9 @@ class Video(object):
         self.stop = stop
         self.recording = recording
         self.resolution = resolution
+        self.fps = fps
+        self.codec = codec
+        self.video_bitrate = video_bitrate
         self.bitrate = bitrate
         self.video_stats = video_stats
         self.commentary = commentary
@@ -216,6 +304,8 @@ class Video(object):
         self.manifest_basename = manifest_basename
         self.manifest_dirpath = manifest_dirpath
         self.manifest_filename = manifest_filename
+        self.materialize = materialize
+        self.trim_mode = trim_mode
 
         # critical formattable attributes
         self._filepath = filepath
@@ -365,6 +455,55 @@ class Video(object):
         new.post_process()
         return new
 
+    def apply_probe(self, probed):
+        # type: (object) -> List[str]
+        '''
+        Description:
+            fill in resolution, fps, codec, video_bitrate, and video_stats from a library.ffmpeg.Probe
+            wherever the YAML left them empty, and complain wherever the YAML disagrees with the file
+        Returns:
+            List[str]
+                the mismatches
+        '''
+        problems = []
+        if probed.width and probed.height:
+            probed_values = dict(
+                resolution=resolution_label(probed.width, probed.height,
+                                            probed.fps),
+                fps=str(int(round(probed.fps))) if probed.fps else None,
+                codec=probed.codec,
+                video_bitrate=f'{probed.bitrate / 1e6:0.1f} Mbps'
+                if probed.bitrate else None,
+            )
+        else:
+            probed_values = {}
+        for key, probed_value in probed_values.items():
+            if probed_value is None:
+                continue
+            value = getattr(self, key)
+            if value is None:
+                setattr(self, key, probed_value)
+                continue
+            if key == 'video_bitrate':
+                continue
+            elif key == 'resolution':
+                same = same_resolution(value, probed_value)
+            elif key == 'fps':
+                same = same_fps(value, probed_value)
+            else:
+                same = str(value).strip().lower() == probed_value.lower()
+            if not same:
+                problems.append(
+                    f'{key} is "{value}" in the YAML but the file is "{probed_value}"'
+                )
+        if self.video_stats is None and probed_values:
+            stats = [self.resolution, (self.codec or '').upper()]
+            if self.video_bitrate:
+                stats.append(self.video_bitrate)
+            self.video_stats = ' '.join(stat for stat in stats if stat)
+        self.post_process()
+        return problems
+
     def problems(self):
         problems = []
         if not os.path.isfile(self.filepath):
@@ -379,6 +518,12 @@ class Video(object):
             if getattr(self, key) is None:
                 problems.append(f'{key} is None')
 
+        if self.materialize is not None and self.materialize not in MATERIALIZE_STRATEGIES:
+            problems.append(
+                f'materialize "{self.materialize}" isnt one of {MATERIALIZE_STRATEGIES}')
+        if self.trim_mode is not None and self.trim_mode not in TRIM_MODES:
+            problems.append(f'trim_mode "{self.trim_mode}" isnt one of {TRIM_MODES}')
+
         # for key in Video.NON_CRITICAL_FORMATTABLE_ATTRIBUTES + Video.CRITICAL_FORMATTABLE_ATTRIBUTES:
         #     if getattr(self, key) is None:
         #         problems.append(f'{key} is None')
@@ -0,0 +1,135 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Perceptual hashes of decoded frames and near-duplicate removal.
+    Hashes are (N, bits) bool arrays rather than packed ints so hamming distances are one matrix product.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import logging
+from typing import List, Optional, Sequence
+
+# 3rd party imports
+import numpy as np
+
+# project imports
+from .scoring import grayscale
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_HASH_SIZE = 8
+# out of 64 bits, roughly "same shot, someone moved a little"
+DEFAULT_HAMMING_THRESHOLD = 10
+
+
+def block_mean(gray, height, width):
+    # type: (np.ndarray, int, int) -> np.ndarray
+    '''
+    Description:
+        area downscale of (N, H, W) to (N, height, width), good enough to kill noise before hashing
+    '''
+    _, src_height, src_width = gray.shape
+    if src_height < height or src_width < width:
+        raise ValueError(
+            f'cannot block average {src_height}x{src_width} down to {height}x{width}!'
+        )
+    rows = np.linspace(0, src_height, height + 1).astype(np.int64)
+    cols = np.linspace(0, src_width, width + 1).astype(np.int64)
+    summed = np.add.reduceat(gray, rows[:-1], axis=1)
+    summed = np.add.reduceat(summed, cols[:-1], axis=2)
+    areas = np.outer(np.diff(rows), np.diff(cols))
+    return summed / areas
+
+
+def dhash(frames, hash_size=DEFAULT_HASH_SIZE):
+    # type: (np.ndarray, int) -> np.ndarray
+    '''
+    Description:
+        difference hash, is each cell brighter than its right hand neighbor?
+        https://www.hackerfactor.com/blog/index.php?/archives/529-Kind-of-Like-That.html
+    Returns:
+        np.ndarray
+            (N, hash_size * hash_size) bool
+    '''
+    small = block_mean(grayscale(frames), hash_size, hash_size + 1)
+    return (small[:, :, 1:] > small[:, :, :-1]).reshape(len(frames), -1)
+
+
+def dct_matrix(size):
+    # type: (int) -> np.ndarray
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+    matrix[0] *= np.sqrt(1 / size)
+    matrix[1:] *= np.sqrt(2 / size)
+    return matrix
+
+
+def phash(frames, hash_size=DEFAULT_HASH_SIZE, highfreq_factor=4):
+    # type: (np.ndarray, int, int) -> np.ndarray
+    '''
+    Description:
+        DCT hash, low frequency coefficients compared against their median
+        https://www.hackerfactor.com/blog/index.php?/archives/432-Looks-Like-It.html
+    Returns:
+        np.ndarray
+            (N, hash_size * hash_size) bool
+    '''
+    size = hash_size * highfreq_factor
+    small = block_mean(grayscale(frames), size, size)
+    dct = dct_matrix(size)
+    coefficients = np.einsum('ij,njk,lk->nil', dct, small, dct)
+    low = coefficients[:, :hash_size, :hash_size].reshape(len(frames), -1)
+    # the DC term is just the average brightness, leave it out of the median
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    return low > median
+
+
+HASH_FUNCTIONS = {
+    'dhash': dhash,
+    'phash': phash,
+}
+
+
+def hamming_distances(hashes, others=None):
+    # type: (np.ndarray, Optional[np.ndarray]) -> np.ndarray
+    '''
+    Description:
+        (N, bits) x (M, bits) -> (N, M) count of differing bits
+    '''
+    others = hashes if others is None else others
+    left = hashes.astype(np.int32)
+    right = others.astype(np.int32)
+    return left @ (1 - right).T + (1 - left) @ right.T
+
+
+def dedupe(hashes, order=None, threshold=DEFAULT_HAMMING_THRESHOLD):
+    # type: (np.ndarray, Optional[Sequence[int]], int) -> List[int]
+    '''
+    Description:
+        greedy leader clustering, walk the frames in order and keep a frame only if it is more than
+        threshold bits away from every frame kept so far. pass the frames best-first as the order
+        and each cluster is represented by its best frame
+    Arguments:
+        hashes: np.ndarray
+            (N, bits) bool
+        order: Optional[Sequence[int]]
+            default range(N)
+        threshold: int
+            default DEFAULT_HAMMING_THRESHOLD
+            at or under this many differing bits is a near-duplicate
+    Returns:
+        List[int]
+            indexes of the representatives, in the order they were visited
+    '''
+    order = range(len(hashes)) if order is None else order
+    distances = hamming_distances(hashes)
+    keepers = []
+    for idx in order:
+        if keepers and distances[idx, keepers].min() <= threshold:
+            continue
+        keepers.append(idx)
+    LOGGER.debug('kept %d representatives out of %d frames', len(keepers),
+                 len(hashes))
+    return keepers
@@ -0,0 +1,263 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Parse "ffmpeg -progress" key=value blocks into per-job metrics and roll them up across every job in flight
+    https://ffmpeg.org/ffmpeg.html#Advanced-options  -progress url (global)
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import re
+import json
+import time
+import logging
+import datetime
+import threading
+import itertools
+import collections
+from typing import Dict, Optional
+
+# project imports
+
+LOGGER = logging.getLogger(__name__)
+PROGRESS_REGEX = re.compile(r'^(\w+)=(.*)$')
+DEFAULT_CONSOLE_INTERVAL = 10.0
+
+
+def _number(value, suffix=''):
+    # type: (str, str) -> Optional[float]
+    '''
+    Description:
+        "1.5x" -> 1.5, "2048.0kbits/s" -> 2048.0, "N/A" -> None
+    '''
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def job_kind(label):
+    # type: (str) -> str
+    '''
+    Description:
+        "trim 2024-01-01 - band" -> "trim", the first word of the label is what kind of work it is
+    '''
+    tokens = (label or '').split()
+    return tokens[0] if tokens else ''
+
+
+def _duration(seconds):
+    # type: (Optional[float]) -> str
+    if seconds is None:
+        return '?'
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+class Job(object):
+
+    def __init__(self, job_id, label, duration=None):
+        # type: (int, str, Optional[float]) -> None
+        self.job_id = job_id
+        self.label = label
+        self.duration = duration  # media seconds this job is expected to produce
+        self.started = time.time()
+        self.finished = None  # type: Optional[float]
+        self.exit_code = None  # type: Optional[int]
+        self.out_time = 0.0
+        self.fps = None  # type: Optional[float]
+        self.speed = None  # type: Optional[float]
+        self.bitrate = None  # type: Optional[float]
+        self.bytes = 0
+
+    def to_dict(self):
+        # type: () -> dict
+        return dict(
+            job=self.job_id,
+            label=self.label,
+            duration=self.duration,
+            out_time=self.out_time,
+            fps=self.fps,
+            speed=self.speed,
+            bitrate_kbps=self.bitrate,
+            bytes=self.bytes,
+            elapsed=(self.finished or time.time()) - self.started,
+            exit_code=self.exit_code,
+        )
+
+
+class ProgressTracker(object):
+    '''
+    Description:
+        thread safe roll up of every ffmpeg job, writes json lines and a compact console status
+    '''
+
+    def __init__(self,
+                 jsonl_filepath=None,
+                 console_interval=DEFAULT_CONSOLE_INTERVAL):
+        # type: (Optional[str], Optional[float]) -> None
+        self.jsonl_filepath = jsonl_filepath
+        self.console_interval = console_interval
+        self.jobs = {}  # type: Dict[int, Job]
+        self.started = None  # type: Optional[float]
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._last_console = 0.0
+
+    def configure(self, jsonl_filepath=None, console_interval=None):
+        # type: (Optional[str], Optional[float]) -> None
+        with self._lock:
+            self.jsonl_filepath = jsonl_filepath
+            if console_interval is not None:
+                self.console_interval = console_interval
+
+    def start_job(self, label, duration=None):
+        # type: (str, Optional[float]) -> Job
+        with self._lock:
+            job = Job(next(self._ids), label, duration=duration)
+            self.jobs[job.job_id] = job
+            if self.started is None:
+                self.started = job.started
+        self._write(dict(event='start', **job.to_dict()))
+        return job
+
+    def update(self, job, block):
+        # type: (Job, Dict[str, str]) -> None
+        '''
+        Description:
+            absorb one complete -progress block
+        '''
+        with self._lock:
+            # out_time_ms is really microseconds, famously
+            out_time_us = block.get('out_time_us', block.get('out_time_ms'))
+            out_time_us = _number(out_time_us) if out_time_us else None
+            if out_time_us is not None and out_time_us >= 0:
+                job.out_time = out_time_us / 1e6
+            job.fps = _number(block.get('fps', ''))
+            job.speed = _number(block.get('speed', ''), 'x')
+            job.bitrate = _number(block.get('bitrate', ''), 'kbits/s')
+            total_size = _number(block.get('total_size', ''))
+            if total_size is not None:
+                job.bytes = int(total_size)
+        self._write(dict(event='progress', **job.to_dict()))
+        self._console()
+
+    def finish_job(self, job, exit_code):
+        # type: (Job, int) -> None
+        with self._lock:
+            job.finished = time.time()
+            job.exit_code = exit_code
+            if exit_code == 0 and job.duration:
+                job.out_time = job.duration
+        self._write(dict(event='finish', **job.to_dict()))
+        self._console(force=True)
+
+    def status(self):
+        # type: () -> dict
+        '''
+        Description:
+            media seconds produced per wall second across all jobs, and the ETA of the jobs started so far
+        '''
+        with self._lock:
+            jobs = list(self.jobs.values())
+            started = self.started
+        now = time.time()
+        active = [job for job in jobs if job.finished is None]
+        done = sum(job.out_time for job in jobs)
+        total = sum(job.duration or job.out_time for job in jobs)
+        elapsed = now - started if started else 0.0
+        throughput = done / elapsed if elapsed > 0 else None
+        eta = None
+        if throughput:
+            eta = max(total - done, 0.0) / throughput
+        return dict(
+            event='status',
+            time=now,
+            active=len(active),
+            finished=len(jobs) - len(active),
+            media_done=done,
+            media_total=total,
+            throughput=throughput,
+            fps=sum(job.fps or 0 for job in active),
+            bytes=sum(job.bytes for job in jobs),
+            eta=eta,
+        )
+
+    def media_done_by_kind(self):
+        # type: () -> Dict[str, float]
+        '''
+        Description:
+            media_done split up by job_kind, a trim runs many times realtime and a gif a sliver of it,
+            so a sum across kinds mostly measures which kinds happen to be running
+        '''
+        with self._lock:
+            jobs = list(self.jobs.values())
+        done = collections.defaultdict(float)
+        for job in jobs:
+            done[job_kind(job.label)] += job.out_time
+        return dict(done)
+
+    def _write(self, record):
+        # type: (dict) -> None
+        if not self.jsonl_filepath:
+            return
+        record.setdefault('time', time.time())
+        line = json.dumps(record)
+        with self._lock:
+            with open(self.jsonl_filepath, 'a', encoding='utf-8') as a:
+                a.write(line + '\n')
+
+    def _console(self, force=False):
+        # type: (bool) -> None
+        if self.console_interval is None:
+            return
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_console < self.console_interval:
+                return
+            self._last_console = now
+        status = self.status()
+        self._write(status)
+        throughput = status['throughput']
+        LOGGER.info(
+            'PROGRESS - %d running, %d done, %s / %s media @ %s, %0.0f fps, %0.1fMB written, ETA %s',
+            status['active'], status['finished'],
+            _duration(status['media_done']), _duration(status['media_total']),
+            f'{throughput:0.2f}x' if throughput else '?', status['fps'],
+            status['bytes'] / (1024 * 1024), _duration(status['eta']))
+
+
+class ProgressParser(object):
+    '''
+    Description:
+        feed it -progress lines (as a run_subprocess line_callback), it hands complete blocks to the tracker
+    '''
+
+    def __init__(self, tracker, job):
+        # type: (ProgressTracker, Job) -> None
+        self.tracker = tracker
+        self.job = job
+        self.block = {}  # type: Dict[str, str]
+
+    def __call__(self, name, line):
+        # type: (str, str) -> None
+        mo = PROGRESS_REGEX.match(line.strip())
+        if not mo:
+            return
+        key, value = mo.groups()
+        self.block[key] = value
+        if key == 'progress':  # always the last key of a block
+            self.tracker.update(self.job, self.block)
+            self.block = {}
+
+    @property
+    def out_time(self):
+        # type: () -> float
+        return self.job.out_time
+
+
+TRACKER = ProgressTracker()
@@ -0,0 +1,583 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Run a DAG of tasks on a thread pool where every task belongs to a resource class and every class has
+    its own concurrency limit, so 16 thumbnail decodes cant starve the cheap tagging jobs behind them.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+import time
+import logging
+import threading
+import contextlib
+import statistics
+import multiprocessing
+import concurrent.futures
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# project imports
+from .stdlib import CANCEL_TOKEN, CancelToken, CancelledError
+from .progress import TRACKER, ProgressTracker
+from .devices import prefetch
+
+LOGGER = logging.getLogger(__name__)
+CPU_COUNT = multiprocessing.cpu_count()
+# decode-heavy cpu, encode, disk copy, light python
+RESOURCES = ['decode', 'encode', 'disk', 'light']
+DEFAULT_LIMITS = {
+    'decode': max(1, CPU_COUNT // 4),
+    'encode': max(1, CPU_COUNT // 2),
+    'disk': 2,
+    'light': CPU_COUNT,
+}
+# the ones whose children actually burn cores, and so draw on the core budget
+CPU_RESOURCES = ['decode', 'encode']
+# anything but light work counts against the adaptive in-flight cap
+THROTTLED_RESOURCES = ['decode', 'encode', 'disk']
+DEFAULT_ADAPTIVE_INTERVAL = 15.0
+# past these its not worth trying more jobs, back off
+HIGH_IOWAIT = 0.25
+HIGH_LOAD_FACTOR = 1.5
+LOW_MEMORY_FRACTION = 0.1
+# the dead-band, throughput has to move by more than this to count as better or worse, 15s samples are noisy
+THROUGHPUT_EPSILON = 0.1
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+CANCELLED = 'cancelled'
+
+
+def parse_limits(tokens):
+    # type: (List[str]) -> Dict[str, int]
+    '''
+    Description:
+        ['decode=2', 'disk=1'] -> DEFAULT_LIMITS with decode and disk overridden
+    '''
+    limits = dict(DEFAULT_LIMITS)
+    for token in tokens:
+        name, _, limit = token.partition('=')
+        if name not in RESOURCES:
+            raise ValueError(
+                f'unknown resource "{name}", pick from {RESOURCES}!')
+        limits[name] = max(1, int(limit))
+    return limits
+
+
+class CoreBudget(object):
+    '''
+    Description:
+        every ffmpeg / imagemagick child defaults to one thread per core, run cpu_count of them and thats
+        N x N threads fighting over N cores. hand each child a fair share of the cores instead, a share is
+        fixed once the child starts, but children started after others finish get the freed up cores
+    '''
+
+    def __init__(self, total=CPU_COUNT):
+        # type: (int) -> None
+        self.total = total
+        self.used = 0
+        self.leases = 0
+        self.demand = 0  # how many cpu heavy jobs the scheduler expects to be running at once
+        self._lock = threading.Lock()
+
+    def configure(self, total):
+        # type: (int) -> None
+        '''
+        Description:
+            0 turns the budget off, children pick their own thread counts again
+        '''
+        with self._lock:
+            self.total = max(0, total)
+
+    def acquire(self):
+        # type: () -> int
+        '''
+        Returns:
+            int
+                threads the child may use, 0 if the budget is off
+        '''
+        with self._lock:
+            if not self.total:
+                return 0
+            self.leases += 1
+            share = self.total // max(self.leases, self.demand, 1)
+            # once its oversubscribed, one thread each is the least bad option
+            threads = max(1, min(share, self.total - self.used))
+            self.used += threads
+        LOGGER.debug('leased %d / %d cores', threads, self.total)
+        return threads
+
+    def release(self, threads):
+        # type: (int) -> None
+        if not threads:
+            return
+        with self._lock:
+            self.leases -= 1
+            self.used -= threads
+
+    @contextlib.contextmanager
+    def lease(self):
+        threads = self.acquire()
+        try:
+            yield threads
+        finally:
+            self.release(threads)
+
+
+CORE_BUDGET = CoreBudget()
+
+
+def read_loadavg():
+    # type: () -> float
+    with open('/proc/loadavg', encoding='utf-8') as r:
+        return float(r.read().split()[0])
+
+
+def read_cpu_times():
+    # type: () -> Tuple[int, int]
+    '''
+    Returns:
+        Tuple[int, int]
+            total jiffies, iowait jiffies, since boot
+    '''
+    with open('/proc/stat', encoding='utf-8') as r:
+        # cpu  user nice system idle iowait irq softirq steal ...
+        fields = [int(field) for field in r.readline().split()[1:]]
+    return sum(fields), fields[4]
+
+
+def read_memory_available():
+    # type: () -> float
+    '''
+    Returns:
+        float
+            MemAvailable / MemTotal
+    '''
+    meminfo = {}
+    with open('/proc/meminfo', encoding='utf-8') as r:
+        for line in r:
+            key, _, value = line.partition(':')
+            meminfo[key] = int(value.split()[0])
+    return meminfo['MemAvailable'] / meminfo['MemTotal']
+
+
+class AdaptiveController(object):
+    '''
+    Description:
+        hill climb the number of heavy jobs in flight: keep stepping the way that last raised throughput,
+        turn around when it drops, and back off whenever iowait, load, or free memory say the box is saturated.
+        USB and network drives get slower with every extra reader, this finds that knee on its own
+            - throughput is compared kind against kind (trim to trim, gif to gif), see change()
+            - anything inside THROUGHPUT_EPSILON is noise, the target holds
+    '''
+
+    def __init__(self,
+                 maximum,
+                 minimum=1,
+                 initial=None,
+                 interval=DEFAULT_ADAPTIVE_INTERVAL,
+                 tracker=TRACKER):
+        # type: (int, int, Optional[int], float, ProgressTracker) -> None
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.target = initial or max(self.minimum, self.maximum // 2)
+        self.interval = interval
+        self.tracker = tracker
+        self.direction = 1
+        self.enabled = os.path.exists('/proc/stat')
+        if not self.enabled:
+            LOGGER.warning(
+                'adaptive concurrency needs /proc, sticking with the static limits'
+            )
+        self._last_step = None  # type: Optional[float]
+        self._last_media_done = {}  # type: Dict[str, float]
+        self._last_cpu_times = None  # type: Optional[Tuple[int, int]]
+        self._last_rates = None  # type: Optional[Dict[str, float]]
+
+    def allowed(self):
+        # type: () -> Optional[int]
+        return self.target if self.enabled else None
+
+    def sample(self):
+        # type: () -> dict
+        now = time.time()
+        media_done = self.tracker.media_done_by_kind()
+        total, iowait = read_cpu_times()
+        sample = dict(
+            load=read_loadavg(),
+            memory=read_memory_available(),
+            iowait=None,
+            throughput=None,
+            rates=None,
+        )
+        if self._last_cpu_times is not None:
+            last_total, last_iowait = self._last_cpu_times
+            if total > last_total:
+                sample['iowait'] = (iowait - last_iowait) / (total - last_total)
+        if self._last_step is not None and now > self._last_step:
+            elapsed = now - self._last_step
+            # media seconds per wall second for every kind that made progress this interval
+            sample['rates'] = {
+                kind: (done - self._last_media_done.get(kind, 0.0)) / elapsed
+                for kind, done in media_done.items()
+                if done > self._last_media_done.get(kind, 0.0)
+            }
+            sample['throughput'] = sum(sample['rates'].values())
+        self._last_step = now
+        self._last_media_done = media_done
+        self._last_cpu_times = (total, iowait)
+        return sample
+
+    def change(self, rates):
+        # type: (Dict[str, float]) -> Optional[float]
+        '''
+        Description:
+            the median ratio of this interval's throughput to the last one, over the kinds running in both,
+            None when they have nothing in common and there is nothing fair to compare
+        '''
+        if not self._last_rates:
+            return None
+        ratios = [
+            rate / self._last_rates[kind]
+            for kind, rate in rates.items()
+            if self._last_rates.get(kind)
+        ]
+        if not ratios:
+            return None
+        return statistics.median(ratios)
+
+    def step(self):
+        # type: () -> int
+        '''
+        Description:
+            take a sample and maybe move the target, call it as often as you like, it only acts every interval
+        Returns:
+            int
+                the in-flight target
+        '''
+        if not self.enabled:
+            return self.target
+        if self._last_step is not None and time.time() - self._last_step < self.interval:
+            return self.target
+        sample = self.sample()
+        throughput = sample['throughput']
+        if throughput is None:
+            return self.target
+
+        previous = self.target
+        first = self._last_rates is None
+        change = self.change(sample['rates'])
+        hold = False
+        if sample['memory'] < LOW_MEMORY_FRACTION:
+            reason = 'low memory'
+            self.direction = -1
+        elif sample['iowait'] is not None and sample['iowait'] > HIGH_IOWAIT:
+            reason = 'high iowait'
+            self.direction = -1
+        elif sample['load'] > HIGH_LOAD_FACTOR * CPU_COUNT:
+            reason = 'high load'
+            self.direction = -1
+        elif first:
+            reason = 'probing'
+        elif change is None:
+            reason = 'different work running, nothing to compare'
+            hold = True
+        elif change > 1 + THROUGHPUT_EPSILON:
+            reason = 'throughput improved'
+        elif change < 1 - THROUGHPUT_EPSILON:
+            reason = 'throughput dropped'
+            self.direction = -self.direction
+        else:
+            reason = 'throughput flat'
+            hold = True
+        if not hold:
+            self.target = min(self.maximum,
+                              max(self.minimum, self.target + self.direction))
+        self._last_rates = sample['rates']
+        iowait = sample['iowait']
+        LOGGER.info(
+            'ADAPTIVE - %d -> %d jobs, %s (load %0.2f, iowait %s, memory %0.0f%% free, %0.2fx realtime)',
+            previous, self.target, reason, sample['load'],
+            f'{iowait:0.0%}' if iowait is not None else '?',
+            sample['memory'] * 100, throughput)
+        return self.target
+
+
+class Task(object):
+    '''
+    Description:
+        func(*args, **kwargs) once every dependency is DONE. raising, or returning a non-zero int
+        (an exit code) counts as FAILED, and everything downstream of it is SKIPPED.
+        raising CancelledError counts as CANCELLED
+    Arguments:
+        device: Optional[int]
+            st_dev of the drive the task streams from, see Scheduler device_limit
+        prefetch: Optional[str]
+            the file the task streams, the scheduler can warm it up while the task is still queued
+    '''
+
+    def __init__(self,
+                 name,
+                 func,
+                 resource='light',
+                 deps=(),
+                 args=(),
+                 kwargs=None,
+                 device=None,
+                 prefetch=None):
+        # type: (str, Callable[..., Any], str, Sequence[str], Sequence[Any], Optional[dict], Optional[int], Optional[str]) -> None
+        if resource not in RESOURCES:
+            raise ValueError(
+                f'unknown resource "{resource}", pick from {RESOURCES}!')
+        self.name = name
+        self.func = func
+        self.resource = resource
+        self.deps = list(deps)
+        self.args = list(args)
+        self.kwargs = kwargs or {}
+        self.device = device
+        self.prefetch = prefetch
+        self.state = PENDING
+        self.result = None  # type: Any
+        self.exception = None  # type: Optional[BaseException]
+
+    def __repr__(self):
+        return f'Task({self.name!r}, {self.resource}, {self.state})'
+
+
+class Scheduler(object):
+
+    def __init__(self,
+                 limits=None,
+                 budget=CORE_BUDGET,
+                 controller=None,
+                 device_limit=None,
+                 prefetch=False,
+                 cancel_token=CANCEL_TOKEN,
+                 keep_going=False):
+        # type: (Optional[Dict[str, int]], CoreBudget, Optional[AdaptiveController], Optional[int], bool, CancelToken, bool) -> None
+        '''
+        Arguments:
+            limits: Optional[Dict[str, int]]
+                resource -> concurrency, anything missing comes from DEFAULT_LIMITS
+            budget: CoreBudget
+                default CORE_BUDGET
+            controller: Optional[AdaptiveController]
+                caps the heavy tasks in flight on top of limits
+            device_limit: Optional[int]
+                at most this many tasks streaming from any one drive at once, None / 0 is no limit
+            prefetch: bool
+                default False
+                whenever a task starts, prefetch the next queued task's file, if its drive has a free slot
+            cancel_token: CancelToken
+                default CANCEL_TOKEN
+                cancelled on the first failure (or ctrl + c), which kills every running child and
+                drops everything that hasnt started, the tasks should share it
+            keep_going: bool
+                default False
+                a failure only skips whats downstream of it, everything else carries on
+        '''
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.budget = budget
+        self.controller = controller
+        self.device_limit = device_limit
+        self.prefetch = prefetch
+        self.cancel_token = cancel_token
+        self.keep_going = keep_going
+        self._prefetched = set()
+        self.tasks = OrderedDict()  # type: Dict[str, Task]
+
+    def add(self, task):
+        # type: (Task) -> Task
+        if task.name in self.tasks:
+            raise ValueError(f'task "{task.name}" already exists!')
+        self.tasks[task.name] = task
+        return task
+
+    def _validate(self):
+        # type: () -> None
+        for task in self.tasks.values():
+            for dep in task.deps:
+                if dep not in self.tasks:
+                    raise ValueError(
+                        f'task "{task.name}" depends on unknown task "{dep}"!')
+        # kahn's algorithm, whatever cant be ordered is in a cycle
+        remaining = {name: len(task.deps) for name, task in self.tasks.items()}
+        dependents = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.deps:
+                dependents[dep].append(task.name)
+        ready = [name for name, count in remaining.items() if count == 0]
+        ordered = 0
+        while ready:
+            name = ready.pop()
+            ordered += 1
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if ordered != len(self.tasks):
+            raise ValueError('tasks have a dependency cycle!')
+
+    def _device_counts(self):
+        # type: () -> Dict[int, int]
+        device_counts = {}  # type: Dict[int, int]
+        for task in self.tasks.values():
+            if task.state == RUNNING and task.device is not None:
+                device_counts[task.device] = device_counts.get(
+                    task.device, 0) + 1
+        return device_counts
+
+    def _ready(self, running_counts):
+        # type: (Dict[str, int]) -> List[Task]
+        ready = []
+        counts = dict(running_counts)
+        device_counts = self._device_counts()
+        allowed = self.controller.allowed() if self.controller else None
+        throttled = sum(counts[resource] for resource in THROTTLED_RESOURCES)
+        for task in self.tasks.values():
+            if task.state != PENDING:
+                continue
+            states = [self.tasks[dep].state for dep in task.deps]
+            if any(state in (FAILED, SKIPPED) for state in states):
+                task.state = SKIPPED
+                LOGGER.warning('%s - SKIPPED, a dependency failed', task.name)
+                continue
+            if not all(state == DONE for state in states):
+                continue
+            if counts[task.resource] >= self.limits[task.resource]:
+                continue
+            throttle = task.resource in THROTTLED_RESOURCES
+            if throttle and allowed is not None and throttled >= allowed:
+                continue
+            if (self.device_limit and task.device is not None and
+                    device_counts.get(task.device, 0) >= self.device_limit):
+                continue
+            if throttle:
+                throttled += 1
+            if task.device is not None:
+                device_counts[task.device] = device_counts.get(
+                    task.device, 0) + 1
+            counts[task.resource] += 1
+            ready.append(task)
+        return ready
+
+    def _prefetch_next(self):
+        # type: () -> None
+        '''
+        Description:
+            the kernel reads ahead in the background, so by the time the next task gets its slot
+            the head of its file is already in the page cache.
+            never on a drive thats already at device_limit, the read ahead would just be one more reader
+        '''
+        device_counts = self._device_counts()
+        for task in self.tasks.values():
+            if task.state != PENDING or not task.prefetch:
+                continue
+            if (self.device_limit and task.device is not None and
+                    device_counts.get(task.device, 0) >= self.device_limit):
+                continue
+            if task.prefetch in self._prefetched:
+                continue
+            if not os.path.isfile(task.prefetch):
+                continue
+            self._prefetched.add(task.prefetch)
+            prefetch(task.prefetch)
+            return
+
+    def _update_demand(self):
+        # type: () -> None
+        unfinished = sum(1 for task in self.tasks.values()
+                         if task.resource in CPU_RESOURCES
+                         and task.state in (PENDING, RUNNING))
+        slots = sum(self.limits[resource] for resource in CPU_RESOURCES)
+        self.budget.demand = min(unfinished, slots)
+
+    def run(self):
+        # type: () -> Dict[str, Task]
+        '''
+        Description:
+            run everything, earlier added tasks get first dibs on a free slot
+        Returns:
+            Dict[str, Task]
+                every task, check .state / .result / .exception
+        '''
+        self._validate()
+        running_counts = {resource: 0 for resource in RESOURCES}
+        future_to_task = {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=sum(self.limits.values())) as executor:
+            try:
+                while True:
+                    if self.controller is not None:
+                        self.controller.step()
+                    self._update_demand()
+                    # skipping can cascade, so keep going until nothing new is ready
+                    ready = [] if self.cancel_token.cancelled else self._ready(
+                        running_counts)
+                    for task in ready:
+                        task.state = RUNNING
+                        running_counts[task.resource] += 1
+                        LOGGER.debug('%s - starting on %s', task.name,
+                                     task.resource)
+                        future = executor.submit(task.func, *task.args,
+                                                 **task.kwargs)
+                        future_to_task[future] = task
+                        if self.prefetch:
+                            self._prefetch_next()
+                    if not future_to_task:
+                        break
+                    done, _ = concurrent.futures.wait(
+                        future_to_task,
+                        # the controller may let more in before anything finishes
+                        timeout=1.0 if self.controller is not None else None,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        task = future_to_task.pop(future)
+                        running_counts[task.resource] -= 1
+                        self._finish(task, future)
+            except KeyboardInterrupt:
+                self.cancel_token.cancel('ctrl + c')
+                # the children are dead, so the threads running them unwind quickly
+                for future, task in future_to_task.items():
+                    self._finish(task, future)
+                raise
+            finally:
+                self._close()
+        return self.tasks
+
+    def _finish(self, task, future):
+        # type: (Task, concurrent.futures.Future) -> None
+        try:
+            task.result = future.result()
+        except CancelledError:
+            task.state = CANCELLED
+            LOGGER.warning('%s - CANCELLED', task.name)
+            return
+        except Exception as e:
+            task.exception = e
+            LOGGER.exception('%s - exception!', task.name)
+        failed = task.exception is not None or (
+            isinstance(task.result, int) and not isinstance(task.result, bool)
+            and task.result != 0)
+        task.state = FAILED if failed else DONE
+        if failed:
+            LOGGER.error('%s - FAILED', task.name)
+            if not self.keep_going:
+                self.cancel_token.cancel(f'{task.name} failed')
+
+    def _close(self):
+        # type: () -> None
+        for task in self.tasks.values():
+            if task.state != PENDING:
+                continue
+            # anything left pending was either dropped or had a dependency that never finished
+            task.state = CANCELLED if self.cancel_token.cancelled else SKIPPED
+        self.budget.demand = 0
@@ -0,0 +1,188 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Score decoded frames so the "best" thumbnails float to the top.
+    Every scorer takes a batch of frames shaped (N, height, width, 3) uint8 and returns (N, ) floats,
+    higher is better. Register your own with @register_scorer('name').
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 3rd party imports
+import numpy as np
+
+# project imports
+
+LOGGER = logging.getLogger(__name__)
+SCORERS = {}  # type: Dict[str, Callable[[np.ndarray], np.ndarray]]
+DEFAULT_WEIGHTS = {
+    'sharpness': 1.0,
+    'entropy': 1.0,
+    'exposure': 1.0,
+    'colorfulness': 0.5,
+}
+DEFAULT_BATCH_SIZE = 64
+# anything darker or brighter than these is considered crushed / blown out
+CLIP_LOW = 8
+CLIP_HIGH = 247
+
+
+def register_scorer(name):
+    # type: (str) -> Callable
+    def decorator(func):
+        SCORERS[name] = func
+        return func
+
+    return decorator
+
+
+def grayscale(frames):
+    # type: (np.ndarray) -> np.ndarray
+    '''
+    Description:
+        rec. 601 luma, (N, height, width, 3) uint8 -> (N, height, width) float32 0-255
+    '''
+    frames = frames.astype(np.float32)
+    return frames[..., 0] * 0.299 + frames[..., 1] * 0.587 + frames[..., 2] * 0.114
+
+
+@register_scorer('sharpness')
+def sharpness(frames):
+    # type: (np.ndarray) -> np.ndarray
+    '''
+    Description:
+        variance of the laplacian, blurry / motion smeared frames have very little high frequency
+        https://pyimagesearch.com/2015/09/07/blur-detection-with-opencv/
+    '''
+    gray = grayscale(frames)
+    laplacian = (gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] + gray[:, 1:-1, :-2] +
+                 gray[:, 1:-1, 2:] - 4 * gray[:, 1:-1, 1:-1])
+    return laplacian.reshape(len(frames), -1).var(axis=1)
+
+
+@register_scorer('entropy')
+def entropy(frames):
+    # type: (np.ndarray) -> np.ndarray
+    '''
+    Description:
+        shannon entropy of the luma histogram in bits, a black stage with one spotlight scores low
+    '''
+    count = len(frames)
+    gray = grayscale(frames).astype(np.int64).reshape(count, -1)
+    # offset every frame into its own 256 bins so one bincount does the whole batch
+    offsets = (np.arange(count, dtype=np.int64) * 256)[:, None]
+    histograms = np.bincount((gray + offsets).ravel(),
+                             minlength=count * 256).reshape(count, 256)
+    probabilities = histograms / histograms.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.where(probabilities > 0, np.log2(probabilities), 0)
+    return -(probabilities * logs).sum(axis=1)
+
+
+@register_scorer('exposure')
+def exposure(frames):
+    # type: (np.ndarray) -> np.ndarray
+    '''
+    Description:
+        penalty for clipped pixels and for drifting away from mid-gray, 0 is perfect
+    '''
+    gray = grayscale(frames).reshape(len(frames), -1)
+    clipped = ((gray <= CLIP_LOW) | (gray >= CLIP_HIGH)).mean(axis=1)
+    drift = np.abs(gray.mean(axis=1) / 255 - 0.5)
+    return -(clipped + drift)
+
+
+@register_scorer('colorfulness')
+def colorfulness(frames):
+    # type: (np.ndarray) -> np.ndarray
+    '''
+    Description:
+        Hasler and Suesstrunk 2003, "Measuring colourfulness in natural images"
+    '''
+    frames = frames.astype(np.float32).reshape(len(frames), -1, 3)
+    red, green, blue = frames[..., 0], frames[..., 1], frames[..., 2]
+    rg = red - green
+    yb = 0.5 * (red + green) - blue
+    std_root = np.sqrt(rg.std(axis=1)**2 + yb.std(axis=1)**2)
+    mean_root = np.sqrt(rg.mean(axis=1)**2 + yb.mean(axis=1)**2)
+    return std_root + 0.3 * mean_root
+
+
+def parse_weights(tokens):
+    # type: (List[str]) -> Dict[str, float]
+    '''
+    Description:
+        ['sharpness=2', 'entropy'] -> {'sharpness': 2.0, 'entropy': 1.0}
+    '''
+    weights = {}
+    for token in tokens:
+        name, _, weight = token.partition('=')
+        name = name.strip()
+        if name not in SCORERS:
+            raise ValueError(
+                f'unknown scorer "{name}", pick from {sorted(SCORERS)}!')
+        weights[name] = float(weight) if weight else 1.0
+    return weights
+
+
+def normalize(values):
+    # type: (np.ndarray) -> np.ndarray
+    '''
+    Description:
+        z-score so scorers with wildly different ranges can be weighted against each other
+    '''
+    std = values.std()
+    if std == 0:
+        return np.zeros_like(values, dtype=np.float64)
+    return (values - values.mean()) / std
+
+
+def score_frames(frames,
+                 weights=None,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 precomputed=None):
+    # type: (np.ndarray, Optional[Dict[str, float]], int, Optional[Dict[str, np.ndarray]]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]
+    '''
+    Description:
+        run every weighted scorer over the frames a batch at a time and combine them
+    Arguments:
+        frames: np.ndarray
+            (N, height, width, 3) uint8, small working size frames please
+        weights: Optional[Dict[str, float]]
+            default DEFAULT_WEIGHTS
+            scorer name -> weight, 0 weight scorers are skipped
+        batch_size: int
+            bounds the float32 copies each scorer makes
+        precomputed: Optional[Dict[str, np.ndarray]]
+            raw (N, ) values from an earlier run, those scorers are not run again
+    Returns:
+        Tuple[np.ndarray, Dict[str, np.ndarray]]
+            (N, ) combined score, and the raw (N, ) values per scorer
+    '''
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    count = len(frames)
+    precomputed = precomputed or {}
+    raw = {}
+    for name, weight in weights.items():
+        if not weight:
+            continue
+        if name in precomputed:
+            raw[name] = np.asarray(precomputed[name], dtype=np.float64)
+            continue
+        scorer = SCORERS[name]
+        values = np.empty(count, dtype=np.float64)
+        for start in range(0, count, batch_size):
+            values[start:start + batch_size] = scorer(frames[start:start +
+                                                             batch_size])
+        raw[name] = values
+
+    combined = np.zeros(count, dtype=np.float64)
+    for name, values in raw.items():
+        combined += weights[name] * normalize(values)
+    LOGGER.debug('scored %d frames with %s', count, weights)
+    return combined, raw
@@ -8,15 +8,26 @@ Description:
 
 Notes:
     2024-10-02 - chrisbcarl@outlook.com - FIX: find_common_directory had a bug with the drive letter on Windows...
+    2026-10-18 - chrisbcarl@outlook.com - run_subprocess reads through pipes into ring buffers, only spills to disk on failure
+    2026-10-18 - chrisbcarl@outlook.com - run_subprocess can time out / detect stalls and kills the whole process group
+    2026-10-18 - chrisbcarl@outlook.com - CancelToken, one cancel() kills every child in flight and refuses to start new ones
+    2026-10-18 - chrisbcarl@outlook.com - run_subprocess_async / run_subprocesses, hundreds of short children on one event loop
 '''
 # stdlib imports
 import os
+import io
 import sys
 import time
+import codecs
+import asyncio
+import signal
 import logging
 import argparse
+import threading
+import contextlib
 import subprocess
-from typing import List, Tuple, Optional
+import collections
+from typing import IO, Any, Callable, Deque, List, Set, Tuple, Optional, Union
 
 # project imports
 
@@ -61,57 +72,606 @@ def indent(text, token='    ', count=1):
 
 DEFAULT_STDOUT_FILE_DIRPATH = 'C:/temp/ffmpeg-std' if sys.platform == 'win32' else '/tmp/ffmpeg-std'
 DEFAULT_STDOUT_FILE_DIRPATH = os.path.abspath(DEFAULT_STDOUT_FILE_DIRPATH)
+# ffmpeg is chatty, only the tail is ever worth reading
+DEFAULT_MAX_LINES = 5000
+# same as coreutils timeout
+TIMEOUT_EXIT_CODE = 124
+STALLED_EXIT_CODE = 125
+DEFAULT_KILL_GRACE = 5.0
+DEFAULT_POLL_INTERVAL = 0.5
+# children in flight at once on the event loop, they are mostly waiting on disks
+DEFAULT_ASYNC_CONCURRENCY = 64
+ASYNC_CHUNK_SIZE = 64 * 1024
 
 
-def run_subprocess(args,
-                   descriptive_filepath_for_stdout,
-                   dirpath=DEFAULT_STDOUT_FILE_DIRPATH,
-                   cwd=None):
-    # type: (List[str], str, str, str) -> Tuple[int, str, str]
-    stdout = None
-    stderr = None
-    shell = False
+def _drain(pipe, buffer, name, line_callback=None):
+    # type: (IO[str], Deque[str], str, Optional[Callable[[str, str], None]]) -> None
+    try:
+        for line in pipe:
+            buffer.append(line)
+            if line_callback is not None:
+                try:
+                    line_callback(name, line)
+                except Exception:
+                    LOGGER.exception('line callback failed on %s line %r',
+                                     name, line)
+    finally:
+        pipe.close()
+
+
+def _text(pipe):
+    # type: (IO[bytes]) -> IO[str]
+    # universal newlines, so ffmpeg's \r status lines split like everything else
+    return io.TextIOWrapper(pipe, encoding='utf-8', errors='replace')
+
+
+def _drain_bytes(pipe, chunks, chunk_size=1024 * 1024):
+    # type: (IO[bytes], List[bytes], int) -> None
+    try:
+        while True:
+            chunk = pipe.read(chunk_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        pipe.close()
+
 
+def spill_to_disk(stdout, stderr, descriptive_filepath_for_stdout, dirpath):
+    # type: (str, str, str, str) -> Tuple[str, str]
     now = time.time()
     basename = get_safe_basename(descriptive_filepath_for_stdout)
     os.makedirs(dirpath, exist_ok=True)
     stdout_filepath = os.path.abspath(
         os.path.join(dirpath, f'{now}_{basename}.stdout'))
-    stdout = open(stdout_filepath, 'w', encoding='utf-8')
     stderr_filepath = os.path.abspath(
         os.path.join(dirpath, f'{now}_{basename}.stderr'))
-    stderr = open(stderr_filepath, 'w', encoding='utf-8')
-    LOGGER.debug('stdout: "%s", stderr: "%s"', stdout_filepath,
-                 stderr_filepath)
+    with open(stdout_filepath, 'w', encoding='utf-8') as w:
+        w.write(stdout)
+    with open(stderr_filepath, 'w', encoding='utf-8') as w:
+        w.write(stderr)
+    return stdout_filepath, stderr_filepath
+
+
+def kill_process_group(process, grace=DEFAULT_KILL_GRACE):
+    # type: (subprocess.Popen, float) -> int
+    '''
+    Description:
+        SIGTERM the whole process group, give it grace seconds to clean up, then SIGKILL it
+    Returns:
+        int
+            whatever the process exited with
+    '''
+    if process.poll() is not None:
+        return process.returncode
+    if sys.platform == 'win32':
+        # no process groups to signal, taskkill /T walks the tree instead
+        subprocess.call(['taskkill', '/T', '/PID', str(process.pid)],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+        try:
+            return process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            subprocess.call(['taskkill', '/T', '/F', '/PID', str(process.pid)],
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+            return process.wait()
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return process.wait()
+    try:
+        return process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        LOGGER.warning('pid %d ignored SIGTERM, sending SIGKILL', process.pid)
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        return process.wait()
+
+
+class CancelledError(RuntimeError):
+    pass
+
+
+class CancelToken(object):
+    '''
+    Description:
+        shared by everything that starts children for the same batch. once cancel() is called, every
+        registered child's process group is killed and anything that checks the token raises CancelledError
+    '''
+
+    def __init__(self):
+        self.reason = None  # type: Optional[str]
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()  # type: Set[subprocess.Popen]
+
+    @property
+    def cancelled(self):
+        # type: () -> bool
+        return self._event.is_set()
+
+    def cancel(self, reason='cancelled'):
+        # type: (str) -> None
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            processes = list(self._processes)
+        LOGGER.warning('%s - killing %d running children', reason,
+                       len(processes))
+        # each kill may wait out a grace period, dont wait them out one after another
+        killers = [
+            threading.Thread(target=kill_process_group,
+                             args=(process, ),
+                             daemon=True) for process in processes
+        ]
+        for killer in killers:
+            killer.start()
+        for killer in killers:
+            killer.join()
+
+    def reset(self):
+        # type: () -> None
+        with self._lock:
+            self.reason = None
+            self._event.clear()
+
+    def check(self):
+        # type: () -> None
+        if self._event.is_set():
+            raise CancelledError(self.reason)
+
+    def wait(self, seconds):
+        # type: (float) -> bool
+        '''
+        Description:
+            time.sleep that wakes up early on cancel()
+        Returns:
+            bool
+                whether it was cancelled
+        '''
+        return self._event.wait(seconds)
+
+    def register(self, process):
+        # type: (subprocess.Popen) -> None
+        with self._lock:
+            self._processes.add(process)
+            cancelled = self._event.is_set()
+        if cancelled:
+            # lost the race with cancel(), it never saw this one
+            kill_process_group(process)
+
+    def unregister(self, process):
+        # type: (subprocess.Popen) -> None
+        with self._lock:
+            self._processes.discard(process)
+
+    @contextlib.contextmanager
+    def partial(self, *filepaths):
+        # type: (str) -> Any
+        '''
+        Description:
+            if the block raises (cancelled or otherwise), delete whatever half written filepaths it left behind
+        '''
+        try:
+            yield
+        except BaseException:
+            for filepath in filepaths:
+                if os.path.isfile(filepath):
+                    LOGGER.warning('removing partial output "%s"', filepath)
+                    os.remove(filepath)
+            raise
+
+
+CANCEL_TOKEN = CancelToken()
+
+
+def supervise(process,
+              timeout=None,
+              stall_timeout=None,
+              heartbeat=None,
+              poll=DEFAULT_POLL_INTERVAL):
+    # type: (subprocess.Popen, Optional[float], Optional[float], Optional[Callable[[], Any]], float) -> int
+    '''
+    Description:
+        wait on a process, but kill its process group if it runs past timeout or heartbeat() stops changing
+    Returns:
+        int
+            the exit code, TIMEOUT_EXIT_CODE, or STALLED_EXIT_CODE
+    '''
+    started = time.monotonic()
+    last_beat = heartbeat() if heartbeat else None
+    last_change = started
+    while True:
+        try:
+            return process.wait(timeout=poll)
+        except subprocess.TimeoutExpired:
+            pass
+        now = time.monotonic()
+        if timeout is not None and now - started > timeout:
+            LOGGER.error('pid %d ran longer than %0.0fs, killing it',
+                         process.pid, timeout)
+            kill_process_group(process)
+            return TIMEOUT_EXIT_CODE
+        if stall_timeout is not None and heartbeat is not None:
+            beat = heartbeat()
+            if beat != last_beat:
+                last_beat, last_change = beat, now
+            elif now - last_change > stall_timeout:
+                LOGGER.error('pid %d made no progress in %0.0fs, killing it',
+                             process.pid, stall_timeout)
+                kill_process_group(process)
+                return STALLED_EXIT_CODE
+
 
-    kwargs = dict(shell=shell, stdout=stdout, stderr=stderr, cwd=cwd)
+def run_subprocess(args,
+                   descriptive_filepath_for_stdout,
+                   dirpath=DEFAULT_STDOUT_FILE_DIRPATH,
+                   cwd=None,
+                   max_lines=DEFAULT_MAX_LINES,
+                   spill=False,
+                   line_callback=None,
+                   binary_stdout=False,
+                   timeout=None,
+                   stall_timeout=None,
+                   heartbeat=None,
+                   env=None,
+                   cancel_token=CANCEL_TOKEN):
+    # type: (List[str], str, str, str, Optional[int], bool, Optional[Callable[[str, str], None]], bool, Optional[float], Optional[float], Optional[Callable[[], Any]], Optional[dict], CancelToken) -> Tuple[int, Union[str, bytes], str]
+    '''
+    Description:
+        run a command, reading stdout / stderr through pipes into bounded ring buffers
+    Arguments:
+        args: List[str]
+        descriptive_filepath_for_stdout: str
+            names the spill files
+        dirpath: str
+            default DEFAULT_STDOUT_FILE_DIRPATH
+            where stdout / stderr get spilled to
+        cwd: str
+        max_lines: Optional[int]
+            default DEFAULT_MAX_LINES
+            only the last max_lines of each stream are kept, None for all of it
+        spill: bool
+            default False
+            write stdout / stderr to dirpath even on success, they always are on failure
+        line_callback: Optional[Callable[[str, str], None]]
+            called with ("stdout" or "stderr", line) as each line shows up, for streaming parsers
+        binary_stdout: bool
+            default False
+            stdout is data (rawvideo and friends), return all of it as bytes and dont split it into lines
+        timeout: Optional[float]
+            wall clock seconds before the whole process group is killed, exit code TIMEOUT_EXIT_CODE
+        stall_timeout: Optional[float]
+            seconds heartbeat() may go without changing before the whole process group is killed,
+            exit code STALLED_EXIT_CODE
+        heartbeat: Optional[Callable[[], Any]]
+            default how many lines have been read, something that changes while the child makes progress
+        env: Optional[dict]
+            extra environment variables for the child
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+            raises CancelledError instead of starting, or once the child is killed by a cancel()
+    Returns:
+        Tuple[int, Union[str, bytes], str]
+            exit code, stdout, stderr
+    '''
+    cancel_token.check()
+    shell = False
+    kwargs = dict(shell=shell, cwd=cwd)
+    if env:
+        kwargs['env'] = dict(os.environ, **env)
     LOGGER.debug('invoking ffmpeg cmd: %r, kwargs: %s', args, kwargs)
+    stdout_buffer = collections.deque(maxlen=max_lines)
+    stderr_buffer = collections.deque(maxlen=max_lines)
+    lines_read = [0]
+
+    def on_line(name, line):
+        # type: (str, str) -> None
+        lines_read[0] += 1
+        if line_callback is not None:
+            line_callback(name, line)
+
+    if heartbeat is None:
+        heartbeat = lambda: lines_read[0]  # noqa: E731
+    # own process group, so the kill takes ffmpeg's children (and shells) down with it
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    process = subprocess.Popen(args,
+                               stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               **kwargs)
+    cancel_token.register(process)
+    stdout_chunks = []
+    if binary_stdout:
+        stdout_reader = threading.Thread(target=_drain_bytes,
+                                         args=(process.stdout, stdout_chunks),
+                                         daemon=True)
+    else:
+        stdout_reader = threading.Thread(target=_drain,
+                                         args=(_text(process.stdout),
+                                               stdout_buffer, 'stdout',
+                                               on_line),
+                                         daemon=True)
+    readers = [
+        stdout_reader,
+        threading.Thread(target=_drain,
+                         args=(_text(process.stderr), stderr_buffer,
+                               'stderr', on_line),
+                         daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
     try:
-        exit_code = subprocess.check_call(args,
-                                          universal_newlines=True,
-                                          **kwargs)
+        exit_code = supervise(process,
+                              timeout=timeout,
+                              stall_timeout=stall_timeout,
+                              heartbeat=heartbeat)
+    except BaseException:
+        # its in its own session, so ctrl + c never reached it, dont leave it orphaned
+        kill_process_group(process)
+        raise
+    finally:
+        cancel_token.unregister(process)
+    for reader in readers:
+        reader.join()
+    if cancel_token.cancelled:
+        raise CancelledError(cancel_token.reason)
+    stdout = b''.join(stdout_chunks) if binary_stdout else ''.join(
+        stdout_buffer)
+    stderr = ''.join(stderr_buffer)
+    _report(args, exit_code, stdout, stderr, descriptive_filepath_for_stdout,
+            dirpath, spill)
+    return exit_code, stdout, stderr
+
+
+def _report(args, exit_code, stdout, stderr, descriptive_filepath_for_stdout,
+            dirpath, spill):
+    # type: (List[str], int, Union[str, bytes], str, str, str, bool) -> None
+    if exit_code == 0:
         LOGGER.debug('results for ffmpeg:  %r, exit_code: %d', args, exit_code)
-    except subprocess.CalledProcessError as cpe:
-        exit_code = cpe.returncode
-        LOGGER.exception('failed command with exit code %s!', exit_code)
+    elif exit_code in (TIMEOUT_EXIT_CODE, STALLED_EXIT_CODE):
+        LOGGER.error('killed command after it %s!',
+                     'timed out' if exit_code == TIMEOUT_EXIT_CODE else 'stalled')
+        LOGGER.error(subprocess.list2cmdline(args))
+    else:
+        LOGGER.error('failed command with exit code %s!', exit_code)
         if isinstance(args, list):
             LOGGER.error(subprocess.list2cmdline(args))
         else:
             LOGGER.error(args)
-        LOGGER.error('stdout: "%s"', stdout_filepath)
-        LOGGER.error('stderr: "%s"', stderr_filepath)
-    stdout.close()
-    with open(stdout_filepath, encoding='utf-8') as r:
-        stdout = r.read()
-    stderr.close()
-    with open(stderr_filepath, encoding='utf-8') as r:
-        stderr = r.read()
-    if exit_code == 0:
-        os.remove(stdout_filepath)
-        os.remove(stderr_filepath)
+    if exit_code != 0 or spill:
+        stdout_filepath, stderr_filepath = spill_to_disk(
+            f'<{len(stdout)} bytes>' if isinstance(stdout, bytes) else stdout,
+            stderr, descriptive_filepath_for_stdout, dirpath)
+        log = LOGGER.error if exit_code != 0 else LOGGER.debug
+        log('stdout: "%s"', stdout_filepath)
+        log('stderr: "%s"', stderr_filepath)
+
+
+async def _drain_async(stream, buffer, name, line_callback=None):
+    # type: (asyncio.StreamReader, Deque[str], str, Optional[Callable[[str, str], None]]) -> None
+    '''
+    Description:
+        the asyncio twin of _drain, readline only knows \n so split universal newlines by hand like _text does
+    '''
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    while True:
+        chunk = await stream.read(ASYNC_CHUNK_SIZE)
+        pending += decoder.decode(chunk, final=not chunk)
+        lines = pending.splitlines(keepends=True)
+        pending = ''
+        # the last line may not be finished yet, or be a \r whose \n hasnt arrived
+        if chunk and lines and not lines[-1].endswith('\n'):
+            pending = lines.pop()
+        for line in lines:
+            line = line.rstrip('\r\n') + '\n'
+            buffer.append(line)
+            if line_callback is not None:
+                try:
+                    line_callback(name, line)
+                except Exception:
+                    LOGGER.exception('line callback failed on %s line %r',
+                                     name, line)
+        if not chunk:
+            break
+
+
+async def kill_process_group_async(process, grace=DEFAULT_KILL_GRACE):
+    # type: (asyncio.subprocess.Process, float) -> int
+    '''
+    Description:
+        kill_process_group for an asyncio child
+    '''
+    if process.returncode is not None:
+        return process.returncode
+    if sys.platform == 'win32':
+        subprocess.call(['taskkill', '/T', '/F', '/PID', str(process.pid)],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+        return await process.wait()
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return await process.wait()
+    try:
+        return await asyncio.wait_for(process.wait(), grace)
+    except asyncio.TimeoutError:
+        LOGGER.warning('pid %d ignored SIGTERM, sending SIGKILL', process.pid)
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        return await process.wait()
+
+
+async def _run_subprocess_async(args, descriptive_filepath_for_stdout, dirpath,
+                                cwd, max_lines, spill, line_callback,
+                                timeout, env, cancel_token, poll):
+    # type: (List[str], str, str, Optional[str], Optional[int], bool, Optional[Callable[[str, str], None]], Optional[float], Optional[dict], CancelToken, float) -> Tuple[int, str, str]
+    cancel_token.check()
+    kwargs = dict(cwd=cwd)
+    if env:
+        kwargs['env'] = dict(os.environ, **env)
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    LOGGER.debug('invoking async cmd: %r, kwargs: %s', args, kwargs)
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        **kwargs)
+    stdout_buffer = collections.deque(maxlen=max_lines)
+    stderr_buffer = collections.deque(maxlen=max_lines)
+    readers = [
+        asyncio.ensure_future(
+            _drain_async(process.stdout, stdout_buffer, 'stdout',
+                         line_callback)),
+        asyncio.ensure_future(
+            _drain_async(process.stderr, stderr_buffer, 'stderr',
+                         line_callback)),
+    ]
+    waiter = asyncio.ensure_future(process.wait())
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        while True:
+            try:
+                exit_code = await asyncio.wait_for(asyncio.shield(waiter), poll)
+                break
+            except asyncio.TimeoutError:
+                pass
+            cancel_token.check()
+            if timeout is not None and loop.time() - started > timeout:
+                LOGGER.error('pid %d ran longer than %0.0fs, killing it',
+                             process.pid, timeout)
+                await kill_process_group_async(process)
+                exit_code = TIMEOUT_EXIT_CODE
+                break
+        await asyncio.gather(*readers)
+    except BaseException:
+        # cancelled by the token, by the task being cancelled, or by ctrl + c, take the child down either way
+        await asyncio.shield(kill_process_group_async(process))
+        for future in readers + [waiter]:
+            future.cancel()
+        raise
+
+    stdout = ''.join(stdout_buffer)
+    stderr = ''.join(stderr_buffer)
+    _report(args, exit_code, stdout, stderr, descriptive_filepath_for_stdout,
+            dirpath, spill)
     return exit_code, stdout, stderr
 
 
+async def run_subprocess_async(args,
+                               descriptive_filepath_for_stdout,
+                               semaphore=None,
+                               dirpath=DEFAULT_STDOUT_FILE_DIRPATH,
+                               cwd=None,
+                               max_lines=DEFAULT_MAX_LINES,
+                               spill=False,
+                               line_callback=None,
+                               timeout=None,
+                               env=None,
+                               cancel_token=CANCEL_TOKEN,
+                               poll=DEFAULT_POLL_INTERVAL):
+    # type: (List[str], str, Optional[asyncio.Semaphore], str, Optional[str], Optional[int], bool, Optional[Callable[[str, str], None]], Optional[float], Optional[dict], CancelToken, float) -> Tuple[int, str, str]
+    '''
+    Description:
+        run_subprocess on the event loop instead of a thread, so hundreds of short children
+        (probes, taggers, frame grabs) can be in flight without hundreds of blocked threads
+    Arguments:
+        args: List[str]
+        descriptive_filepath_for_stdout: str
+        semaphore: Optional[asyncio.Semaphore]
+            shared by the calls that shouldnt all run at once, waits here before starting the child
+        dirpath / cwd / max_lines / spill / env:
+            see run_subprocess
+        line_callback: Optional[Callable[[str, str], None]]
+            see run_subprocess, called on the event loop so keep it quick
+        timeout: Optional[float]
+            wall clock seconds before the whole process group is killed, exit code TIMEOUT_EXIT_CODE
+        cancel_token: CancelToken
+            default CANCEL_TOKEN
+            checked every poll seconds, a cancel kills the child and raises CancelledError.
+            cancelling the asyncio task kills the child too
+        poll: float
+            default DEFAULT_POLL_INTERVAL
+    Returns:
+        Tuple[int, str, str]
+            exit code, stdout, stderr
+    '''
+    run = _run_subprocess_async(args, descriptive_filepath_for_stdout, dirpath,
+                                cwd, max_lines, spill, line_callback,
+                                timeout, env, cancel_token, poll)
+    if semaphore is None:
+        return await run
+    async with semaphore:
+        return await run
+
+
+def run_subprocesses(commands,
+                     concurrency=DEFAULT_ASYNC_CONCURRENCY,
+                     groups=None,
+                     **kwargs):
+    # type: (List[Tuple[List[str], str]], int, Optional[List[Any]], Any) -> List[Tuple[int, str, str]]
+    '''
+    Description:
+        synchronous front door to run_subprocess_async, run a batch of commands on one event loop
+        with at most concurrency in flight. if one raises, the rest are cancelled (and their children killed)
+        before it propagates
+    Arguments:
+        commands: List[Tuple[List[str], str]]
+            (args, descriptive_filepath_for_stdout) pairs
+        concurrency: int
+            default DEFAULT_ASYNC_CONCURRENCY
+        groups: Optional[List[Any]]
+            one key per command (a drive, say), concurrency then applies to each group on its own
+            rather than to the whole batch
+        kwargs:
+            anything else run_subprocess_async takes
+    Returns:
+        List[Tuple[int, str, str]]
+            same order as commands
+    '''
+
+    async def run_all():
+        semaphores = {}
+        tasks = []
+        for i, (args, descriptive_filepath_for_stdout) in enumerate(commands):
+            group = groups[i] if groups is not None else None
+            if group not in semaphores:
+                semaphores[group] = asyncio.Semaphore(concurrency)
+            tasks.append(
+                asyncio.ensure_future(
+                    run_subprocess_async(args,
+                                         descriptive_filepath_for_stdout,
+                                         semaphore=semaphores[group],
+                                         **kwargs)))
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    if not commands:
+        return []
+    return asyncio.run(run_all())
+
+
 class LiveDict(object):
     data = None
 
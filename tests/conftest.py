@@ -0,0 +1,69 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    Shared pytest setup. Everything under test here is planning / bookkeeping that never starts a child,
+    so the suite runs on a box without ffmpeg or imagemagick.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+import sys
+import shutil
+import subprocess
+import importlib.util
+from unittest import mock
+
+# 3rd party imports
+import numpy as np
+import pytest
+
+# project imports
+REPO_DIRPATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if REPO_DIRPATH not in sys.path:
+    sys.path.insert(0, REPO_DIRPATH)
+
+# library.ffmpeg refuses to import unless ffmpeg and magick are on the PATH, none of what the tests touch runs them
+if not (shutil.which('ffmpeg') and shutil.which('magick')):
+    with mock.patch.object(subprocess, 'check_call'):
+        import library.ffmpeg  # noqa: F401
+
+from library.keyframes import KEYFRAME_FLAG, OPEN_GOP_FLAG, PACKET_DTYPE, KeyframeIndex
+
+
+def load_app(name):
+    '''
+    Description:
+        the apps have dashes in their names, so theyre loaded by path instead of imported
+    '''
+    filepath = os.path.join(REPO_DIRPATH, 'apps', f'{name}.py')
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), filepath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def make_index():
+    '''
+    Description:
+        KeyframeIndex out of plain lists instead of an ffprobe scan, a packet every frame_duration seconds
+        from 0 to duration, keyframes at the given times, open GOP keyframes at open
+    '''
+
+    def factory(keyframes, duration=10.0, frame_duration=0.5, open=()):
+        count = int(round(duration / frame_duration))
+        packets = np.zeros(count, dtype=PACKET_DTYPE)
+        packets['pts'] = np.arange(count) * frame_duration
+        packets['duration'] = frame_duration
+        packets['pos'] = np.arange(count) * 1000
+        packets['size'] = 1000
+        for timestamp in keyframes:
+            packets['flags'][np.isclose(packets['pts'], timestamp)] |= KEYFRAME_FLAG
+        for timestamp in open:
+            packets['flags'][np.isclose(packets['pts'], timestamp)] |= OPEN_GOP_FLAG
+        return KeyframeIndex('video.mp4', packets, packets[packets['flags'] & KEYFRAME_FLAG != 0])
+
+    return factory
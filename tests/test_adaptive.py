@@ -0,0 +1,56 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    The throughput bookkeeping behind library.scheduler.AdaptiveController, no /proc needed.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+
+# 3rd party imports
+import pytest
+
+# project imports
+from library.progress import ProgressTracker, job_kind
+from library.scheduler import AdaptiveController
+
+
+@pytest.mark.parametrize('label, kind', [
+    ('trim 2024-01-01 - band', 'trim'),
+    ('sample_frames concert.mp4', 'sample_frames'),
+    ('', ''),
+    (None, ''),
+])
+def test_job_kind(label, kind):
+    assert job_kind(label) == kind
+
+
+def test_media_done_by_kind():
+    tracker = ProgressTracker(console_interval=None)
+    for label, out_time in [('sample_frames a.mp4', 10.0), ('sample_frames b.mp4', 5.0), ('gif a.gif', 2.0)]:
+        tracker.start_job(label).out_time = out_time
+    assert tracker.media_done_by_kind() == {'sample_frames': 15.0, 'gif': 2.0}
+
+
+def controller():
+    return AdaptiveController(8, tracker=ProgressTracker(console_interval=None))
+
+
+def test_change_needs_a_previous_interval():
+    assert controller().change({'trim': 10.0}) is None
+
+
+def test_change_compares_kind_to_kind():
+    adaptive = controller()
+    adaptive._last_rates = {'trim': 10.0, 'gif': 1.0}
+    # trim doubled and gif held, a plain sum would call that +90%
+    assert adaptive.change({'trim': 20.0, 'gif': 1.0, 'mp3': 50.0}) == pytest.approx(1.5)
+    assert adaptive.change({'trim': 20.0, 'gif': 1.5, 'thumb': 50.0}) == pytest.approx(1.75)
+
+
+def test_change_with_nothing_in_common():
+    adaptive = controller()
+    adaptive._last_rates = {'trim': 10.0}
+    assert adaptive.change({'gif': 1.0}) is None
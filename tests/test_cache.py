@@ -0,0 +1,62 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    library.cache, writes are all or nothing and identities follow the content.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+
+# 3rd party imports
+import pytest
+
+# project imports
+from library.cache import JsonCache, atomic_write, source_identity
+
+
+def test_atomic_write_replaces(tmp_path):
+    filepath = str(tmp_path / 'blob.json')
+    with atomic_write(filepath, 'w', encoding='utf-8') as w:
+        w.write('old')
+    with atomic_write(filepath, 'w', encoding='utf-8') as w:
+        w.write('new')
+    with open(filepath, encoding='utf-8') as r:
+        assert r.read() == 'new'
+    assert os.listdir(str(tmp_path)) == ['blob.json']
+
+
+def test_atomic_write_failure_leaves_the_old_file(tmp_path):
+    filepath = str(tmp_path / 'blob.json')
+    with atomic_write(filepath, 'w', encoding='utf-8') as w:
+        w.write('old')
+    with pytest.raises(ValueError):
+        with atomic_write(filepath, 'w', encoding='utf-8') as w:
+            w.write('half')
+            raise ValueError('disk full')
+    with open(filepath, encoding='utf-8') as r:
+        assert r.read() == 'old'
+    assert os.listdir(str(tmp_path)) == ['blob.json']
+
+
+def test_json_cache_round_trip(tmp_path):
+    cache = JsonCache(str(tmp_path))
+    assert cache.get('video.mp4', 1) is None
+    cache.put({'duration': 12.5}, 'video.mp4', 1)
+    assert cache.get('video.mp4', 1) == {'duration': 12.5}
+    assert cache.get('video.mp4', 2) is None
+
+
+def test_source_identity_follows_content(tmp_path):
+    filepath = str(tmp_path / 'video.mp4')
+    with open(filepath, 'wb') as wb:
+        wb.write(b'\x00' * 1024)
+    stat = os.stat(filepath)
+    before = source_identity(filepath)
+    assert source_identity(filepath) == before
+    with open(filepath, 'r+b') as wb:
+        wb.write(b'\x01')
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert source_identity(filepath) != before
@@ -0,0 +1,87 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    library.stdlib.CancelToken on its own and driving a Scheduler.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+import time
+
+# 3rd party imports
+import pytest
+
+# project imports
+from library.stdlib import CancelledError, CancelToken
+from library.scheduler import CANCELLED, DONE, FAILED, CoreBudget, Scheduler, Task
+
+
+def test_cancel_check_and_reset():
+    token = CancelToken()
+    token.check()
+    token.cancel('trim failed')
+    token.cancel('ignored, already cancelled')
+    assert token.cancelled
+    assert token.reason == 'trim failed'
+    with pytest.raises(CancelledError, match='trim failed'):
+        token.check()
+    token.reset()
+    assert not token.cancelled
+    token.check()
+
+
+def test_wait_wakes_up_on_cancel():
+    token = CancelToken()
+    assert not token.wait(0.01)
+    token.cancel()
+    started = time.time()
+    assert token.wait(60)
+    assert time.time() - started < 1
+
+
+def test_partial_removes_outputs_on_failure(tmp_path):
+    token = CancelToken()
+    output = str(tmp_path / 'half.mp4')
+    with pytest.raises(CancelledError):
+        with token.partial(output):
+            with open(output, 'wb') as wb:
+                wb.write(b'half')
+            token.cancel()
+            token.check()
+    assert not os.path.exists(output)
+
+    with token.partial(output):
+        with open(output, 'wb') as wb:
+            wb.write(b'whole')
+    assert os.path.exists(output)
+
+
+def test_first_failure_cancels_the_rest():
+    token = CancelToken()
+    scheduler = Scheduler(limits={'light': 1}, cancel_token=token, budget=CoreBudget(4))
+    scheduler.add(Task('fails', lambda: 1))
+    scheduler.add(Task('queued', lambda: 0))
+    tasks = scheduler.run()
+    assert tasks['fails'].state == FAILED
+    assert tasks['queued'].state == CANCELLED
+    assert token.reason == 'fails failed'
+
+
+def test_cancelled_error_is_cancelled_not_failed():
+    token = CancelToken()
+
+    def cancelled():
+        token.cancel('ctrl + c')
+        token.check()
+
+    scheduler = Scheduler(limits={'light': 1}, cancel_token=token, budget=CoreBudget(4))
+    scheduler.add(Task('done', lambda: 0))
+    scheduler.add(Task('cancelled', cancelled, deps=['done']))
+    scheduler.add(Task('downstream', lambda: 0, deps=['cancelled']))
+    tasks = scheduler.run()
+    assert tasks['done'].state == DONE
+    assert tasks['cancelled'].state == CANCELLED
+    assert tasks['downstream'].state == CANCELLED
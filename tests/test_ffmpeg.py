@@ -0,0 +1,208 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    The parts of library.ffmpeg that decide what to run, without running anything.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+
+# 3rd party imports
+import pytest
+
+# project imports
+from library import ffmpeg
+
+
+@pytest.mark.parametrize('output, version', [
+    ('ffmpeg version 4.4.2-0ubuntu0.22.04.1 Copyright (c) 2000-2021', (4, 4)),
+    ('ffmpeg version n5.1.2 Copyright (c) 2000-2022', (5, 1)),
+    ('ffmpeg version 7.0.1-static https://johnvansickle.com/ffmpeg/', (7, 0)),
+    ('ffmpeg version N-112233-gabcdef0123 Copyright (c) 2000-2024', None),
+])
+def test_version_regex(output, version):
+    mo = ffmpeg.VERSION_REGEX.search(output)
+    assert (tuple(int(group) for group in mo.groups()) if mo else None) == version
+
+
+@pytest.mark.parametrize('version, flag', [
+    ((4, 4), '-vsync'),
+    ((5, 0), '-vsync'),
+    ((5, 1), '-fps_mode'),
+    ((7, 0), '-fps_mode'),
+    (None, '-fps_mode'),
+])
+def test_fps_mode_args(monkeypatch, version, flag):
+    monkeypatch.setattr(ffmpeg, '_FFMPEG_VERSION', [version])
+    assert ffmpeg.fps_mode_args('vfr') == [flag, 'vfr']
+
+
+def pixel_encoder(bytes_at_full_size):
+    '''
+    Description:
+        a fake encode whose size goes with the pixel count, which is what fit_to_size assumes, and remembers its calls
+    '''
+    calls = []
+
+    def encode(scale):
+        calls.append(scale)
+        return int(bytes_at_full_size * scale**2)
+
+    return encode, calls
+
+
+def test_fit_to_size_lands_in_the_window():
+    encode, calls = pixel_encoder(40 * 1024**2)
+    scale, size = ffmpeg.fit_to_size(encode, 10, tolerance=0.05)
+    assert 9.5 * 1024**2 <= size <= 10 * 1024**2
+    assert calls[-1] == scale
+    # the trial gets it close enough that one more encode settles it
+    assert len(calls) <= 3
+
+
+def test_fit_to_size_stops_at_full_size():
+    encode, calls = pixel_encoder(1024**2)
+    scale, size = ffmpeg.fit_to_size(encode, 10)
+    assert scale == 1.0
+    assert size == 1024**2
+
+
+def test_fit_to_size_keeps_the_best_fit_on_disk():
+    sizes = {}
+
+    def encode(scale):
+        # lumpy, so the prediction keeps missing and it runs out of attempts
+        size = int(12 * 1024**2 * scale**2) + (3 * 1024**2 if scale > 0.8 else 0)
+        sizes[scale] = size
+        encode.last = scale
+        return size
+
+    scale, size = ffmpeg.fit_to_size(encode, 10, tolerance=0.01, max_attempts=3)
+    assert size <= 10 * 1024**2
+    assert encode.last == scale
+    assert sizes[scale] == size
+
+
+@pytest.mark.parametrize('empty_call', [0, 1])
+def test_fit_to_size_empty_encode(empty_call):
+    calls = []
+
+    def encode(scale):
+        calls.append(scale)
+        return 0 if len(calls) > empty_call else 1024**2
+
+    scale, size = ffmpeg.fit_to_size(encode, 10)
+    assert size == 0
+    assert len(calls) == empty_call + 1
+
+
+def test_smart_cut_plan_splits_at_keyframes(make_index):
+    index = make_index([0.0, 2.0, 4.0, 6.0, 8.0])
+    assert ffmpeg.smart_cut_plan(index, start=1.0, stop=7.0) == [
+        (True, 1.0, 2.0),
+        (False, 2.0, 6.0),
+        (True, 6.0, 7.0),
+    ]
+
+
+def test_smart_cut_plan_on_keyframes_is_all_copy(make_index):
+    index = make_index([0.0, 2.0, 4.0, 6.0, 8.0])
+    assert ffmpeg.smart_cut_plan(index, start=2.0, stop=6.0) == [(False, 2.0, 6.0)]
+    assert ffmpeg.smart_cut_plan(index, start=2.0) == [(False, 2.0, None)]
+    assert ffmpeg.smart_cut_plan(index) == [(False, 0.0, None)]
+
+
+def test_smart_cut_plan_inside_one_gop(make_index):
+    index = make_index([0.0, 4.0, 8.0])
+    assert ffmpeg.smart_cut_plan(index, start=1.0, stop=3.0) == [(True, 1.0, 3.0)]
+    assert ffmpeg.smart_cut_plan(index, start=8.5) == [(True, 8.5, None)]
+
+
+def test_open_cuts(make_index):
+    index = make_index([0.0, 2.0, 4.0, 6.0, 8.0], open=[2.0, 4.0])
+    segments = ffmpeg.smart_cut_plan(index, start=1.0, stop=7.0)
+    # 4 is open but nothing gets cut there
+    assert ffmpeg.open_cuts(index, segments) == [2.0]
+
+
+class FakeProbe(object):
+
+    def __init__(self, duration, codec='h264'):
+        self.codec = codec
+        self.duration = duration
+        self.start_time = 0.0
+        self.rotation = 0
+        self.fps = 25.0
+        self.video = self
+        self.pix_fmt = 'yuv420p'
+
+
+@pytest.fixture
+def fake_smart_cut(monkeypatch, tmp_path):
+    '''
+    Description:
+        smart_cut with ffmpeg swapped out, every "run" writes its output file,
+        and the cut probes back however long output_duration says
+    '''
+    input_filepath = str(tmp_path / 'source.mp4')
+    output_filepath = str(tmp_path / 'cut.mp4')
+    runs = []
+    output_duration = []
+
+    def run_ffmpeg(args, descriptive_filepath, label=None, **kwargs):
+        runs.append(label)
+        with open(args[-1], 'wb') as wb:
+            wb.write(b'video')
+        return 0, None, ''
+
+    def probe(filepath, cache=None):
+        return FakeProbe(10.0 if filepath == input_filepath else output_duration[0])
+
+    monkeypatch.setattr(ffmpeg, 'run_ffmpeg', run_ffmpeg)
+    monkeypatch.setattr(ffmpeg, 'probe', probe)
+
+    def cut(index, duration, start, stop):
+        del runs[:]
+        output_duration[:] = [duration]
+        exit_code = ffmpeg.smart_cut(input_filepath, output_filepath, start=start, stop=stop, index=index, label='cut')
+        return exit_code, list(runs)
+
+    return cut
+
+
+def test_smart_cut_checks_its_length(make_index, fake_smart_cut):
+    index = make_index([0.0, 2.0, 4.0, 6.0, 8.0])
+    exit_code, runs = fake_smart_cut(index, 6.0, 1.0, 7.0)
+    assert exit_code == 0
+    assert runs == ['cut encode 1/3', 'cut copy 2/3', 'cut encode 3/3', 'cut concat']
+
+
+def test_smart_cut_falls_back_to_a_stream_copy(make_index, fake_smart_cut):
+    index = make_index([0.0, 2.0, 4.0, 6.0, 8.0])
+    exit_code, runs = fake_smart_cut(index, 4.0, 1.0, 7.0)
+    assert exit_code == 0
+    assert runs[-2:] == ['cut concat', 'cut']
+
+
+def test_smart_cut_stream_copies_open_gops(make_index, fake_smart_cut):
+    index = make_index([0.0, 2.0, 4.0, 6.0, 8.0], open=[6.0])
+    exit_code, runs = fake_smart_cut(index, 6.0, 1.0, 7.0)
+    assert exit_code == 0
+    assert runs == ['cut']
+
+
+def test_chunk_plan_cuts_on_keyframes(make_index):
+    index = make_index([0.0, 2.0, 4.0, 6.0, 8.0])
+    assert ffmpeg.chunk_plan(index, 2) == [(0.0, 4.0), (4.0, None)]
+    # 10 / 3 -> cut at the keyframes before 3.33 and 6.67
+    assert ffmpeg.chunk_plan(index, 3) == [(0.0, 2.0), (2.0, 6.0), (6.0, None)]
+
+
+def test_chunk_plan_never_makes_empty_chunks(make_index):
+    index = make_index([0.0, 8.0])
+    # every split lands on the first keyframe, which is where the file starts anyway
+    assert ffmpeg.chunk_plan(index, 4) == [(0.0, None)]
+    assert ffmpeg.chunk_plan(index, 1) == [(0.0, None)]
+    assert ffmpeg.chunk_plan(index, 8) == [(0.0, 8.0), (8.0, None)]
@@ -0,0 +1,104 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    library.journal, when a recorded stage still counts as done.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import os
+
+# 3rd party imports
+import pytest
+
+# project imports
+from library import journal
+from library.journal import StageJournal, fingerprint, matches
+
+
+def write(filepath, data):
+    with open(filepath, 'wb') as wb:
+        wb.write(data)
+
+
+def bump_mtime(filepath):
+    stat = os.stat(filepath)
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = str(tmp_path / 'source.mp4')
+    output = str(tmp_path / 'output.mp3')
+    write(source, b'video' * 100)
+    write(output, b'audio' * 100)
+    return source, output
+
+
+def test_missing_files_never_match(tmp_path):
+    filepath = str(tmp_path / 'nope.mp4')
+    assert fingerprint(filepath) is None
+    assert not matches(filepath, None)
+
+
+def test_untouched_file_matches(files):
+    source, _ = files
+    assert matches(source, fingerprint(source))
+
+
+def test_touched_file_with_the_same_content_matches(files):
+    source, _ = files
+    recorded = fingerprint(source)
+    bump_mtime(source)
+    assert matches(source, recorded)
+
+
+def test_edit_with_a_new_mtime_is_stale(files):
+    source, _ = files
+    recorded = fingerprint(source)
+    with open(source, 'r+b') as wb:
+        wb.seek(250)
+        wb.write(b'X')
+    bump_mtime(source)
+    assert not matches(source, recorded)
+
+
+def test_big_file_with_a_new_mtime_is_stale(files, monkeypatch):
+    source, _ = files
+    monkeypatch.setattr(journal, 'FULL_HASH_BYTES', 10)
+    recorded = fingerprint(source)
+    assert recorded['digest'] is None
+    bump_mtime(source)
+    assert not matches(source, recorded)
+
+
+def test_size_change_is_stale(files):
+    source, _ = files
+    recorded = fingerprint(source)
+    write(source, b'shorter')
+    assert not matches(source, recorded)
+
+
+def test_is_current(files, tmp_path):
+    source, output = files
+    stages = StageJournal(str(tmp_path))
+    assert not stages.is_current('mp3', [source], dict(bitrate=320))
+    stages.record('mp3', [source], dict(bitrate=320, range=(1, 2)), [output])
+    # a fresh journal reads it back off disk, tuples come back as lists
+    stages = StageJournal(str(tmp_path))
+    assert stages.is_current('mp3', [source], dict(bitrate=320, range=[1, 2]))
+    assert not stages.is_current('mp3', [source], dict(bitrate=128, range=[1, 2]))
+    assert not stages.is_current('mp3', [output], dict(bitrate=320, range=[1, 2]))
+    assert stages.outputs('mp3') == [os.path.abspath(output)]
+
+
+def test_restamp_accepts_in_place_edits(files, tmp_path):
+    source, output = files
+    stages = StageJournal(str(tmp_path))
+    stages.record('mp3', [source], {}, [output])
+    write(output, b'tagged audio')
+    assert not stages.is_current('mp3', [source], {})
+    stages.restamp('mp3')
+    assert stages.is_current('mp3', [source], {})
@@ -0,0 +1,89 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    library.keyframes lookups and ffprobe line parsing, on indexes built from lists.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+
+# 3rd party imports
+import pytest
+
+# project imports
+from library.keyframes import DISCARD_FLAG, KEYFRAME_FLAG, merge_intervals, parse_packet, settled
+
+
+def test_duration_is_where_the_last_frame_ends(make_index):
+    assert make_index([0.0], duration=10.0).duration == pytest.approx(10.0)
+
+
+def test_before_and_after(make_index):
+    index = make_index([0.0, 2.0, 4.0, 8.0])
+    assert len(index) == 4
+    assert index.before(3.9) == 2.0
+    assert index.before(4.0) == 4.0
+    # ffprobe rounds to the microsecond
+    assert index.before(4.0 - 1e-7) == 4.0
+    assert index.after(4.0) == 4.0
+    assert index.after(4.1) == 8.0
+    assert index.after(8.5) is None
+    assert list(index.before_many([-1.0, 1.0, 9.0])) == [0.0, 0.0, 8.0]
+
+
+def test_is_keyframe_and_offset(make_index):
+    index = make_index([0.0, 2.0, 4.0])
+    assert index.is_keyframe(2.0)
+    assert not index.is_keyframe(2.5)
+    assert index.offset(3.0) == 4000
+
+
+def test_is_open(make_index):
+    index = make_index([0.0, 2.0, 4.0], open=[4.0])
+    assert index.is_open(4.0)
+    assert not index.is_open(2.0)
+    # not a keyframe at all
+    assert not index.is_open(4.5)
+
+
+def test_gops(make_index):
+    index = make_index([0.0, 2.0, 4.0, 8.0])
+    assert index.gops() == [(0.0, 2.0), (2.0, 4.0), (4.0, 8.0), (8.0, 10.0)]
+    assert index.gops(3.0, 5.0) == [(2.0, 4.0), (4.0, 5.0)]
+
+
+def test_no_keyframes(make_index):
+    index = make_index([])
+    assert not index
+    assert index.after(0.0) is None
+    with pytest.raises(ValueError):
+        index.before(1.0)
+
+
+def test_merge_intervals():
+    assert merge_intervals([(5.0, 7.0), (0.0, 2.0), (1.0, 3.0), (7.0, 8.0)]) == [(0.0, 3.0), (5.0, 8.0)]
+    assert merge_intervals([]) == []
+
+
+def test_parse_packet():
+    line = 'packet|pts_time=1.001000|dts_time=0.967633|duration_time=0.033367|size=4242|pos=1337|flags=K__'
+    assert parse_packet(line) == (1.001, 0.033367, 1337, 4242, KEYFRAME_FLAG)
+
+
+def test_parse_packet_falls_back_to_dts():
+    pts, duration, pos, size, flags = parse_packet('packet|pts_time=N/A|dts_time=2.5|size=10|pos=N/A|flags=_D_')
+    assert (pts, duration, pos, size, flags) == (2.5, 0.0, -1, 10, DISCARD_FLAG)
+    assert parse_packet('packet|pts_time=N/A|dts_time=N/A|size=10') is None
+
+
+def test_settled(make_index):
+    index = make_index([0.0, 4.0, 8.0], duration=20.0)
+    # read 2s either side of 1 -> 6, the keyframe after 1 (4) is outside [1, 3]
+    assert not settled(index, 1.0, 6.0, 2.0)
+    assert settled(index, 1.0, 6.0, 4.0)
+    # the two windows ran together
+    assert settled(index, 1.0, 2.5, 2.0)
+    # near enough the end that the window reached it
+    assert settled(index, 19.0, None, 2.0, duration=20.0)
@@ -0,0 +1,61 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    How apps/trim-tag-convert-video-audio.py lays its stages out for the scheduler.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import types
+
+# 3rd party imports
+import pytest
+
+# project imports
+from library.stdlib import CancelToken
+from library.scheduler import CoreBudget, Scheduler
+from conftest import load_app
+
+
+@pytest.fixture(scope='module')
+def app():
+    return load_app('trim-tag-convert-video-audio')
+
+
+def upstreams(plan):
+    return {stage: upstream for stage, (_, _, upstream) in plan.items()}
+
+
+def test_plan_keeps_the_stage_order(app):
+    plan = app.plan_stages(['gif', 'mp3', 'trim'], fuse=False)
+    assert list(plan) == ['trim', 'mp3', 'gif']
+
+
+@pytest.mark.parametrize('modes', [['trim', 'gif'], ['trim', 'thumb', 'gif']])
+def test_gif_waits_on_trim(app, tmp_path, modes):
+    video = types.SimpleNamespace(filepath=str(tmp_path / 'source.mp4'),
+                                  output_dirpath=str(tmp_path),
+                                  video_filename='trimmed.mp4')
+    scheduler = Scheduler(cancel_token=CancelToken(), budget=CoreBudget(4))
+    app.schedule_pipelines(scheduler, [video], modes=modes, fuse=False)
+    gif = next(task for name, task in scheduler.tasks.items() if name.startswith('gif'))
+    trim = next(name for name in scheduler.tasks if name.startswith('trim'))
+    assert trim in gif.deps
+
+
+def test_trim_and_mp3_fuse(app):
+    plan = app.plan_stages(['trim', 'mp3', 'tag', 'thumb', 'gif'])
+    assert list(plan) == ['trim+mp3', 'tag', 'thumb', 'gif']
+    assert upstreams(plan) == {
+        'trim+mp3': [],
+        'tag': ['trim+mp3'],
+        'thumb': ['trim+mp3'],
+        'gif': ['trim+mp3', 'thumb'],
+    }
+
+
+def test_no_fuse_without_both_halves(app):
+    assert list(app.plan_stages(['mp3', 'tag'])) == ['mp3', 'tag']
+    assert list(app.plan_stages(['trim', 'mp3'], fuse=False)) == ['trim', 'mp3']
@@ -0,0 +1,38 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    apps/resize-concat.py picking an encoder it can actually use.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+
+# 3rd party imports
+import pytest
+
+# project imports
+from conftest import load_app
+
+
+@pytest.fixture(scope='module')
+def app():
+    return load_app('resize-concat')
+
+
+def test_default_encoder_prefers_hardware(app, monkeypatch):
+    monkeypatch.setattr(app, 'encoder_usable', lambda encoder: True)
+    assert app.default_encoder() == 'hevc_nvenc'
+
+
+def test_default_encoder_falls_back_to_software(app, monkeypatch):
+    monkeypatch.setattr(app, 'encoder_usable', lambda encoder: False)
+    assert app.default_encoder() == app.SOFTWARE_ENCODER
+    assert app.SOFTWARE_ENCODER in app.ENCODERS
+    assert app.SOFTWARE_ENCODER not in app.HARDWARE_ENCODERS
+
+
+def test_encoder_without_ffmpeg_is_unusable(app, monkeypatch):
+    monkeypatch.setenv('PATH', '')
+    assert not app.encoder_usable('hevc_nvenc')
@@ -0,0 +1,128 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    library.scheduler with plain python tasks, what runs when and what happens to the rest when one fails.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+import time
+import threading
+
+# 3rd party imports
+import pytest
+
+# project imports
+from library.stdlib import CancelToken
+from library.scheduler import DONE, FAILED, SKIPPED, CoreBudget, Scheduler, Task
+
+
+def scheduler(**kwargs):
+    # a token of its own, a failure in one test shouldnt cancel the next
+    kwargs.setdefault('cancel_token', CancelToken())
+    kwargs.setdefault('budget', CoreBudget(4))
+    return Scheduler(**kwargs)
+
+
+def recorder():
+    order = []
+    lock = threading.Lock()
+
+    def record(name, result=0, seconds=0.0):
+        time.sleep(seconds)
+        with lock:
+            order.append(name)
+        return result
+
+    return order, record
+
+
+def test_dependencies_run_first():
+    order, record = recorder()
+    s = scheduler(limits={'light': 4})
+    s.add(Task('gif', record, deps=['trim', 'thumb'], args=('gif', )))
+    s.add(Task('thumb', record, deps=['trim'], args=('thumb', 0, 0.02)))
+    s.add(Task('trim', record, args=('trim', 0, 0.02)))
+    tasks = s.run()
+    assert order == ['trim', 'thumb', 'gif']
+    assert all(task.state == DONE for task in tasks.values())
+
+
+def test_resource_limit():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+        return 0
+
+    s = scheduler(limits={'encode': 2})
+    for t in range(6):
+        s.add(Task(f'encode {t}', work, resource='encode'))
+    s.run()
+    assert max(peak) == 2
+
+
+def test_failure_skips_downstream_only_with_keep_going():
+    order, record = recorder()
+    s = scheduler(keep_going=True)
+    s.add(Task('trim', record, args=('trim', 1)))
+    s.add(Task('mp3', record, deps=['trim'], args=('mp3', )))
+    s.add(Task('tag', record, deps=['mp3'], args=('tag', )))
+    s.add(Task('other', record, args=('other', )))
+    tasks = s.run()
+    assert tasks['trim'].state == FAILED
+    assert tasks['mp3'].state == SKIPPED
+    assert tasks['tag'].state == SKIPPED
+    assert tasks['other'].state == DONE
+    assert sorted(order) == ['other', 'trim']
+
+
+def test_exception_fails_the_task():
+
+    def boom():
+        raise RuntimeError('boom')
+
+    s = scheduler(keep_going=True)
+    s.add(Task('boom', boom))
+    tasks = s.run()
+    assert tasks['boom'].state == FAILED
+    assert isinstance(tasks['boom'].exception, RuntimeError)
+
+
+def test_true_is_not_an_exit_code():
+    s = scheduler()
+    s.add(Task('ok', lambda: True))
+    assert s.run()['ok'].state == DONE
+
+
+def test_unknown_dependency():
+    s = scheduler()
+    s.add(Task('gif', lambda: 0, deps=['thumb']))
+    with pytest.raises(ValueError, match='unknown task'):
+        s.run()
+
+
+def test_cycle():
+    s = scheduler()
+    s.add(Task('a', lambda: 0, deps=['b']))
+    s.add(Task('b', lambda: 0, deps=['a']))
+    with pytest.raises(ValueError, match='cycle'):
+        s.run()
+
+
+def test_duplicate_and_unknown_resource():
+    s = scheduler()
+    s.add(Task('a', lambda: 0))
+    with pytest.raises(ValueError):
+        s.add(Task('a', lambda: 0))
+    with pytest.raises(ValueError):
+        Task('b', lambda: 0, resource='gpu')
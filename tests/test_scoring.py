@@ -0,0 +1,91 @@
+'''
+Author:      Chris Carl
+Date:        2026-10-18
+Email:       chrisbcarl@outlook.com
+
+Description:
+    library.scoring on synthetic frames, a scorer should rank the obvious frame the obvious way.
+'''
+# stdlib imports
+from __future__ import absolute_import, division
+
+# 3rd party imports
+import numpy as np
+import pytest
+
+# project imports
+from library.scoring import DEFAULT_WEIGHTS, SCORERS, colorfulness, entropy, exposure, normalize, parse_weights, score_frames, sharpness
+
+
+def solid(value, shape=(16, 16)):
+    return np.full(shape + (3, ), value, dtype=np.uint8)
+
+
+def checkerboard(shape=(16, 16)):
+    board = (np.indices(shape).sum(axis=0) % 2 * 255).astype(np.uint8)
+    return np.repeat(board[..., None], 3, axis=2)
+
+
+def noise(shape=(16, 16), seed=0):
+    return np.random.RandomState(seed).randint(0, 256, shape + (3, ), dtype=np.uint8)
+
+
+def test_every_default_weight_has_a_scorer():
+    assert set(DEFAULT_WEIGHTS) <= set(SCORERS)
+
+
+def test_sharpness_prefers_edges():
+    scores = sharpness(np.stack([solid(128), checkerboard()]))
+    assert scores[0] == 0
+    assert scores[1] > scores[0]
+
+
+def test_entropy_of_a_flat_frame_is_zero():
+    scores = entropy(np.stack([solid(50), noise()]))
+    assert scores[0] == pytest.approx(0.0)
+    assert scores[1] > 4
+
+
+def test_exposure_penalizes_clipping():
+    scores = exposure(np.stack([solid(0), solid(128), solid(255)]))
+    assert scores[1] == max(scores)
+    assert scores[1] == pytest.approx(0.0, abs=0.01)
+
+
+def test_colorfulness_of_gray_is_zero():
+    red = solid(0)
+    red[..., 0] = 255
+    scores = colorfulness(np.stack([solid(128), red]))
+    assert scores[0] == pytest.approx(0.0)
+    assert scores[1] > 50
+
+
+def test_parse_weights():
+    assert parse_weights(['sharpness=2', 'entropy']) == {'sharpness': 2.0, 'entropy': 1.0}
+    with pytest.raises(ValueError):
+        parse_weights(['vibes'])
+
+
+def test_normalize():
+    assert np.all(normalize(np.array([3.0, 3.0, 3.0])) == 0)
+    normalized = normalize(np.array([1.0, 2.0, 3.0]))
+    assert normalized.mean() == pytest.approx(0.0)
+    assert normalized.std() == pytest.approx(1.0)
+
+
+def test_score_frames_batches_dont_change_the_result():
+    frames = np.stack([noise(seed=seed) for seed in range(10)] + [solid(0), checkerboard()])
+    combined, raw = score_frames(frames)
+    batched, batched_raw = score_frames(frames, batch_size=3)
+    assert np.allclose(combined, batched)
+    assert set(raw) == set(name for name, weight in DEFAULT_WEIGHTS.items() if weight)
+    for name in raw:
+        assert np.allclose(raw[name], batched_raw[name])
+
+
+def test_score_frames_skips_precomputed_and_zero_weights():
+    frames = np.stack([solid(0), checkerboard(), noise()])
+    precomputed = {'sharpness': np.array([3.0, 2.0, 1.0])}
+    combined, raw = score_frames(frames, weights={'sharpness': 1.0, 'entropy': 0.0}, precomputed=precomputed)
+    assert list(raw) == ['sharpness']
+    assert np.argmax(combined) == 0